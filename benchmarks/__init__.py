@@ -0,0 +1 @@
+# benchmarks - 合成数据上的性能基准测试 (python -m benchmarks --help)
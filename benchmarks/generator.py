@@ -0,0 +1,156 @@
+# benchmarks/generator.py - 合成观测夜数据 (候选体Excel + 占位FITS/JPG文件)
+
+import os
+import random
+import struct
+from pathlib import Path
+
+ATTRIBUTES = ('new', 'mov', 'var')
+
+# 与真实 candidate-final.xlsx 相同的数据列
+HEADERS = [
+    'id', 'attribute', 'sequence_number', 'ra_deg_new', 'dec_deg_new', 'RA_hms_new', 'Dec_dms_new',
+    'mag_new', 'x_new', 'y_new', 'time_utc_new', 'fits_filename_new',
+    'ra_deg_old', 'dec_deg_old', 'time_utc_old', 'fits_filename_old',
+]
+
+# 每个候选体的文件后缀 (见 data.file_index)
+FILE_SUFFIXES = ('_lib.fits', '_new.fits', '_SEPlib.jpg', '_SEPnew.jpg')
+
+
+def _stub_fits(size=64):
+    """size×size 的 float32 FITS 图像 (全零)"""
+    cards = [
+        'SIMPLE  =                    T',
+        'BITPIX  =                  -32',
+        'NAXIS   =                    2',
+        f'NAXIS1  = {size:>20}',
+        f'NAXIS2  = {size:>20}',
+        'END',
+    ]
+    header = ''.join(card.ljust(80) for card in cards).encode('ascii')
+    header += b' ' * (-len(header) % 2880)
+    data = struct.pack(f'>{size * size}f', *([0.0] * (size * size)))
+    data += b'\0' * (-len(data) % 2880)
+    return header + data
+
+
+def _stub_jpg(size=16 * 1024):
+    """只有SOI/EOI标记的占位JPG (只用于测量文件传输，不是可解码的图片)"""
+    return b'\xff\xd8' + b'\0' * (size - 4) + b'\xff\xd9'
+
+
+def make_row(i, rng):
+    attribute = ATTRIBUTES[i % len(ATTRIBUTES)]
+    frame = i // 100
+    return [
+        i, attribute, i,
+        round(rng.uniform(0, 360), 6), round(rng.uniform(-30, 60), 6), '00:42:00', '-05:15:00',
+        round(rng.uniform(12, 20), 3), round(rng.uniform(0, 4096), 2), round(rng.uniform(0, 4096), 2),
+        '2024-01-01 12:00:00', f'frame{frame:05d}_new.fits',
+        round(rng.uniform(0, 360), 6), round(rng.uniform(-30, 60), 6),
+        '2023-12-01 11:00:00', f'ref{frame:05d}_new.fits',
+    ]
+
+
+def row_file_names(row):
+    """某行在 get_row_files() 中会查找的全部文件名"""
+    attribute, seq = row[1], row[2]
+    names = []
+    for fits_name in (row[11], row[15]):
+        base = fits_name.replace('_new.fits', '')
+        names.extend(f'{attribute}_{seq:04d}_{base}{suffix}' for suffix in FILE_SUFFIXES)
+    return names
+
+
+def write_workbook(path, headers, rows):
+    """用openpyxl只写模式写xlsx"""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('candidates')
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def generate_night(data_root, date, rows, reviewers=3, judged_fraction=0.3, file_rows=None,
+                   data_file='candidate-final/candidate-final.xlsx', seed=0):
+    """
+    生成一个合成观测夜
+
+    Args:
+        data_root: DATA_ROOT 目录
+        date: 日期字符串 (YYYYMMDD)
+        rows: 候选体行数
+        reviewers: judge_<user> 列数 (另有 final_judge / final_judge_by / final_remark)
+        judged_fraction: 已有判定的行的比例
+        file_rows: 只为前 file_rows 行生成占位文件 (None 表示全部)，文件都是同一份数据的硬链接
+        data_file: 相对日期目录的Excel路径 (settings.DATA_FILE)
+        seed: 随机数种子，相同参数生成相同的数据
+
+    Returns:
+        Path: 原始Excel路径
+    """
+    rng = random.Random(seed)
+    excel_path = Path(data_root) / date / data_file
+    night_dir = excel_path.parent
+    night_dir.mkdir(parents=True, exist_ok=True)
+
+    users = [f'reviewer{n}' for n in range(1, reviewers + 1)]
+    headers = HEADERS + [f'judge_{u}' for u in users] + ['final_judge', 'final_judge_by', 'final_remark']
+    data = []
+    for i in range(1, rows + 1):
+        row = make_row(i, rng)
+        judgments = [None] * reviewers
+        final = [None, None, None]
+        if users and rng.random() < judged_fraction:
+            who = rng.randrange(reviewers)
+            value = rng.choice(('exclude', 'suspect'))
+            judgments[who] = value
+            final = [value, users[who], 'checked' if rng.random() < 0.1 else None]
+        data.append(row + judgments + final)
+    write_workbook(excel_path, headers, data)
+
+    blobs = {}
+    for suffix, content in (('.fits', _stub_fits()), ('.jpg', _stub_jpg())):
+        blob = night_dir / f'.bench-stub{suffix}'
+        blob.write_bytes(content)
+        blobs[suffix] = blob
+    limit = rows if file_rows is None else min(rows, file_rows)
+    for row in data[:limit]:
+        for name in row_file_names(row):
+            target = night_dir / name
+            if target.exists():
+                continue
+            source = blobs[os.path.splitext(name)[1]]
+            try:
+                os.link(source, target)
+            except OSError:
+                target.write_bytes(source.read_bytes())
+    return excel_path
+
+
+def append_rows(excel_path, count, seed=0):
+    """
+    在原始Excel末尾追加 count 行 (模拟观测过程中写入的新候选体)
+
+    Returns:
+        int: 追加后的数据行数
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(excel_path, read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        headers = list(next(rows))
+        data = [list(row) for row in rows]
+    finally:
+        wb.close()
+    rng = random.Random(seed + len(data))
+    extra = len(headers) - len(HEADERS)
+    for i in range(len(data) + 1, len(data) + count + 1):
+        data.append(make_row(i, rng) + [None] * extra)
+    write_workbook(excel_path, headers, data)
+    return len(data)
@@ -0,0 +1,354 @@
+# benchmarks/load.py - 多名评审者同时打开同一观测夜的负载模拟
+
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from .runner import BASE_DATE, configure_django
+
+# 页面的轮询间隔 (秒)，见 date_detail.html 的 startPolling()
+POLL_INTERVALS = {
+    'status': 2.0,
+    'status_update': 3.0,
+    'judgments': 5.0,
+    'sync_status': 5.0,
+}
+
+
+def latency_stats(samples, elapsed):
+    """耗时样本 (秒) → 吞吐量与 p50/p95/p99 (毫秒)"""
+    if not samples:
+        return {'count': 0}
+    ms = sorted(s * 1000 for s in samples)
+
+    def pct(p):
+        return round(ms[min(len(ms) - 1, int(round(p / 100 * (len(ms) - 1))))], 3)
+
+    return {
+        'count': len(ms),
+        'rps': round(len(ms) / elapsed, 2),
+        'p50_ms': pct(50),
+        'p95_ms': pct(95),
+        'p99_ms': pct(99),
+        'max_ms': round(ms[-1], 3),
+    }
+
+
+class Recorder:
+    """所有模拟评审者共享的请求耗时和错误记录"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_examples = []
+        self._lock = threading.Lock()
+
+    def record(self, name, elapsed, error=None):
+        with self._lock:
+            self.samples[name].append(elapsed)
+            if error is not None:
+                self.errors[name] += 1
+                if len(self.error_examples) < 20:
+                    self.error_examples.append(f'{name}: {error}')
+
+
+class SimulatedReviewer(threading.Thread):
+    """
+    按页面的请求模式访问同一日期的一名评审者
+
+    轮询 (事件流不可用时的后备): status 每2秒、status/update 每3秒、
+    judgments 和 sync-status 每5秒；每次按键切换行时更新状态、请求 row files
+    和两张图片，并按概率提交判定。自己最后一次提交的判定记在 last_judgments 中。
+    """
+
+    def __init__(self, user, date, rows, deadline, recorder, args, seed):
+        super().__init__(name=f'reviewer-{user.username}', daemon=True)
+        self.user = user
+        self.date = date
+        self.rows = rows
+        self.deadline = deadline
+        self.recorder = recorder
+        self.args = args
+        self.rng = random.Random(seed)
+        self.version = 0
+        self.current_row = self.rng.randint(1, rows)
+        self.last_judgments = {}  # {row_index: 'exclude'/'suspect'/'cancel'}
+
+    def request(self, name, method, url, data=None):
+        start = time.perf_counter()
+        error = None
+        response = None
+        try:
+            if method == 'POST':
+                response = self.client.post(url, json.dumps(data), content_type='application/json')
+            else:
+                response = self.client.get(url)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            if response.status_code >= 400:
+                error = f'HTTP {response.status_code}'
+        except Exception as e:
+            error = repr(e)
+        self.recorder.record(name, time.perf_counter() - start, error)
+        return response if error is None else None
+
+    def url(self, suffix=''):
+        return f'/east-data/{self.date}/{suffix}'
+
+    def keypress(self):
+        step = 1 if self.rng.random() < 0.8 else -1
+        self.current_row = min(max(self.current_row + step, 1), self.rows)
+        row = self.current_row
+        self.request('status_update', 'POST', self.url('status/update/'), {'row_index': row})
+
+        response = self.request('row_files', 'GET', self.url(f'row/{row}/files/'))
+        if response is not None:
+            info = response.json()
+            names = [f['name'] for side in ('left', 'right') for f in info.get(side, [])
+                     if f['type'] == 'jpg' and f.get('subtype') == 'new']
+            query = f'?w={self.args.image_width}' if self.args.image_width else ''
+            for name in names[:2]:
+                self.request('image', 'GET', self.url(f'image/{name}{query}'))
+
+        if self.rng.random() < self.args.judge_rate:
+            judgment = self.rng.choice(('exclude', 'exclude', 'suspect', 'cancel'))
+            response = self.request('submit_judgment', 'POST', self.url(f'row/{row}/judge/'),
+                                    {'judgment': judgment})
+            if response is not None:
+                self.last_judgments[row] = judgment
+
+    def run(self):
+        from django.db import connection
+        from django.test import Client
+
+        self.client = Client()
+        self.client.force_login(self.user)
+        try:
+            self.request('date_detail', 'GET', self.url())
+            self.request('rows', 'GET', self.url('rows/?offset=0&limit=200'))
+            response = self.request('judgments', 'GET', self.url('judgments/'))
+            if response is not None:
+                self.version = response.json().get('version', 0)
+
+            now = time.monotonic()
+            # 错开各评审者的轮询相位
+            due = {name: now + self.rng.uniform(0, interval) for name, interval in POLL_INTERVALS.items()}
+            due['keypress'] = now + self.rng.expovariate(1 / self.args.keypress_interval)
+            while True:
+                name, when = min(due.items(), key=lambda item: item[1])
+                if when > self.deadline:
+                    break
+                delay = when - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                if name == 'keypress':
+                    self.keypress()
+                    due[name] = time.monotonic() + self.rng.expovariate(1 / self.args.keypress_interval)
+                    continue
+                if name == 'status':
+                    self.request('status', 'GET', self.url('status/'))
+                elif name == 'status_update':
+                    self.request('status_update', 'POST', self.url('status/update/'),
+                                 {'row_index': self.current_row})
+                elif name == 'judgments':
+                    response = self.request('judgments', 'GET', self.url(f'judgments/?since={self.version}'))
+                    if response is not None and response.status_code == 200:  # 304: 没有变化
+                        self.version = response.json().get('version', self.version)
+                elif name == 'sync_status':
+                    self.request('sync_status', 'GET',
+                                 self.url(f'sync-status/?last_check={time.time()}&client_row_count={self.rows}'))
+                due[name] += POLL_INTERVALS[name]
+        finally:
+            connection.close()
+
+
+def check_lost_updates(date, reviewers):
+    """
+    检查最终xlsx中有每名评审者最后一次提交的判定
+
+    只关闭写回队列 (等待后台线程正在写的批次，再写入剩余排队的行)，再由sidecar生成xlsx；
+    不做全量导出，写回过程中丢失的行不会被数据库中的值补上。
+
+    - judge_<user>: 必须等于该用户对该行最后提交的判定 (cancel 为空)
+    - final_judge: 必须等于 judge_<final_by> (最终判定来自最后一次提交)
+
+    Returns:
+        dict: 检查的单元格数和不一致的条目
+    """
+    import openpyxl
+    from data.excel_manager import get_working_excel_path, write_working_excel
+    from data.write_behind import write_behind
+
+    write_behind.shutdown()
+    write_working_excel(date)
+
+    wb = openpyxl.load_workbook(get_working_excel_path(date), read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        headers = list(next(rows))
+        data = [list(row) for row in rows]
+    finally:
+        wb.close()
+    col = {h: i for i, h in enumerate(headers)}
+
+    def cell(row_index, name):
+        row = data[row_index - 1]
+        idx = col.get(name)
+        return (row[idx] if idx is not None and idx < len(row) else None) or ''
+
+    lost, final_mismatches, checked = [], [], 0
+    touched = set()
+    for reviewer in reviewers:
+        username = reviewer.user.username
+        for row_index, judgment in reviewer.last_judgments.items():
+            checked += 1
+            touched.add(row_index)
+            expected = '' if judgment == 'cancel' else judgment
+            actual = cell(row_index, f'judge_{username}')
+            if actual != expected:
+                lost.append({'row': row_index, 'user': username, 'expected': expected, 'actual': actual})
+    for row_index in sorted(touched):
+        final, final_by = cell(row_index, 'final_judge'), cell(row_index, 'final_judge_by')
+        if final and final != cell(row_index, f'judge_{final_by}'):
+            final_mismatches.append({'row': row_index, 'final': final, 'final_by': final_by})
+    return {
+        'checked_cells': checked,
+        'checked_rows': len(touched),
+        'lost_updates': lost[:50],
+        'lost_update_count': len(lost),
+        'final_mismatch_count': len(final_mismatches),
+        'final_mismatches': final_mismatches[:50],
+    }
+
+
+def simulate(args):
+    workdir = Path(tempfile.mkdtemp(prefix='east-load-'))
+    try:
+        configure_django(workdir)
+
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from data.excel_manager import get_working_excel_path, sync_new_rows_from_original
+        from data.locks import lock_manager
+        from .generator import append_rows, generate_night
+
+        date = str(BASE_DATE)
+        excel_path = generate_night(settings.DATA_ROOT, date, args.rows, reviewers=args.reviewers,
+                                    file_rows=args.file_rows, data_file=settings.DATA_FILE, seed=args.seed)
+        # 第一次访问的转换不计入负载
+        get_working_excel_path(date)
+        sync_new_rows_from_original(date)
+        lock_manager.reset_stats()
+
+        users = [User.objects.create_user(f'reviewer{n}', password='load')
+                 for n in range(1, args.reviewers + 1)]
+        recorder = Recorder()
+        start = time.monotonic()
+        deadline = start + args.duration
+        rows = min(args.rows, args.file_rows) if args.file_rows else args.rows
+        reviewers = [SimulatedReviewer(user, date, rows, deadline, recorder, args, args.seed + n)
+                     for n, user in enumerate(users)]
+        for reviewer in reviewers:
+            reviewer.start()
+
+        # 观测过程中原始文件不断增长，定期同步
+        total_rows = args.rows
+        while args.sync_interval and time.monotonic() + args.sync_interval < deadline:
+            time.sleep(args.sync_interval)
+            if args.grow_rows:
+                total_rows = append_rows(excel_path, args.grow_rows, seed=args.seed)
+            sync_start = time.perf_counter()
+            result = sync_new_rows_from_original(date)
+            recorder.record('sync_rows', time.perf_counter() - sync_start,
+                            None if result['success'] else result['message'])
+
+        for reviewer in reviewers:
+            reviewer.join()
+        elapsed = time.monotonic() - start
+
+        total = sum(len(s) for s in recorder.samples.values())
+        lock = lock_manager.stats(date)
+        report = {
+            'meta': {
+                'reviewers': args.reviewers,
+                'duration_s': round(elapsed, 2),
+                'rows': args.rows,
+                'rows_after_sync': total_rows,
+                'keypress_interval_s': args.keypress_interval,
+                'judge_rate': args.judge_rate,
+            },
+            'throughput_rps': round(total / elapsed, 2),
+            'endpoints': {
+                name: dict(latency_stats(samples, elapsed), errors=recorder.errors.get(name, 0))
+                for name, samples in sorted(recorder.samples.items())
+            },
+            'error_count': sum(recorder.errors.values()),
+            'errors': recorder.error_examples,
+            'lock': {
+                'acquisitions': lock['acquisitions'],
+                'contended': lock['contended'],
+                'wait_total_ms': round(lock['wait_total'] * 1000, 3),
+                'wait_max_ms': round(lock['wait_max'] * 1000, 3),
+                'hold_total_ms': round(lock['hold_total'] * 1000, 3),
+                'hold_max_ms': round(lock['hold_max'] * 1000, 3),
+            },
+            'consistency': check_lost_updates(date, reviewers),
+        }
+    finally:
+        if args.keep:
+            print(f'kept load test data in {workdir}', file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.load',
+        description='Simulate K reviewers with the same synthetic night open and report latency, '
+                    'lock wait time and lost updates; exits 1 on lost updates or failed requests')
+    parser.add_argument('-k', '--reviewers', type=int, default=12, help='Simulated reviewers')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to run')
+    parser.add_argument('--rows', type=int, default=10000, help='Rows in the synthetic night')
+    parser.add_argument('--file-rows', type=int, default=2000,
+                        help='Rows with stub files; reviewers stay within them')
+    parser.add_argument('--keypress-interval', type=float, default=1.5,
+                        help='Mean seconds between row changes per reviewer')
+    parser.add_argument('--judge-rate', type=float, default=0.3,
+                        help='Probability of submitting a judgment after a row change')
+    parser.add_argument('--image-width', type=int, default=0,
+                        help='Request ?w= preview variants (needs Pillow); 0 fetches originals')
+    parser.add_argument('--sync-interval', type=float, default=15,
+                        help='Seconds between row syncs (0 disables)')
+    parser.add_argument('--grow-rows', type=int, default=0,
+                        help='Rows appended to the original before each sync')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='Write the report JSON here (default: stdout)')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary data directory')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = simulate(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+    consistency = report['consistency']
+    failed = (consistency['lost_update_count'] or consistency['final_mismatch_count']
+              or report['error_count'])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,302 @@
+# benchmarks/runner.py - 主要请求路径的基准测试 (JSON输出，可与基线比较)
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 基准测试用的日期 (与真实数据不冲突)
+BASE_DATE = 20990101
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+
+
+def configure_django(workdir):
+    """
+    在临时目录下初始化Django: DATA_ROOT、缓存目录和数据库都指向 workdir
+
+    必须在导入任何 data.* 模块之前调用。
+    """
+    os.environ['DATA_ROOT'] = str(workdir / 'data')
+    os.environ['VARIANT_CACHE_DIR'] = str(workdir / 'variants')
+    os.environ['SIDECAR_DIR'] = str(workdir / 'sidecars')
+    os.environ['DEBUG'] = 'False'  # 否则每条SQL都会记录在内存中
+    os.environ['ALLOWED_HOSTS'] = 'testserver'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+    import django
+    from django.db import connection
+
+    django.setup()
+    connection.settings_dict['TEST']['NAME'] = str(workdir / 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+def summarize(samples):
+    """耗时样本 (秒) 的统计，单位毫秒"""
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))]
+    return {
+        'n': len(ms),
+        'min_ms': round(ms[0], 3),
+        'median_ms': round(statistics.median(ms), 3),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'p95_ms': round(p95, 3),
+        'max_ms': round(ms[-1], 3),
+    }
+
+
+def measure(fn, repeat, warmup=1, setup=None):
+    """
+    重复执行 fn 并计时
+
+    Args:
+        fn: 被测函数
+        repeat: 计时次数
+        warmup: 不计时的预热次数
+        setup: 每次执行前调用 (不计时)
+    """
+    samples = []
+    for i in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            samples.append(elapsed)
+    return summarize(samples)
+
+
+def _consume(response, expected=200):
+    if response.status_code != expected:
+        raise RuntimeError(f'{response.request["PATH_INFO"]}: HTTP {response.status_code}')
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+class NightBenchmark:
+    """一个合成观测夜上的全部测试项"""
+
+    def __init__(self, client, date, rows, excel_path, file_rows, repeat, sync_rows, seed):
+        self.client = client
+        self.date = date
+        self.rows = rows
+        self.excel_path = excel_path
+        self.file_rows = file_rows
+        self.repeat = repeat
+        self.sync_rows = sync_rows
+        self.rng = random.Random(seed)
+
+    def url(self, name, *args):
+        from django.urls import reverse
+
+        return reverse(f'data:{name}', args=(self.date,) + args)
+
+    def random_row(self, limit=None):
+        return self.rng.randint(1, min(self.rows, limit or self.rows))
+
+    def run(self):
+        from data.excel_manager import get_working_excel_path, sync_new_rows_from_original
+        from data.file_index import file_index
+        from data.sheet_cache import sheet_cache
+        from .generator import append_rows, make_row, row_file_names
+
+        client = self.client
+        results = {}
+
+        # 首次访问: 复制工作文件、转换sidecar、导入已有判定
+        start = time.perf_counter()
+        _consume(client.get(self.url('date_detail')))
+        results['date_detail_first'] = summarize([time.perf_counter() - start])
+
+        results['date_detail_cold'] = measure(
+            lambda: _consume(client.get(self.url('date_detail'))), self.repeat,
+            setup=sheet_cache.clear)
+        results['date_detail'] = measure(
+            lambda: _consume(client.get(self.url('date_detail'))), self.repeat)
+
+        results['row_files'] = measure(
+            lambda: _consume(client.get(self.url('row_files', self.random_row(self.file_rows)))),
+            self.repeat * 5)
+
+        results['get_judgments'] = measure(
+            lambda: _consume(client.get(self.url('get_judgments'))), self.repeat)
+
+        def submit():
+            body = json.dumps({'judgment': self.rng.choice(('exclude', 'suspect', 'cancel'))})
+            _consume(client.post(self.url('submit_judgment', self.random_row()), body,
+                                 content_type='application/json'))
+
+        results['submit_judgment'] = measure(submit, self.repeat * 5)
+
+        image = next(name for name in row_file_names(make_row(1, random.Random(0)))
+                     if name.endswith('.jpg'))
+        file_index.invalidate(self.date)
+        results['serve_image'] = measure(
+            lambda: _consume(client.get(self.url('serve_image', image))), self.repeat * 5)
+
+        # 原始文件未变化: 只比较校验戳
+        get_working_excel_path(self.date)
+        results['sync_unchanged'] = measure(lambda: sync_new_rows_from_original(self.date), self.repeat)
+
+        def grow():
+            append_rows(self.excel_path, self.sync_rows)
+
+        def sync():
+            result = sync_new_rows_from_original(self.date)
+            if not result['success'] or result['added_rows'] != self.sync_rows:
+                raise RuntimeError(f'sync failed: {result}')
+
+        results['sync_new_rows'] = measure(sync, max(1, self.repeat // 2), warmup=0, setup=grow)
+        return results
+
+
+def run(args):
+    workdir = Path(tempfile.mkdtemp(prefix='east-bench-'))
+    try:
+        configure_django(workdir)
+
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from django.test import Client
+        from data.write_behind import write_behind
+        from .generator import generate_night
+
+        user = User.objects.create_user('bench', password='bench', is_staff=True)
+        client = Client()
+        client.force_login(user)
+
+        nights = []
+        for n, size in enumerate(args.sizes):
+            date = str(BASE_DATE + n)
+            start = time.perf_counter()
+            excel_path = generate_night(settings.DATA_ROOT, date, size, reviewers=args.reviewers,
+                                        file_rows=args.file_rows, data_file=settings.DATA_FILE,
+                                        seed=args.seed + n)
+            print(f'generated {date}: {size} rows in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+            nights.append((date, size, excel_path))
+
+        results = {}
+        for date, size, excel_path in nights:
+            bench = NightBenchmark(client, date, size, excel_path, args.file_rows, args.repeat,
+                                   args.sync_rows, args.seed)
+            for name, stats in bench.run().items():
+                results[f'{name}@{size}'] = stats
+            print(f'finished {size} rows', file=sys.stderr)
+
+        from django.urls import reverse
+
+        list_url = reverse('data:date_list')
+        results['date_list@all'] = measure(lambda: _consume(client.get(list_url)), args.repeat * 5)
+
+        write_behind.flush()
+    finally:
+        if args.keep:
+            print(f'kept benchmark data in {workdir}', file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    import django
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'sizes': list(args.sizes),
+            'reviewers': args.reviewers,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance, min_delta_ms):
+    """
+    按中位数与基线比较
+
+    变慢超过 tolerance (比例) 且绝对差值超过 min_delta_ms 的项视为退化。
+
+    Returns:
+        list: [{'name', 'baseline_ms', 'current_ms', 'ratio', 'regression'}]
+    """
+    rows = []
+    for name, stats in sorted(current['results'].items()):
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        before, after = base['median_ms'], stats['median_ms']
+        ratio = after / before if before else float('inf')
+        rows.append({
+            'name': name,
+            'baseline_ms': before,
+            'current_ms': after,
+            'ratio': round(ratio, 3),
+            'regression': after > before * (1 + tolerance) and after - before > min_delta_ms,
+        })
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Time the main request paths on synthetic nights and compare with a baseline')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        type=lambda s: [int(v) for v in s.split(',') if v],
+                        help='Comma-separated row counts, one synthetic night each (default: %(default)s)')
+    parser.add_argument('--reviewers', type=int, default=3, help='judge_<user> columns per night')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Timed repetitions per case (cheap cases run 5x as many)')
+    parser.add_argument('--file-rows', type=int, default=10000,
+                        help='Create stub FITS/JPG files for at most this many rows per night')
+    parser.add_argument('--sync-rows', type=int, default=100, help='Rows appended before each sync run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='Write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='Results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown of the median before failing (default: %(default)s = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='Ignore slowdowns smaller than this many milliseconds')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary data directory')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparison = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        report['comparison'] = {
+            'baseline': args.baseline,
+            'tolerance': args.tolerance,
+            'min_delta_ms': args.min_delta_ms,
+            'cases': comparison,
+        }
+        for row in comparison:
+            flag = 'REGRESSION' if row['regression'] else 'ok'
+            print(f"{row['name']:<32} {row['baseline_ms']:>10.2f} -> {row['current_ms']:>10.2f} ms "
+                  f"({row['ratio']:.2f}x) {flag}", file=sys.stderr)
+        if any(row['regression'] for row in comparison):
+            exit_code = 1
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+    return exit_code
@@ -24,12 +24,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "data.metrics.metrics_middleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "data.profiling.profiling_middleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -67,6 +69,16 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Judgments are written by many reviewers and the write-behind thread at once:
+        # WAL lets reads run during a write, writers wait up to SQLITE_TIMEOUT seconds for the lock,
+        # and IMMEDIATE transactions take the write lock up front instead of failing on upgrade
+        "OPTIONS": {
+            "timeout": config('SQLITE_TIMEOUT', default=20, cast=int),
+            "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+            "transaction_mode": "IMMEDIATE",
+        },
+        # A file (not in-memory) test database, so concurrency tests see real locking
+        "TEST": {"NAME": BASE_DIR / "test-db.sqlite3"},
     }
 }
 
@@ -87,6 +99,70 @@ DATA_FILE = config('DATA_FILE', default='candidate-final/candidate-final.xlsx')
 # Auto sync config
 AUTO_SYNC_INTERVAL = config('AUTO_SYNC_INTERVAL', default=1800, cast=int)  # seconds
 
+# Parsed sheet cache config (LRU bound on cached dates and estimated bytes)
+SHEET_CACHE_MAX_DATES = config('SHEET_CACHE_MAX_DATES', default=8, cast=int)
+SHEET_CACHE_MAX_BYTES = config('SHEET_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int)
+
+# Working data of each night (SQLite sidecars of the working xlsx). Kept on local disk, outside
+# the candidate directories, so SQLite journal files don't change their mtime
+SIDECAR_DIR = config('SIDECAR_DIR', default=str(BASE_DIR / 'cache' / 'sidecars'))
+
+# Judgments live in the DB; changed rows are written back to the xlsx in batches
+WRITE_BEHIND_MAX_LATENCY = config('WRITE_BEHIND_MAX_LATENCY', default=5, cast=float)  # seconds
+WRITE_BEHIND_MAX_BATCH = config('WRITE_BEHIND_MAX_BATCH', default=500, cast=int)  # rows per date
+
+# Online users / sync events store: MemoryPresenceStore for a single process,
+# DatabasePresenceStore when running several worker processes
+PRESENCE_STORE = config('PRESENCE_STORE', default='data.presence.MemoryPresenceStore')
+
+# Date list: how long a night's directory check is reused before stat-ing it again
+NIGHT_CATALOG_TTL = config('NIGHT_CATALOG_TTL', default=30, cast=int)  # seconds
+
+# Derived files (image thumbnails etc.): LRU disk cache shared by all worker processes
+VARIANT_CACHE_DIR = config('VARIANT_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'variants'))
+VARIANT_CACHE_MAX_BYTES = config('VARIANT_CACHE_MAX_BYTES', default=1024 * 1024 * 1024, cast=int)
+# Image variants served by ?w= (requires Pillow; without it the original is served)
+THUMBNAIL_WIDTHS = config('THUMBNAIL_WIDTHS', default='256,768',
+                          cast=lambda v: tuple(int(w) for w in v.split(',') if w.strip()))
+THUMBNAIL_QUALITY = config('THUMBNAIL_QUALITY', default=85, cast=int)
+
+# FITS previews (requires NumPy): default stretch/interval and the longest side of the PNG
+FITS_PREVIEW_STRETCH = config('FITS_PREVIEW_STRETCH', default='asinh')  # linear, asinh, sqrt, log
+FITS_PREVIEW_INTERVAL = config('FITS_PREVIEW_INTERVAL', default='zscale')  # zscale, minmax, 99.5, 99, 98
+FITS_PREVIEW_ASINH_A = config('FITS_PREVIEW_ASINH_A', default=0.1, cast=float)
+FITS_PREVIEW_MAX_SIZE = config('FITS_PREVIEW_MAX_SIZE', default=1024, cast=int)  # pixels
+# FITS cutouts: default and largest side length
+FITS_CUTOUT_SIZE = config('FITS_CUTOUT_SIZE', default=64, cast=int)  # pixels
+FITS_CUTOUT_MAX_SIZE = config('FITS_CUTOUT_MAX_SIZE', default=256, cast=int)  # pixels
+
+# Images/FITS downloads: browser cache lifetime of the original files (derived previews and
+# thumbnails are revalidated by ETag on every use)
+DATA_FILE_MAX_AGE = config('DATA_FILE_MAX_AGE', default=7 * 24 * 3600, cast=int)  # seconds
+# Let the front proxy send file bodies: '' (Django streams them), 'x-accel-redirect' (nginx)
+# or 'x-sendfile' (Apache mod_xsendfile / lighttpd)
+SENDFILE_BACKEND = config('SENDFILE_BACKEND', default='')
+# X-Accel-Redirect internal locations, 'directory=/internal/prefix/' pairs separated by commas,
+# e.g. 'D:/east-data=/protected/data/,D:/east-check/cache/variants=/protected/variants/'
+SENDFILE_ACCEL_MAP = config('SENDFILE_ACCEL_MAP', default='',
+                            cast=lambda v: dict(item.rsplit('=', 1) for item in v.split(',') if '=' in item))
+
+# Request/phase metrics served at /east-data/metrics in Prometheus text format
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# Scrapers send 'Authorization: Bearer <token>'; logged-in staff can always read them
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Request profiling (cProfile, optionally tracemalloc): staff add ?__profile=1 (or =memory) or an
+# 'X-Profile: 1' header; PROFILE_SAMPLE_RATE of the PROFILE_SAMPLE_VIEWS requests (empty: all views)
+# are profiled too.
+# Results are browsable in the admin; only the newest PROFILE_MAX_COUNT are kept.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'cache' / 'profiles'))
+PROFILE_MAX_COUNT = config('PROFILE_MAX_COUNT', default=200, cast=int)
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', default=0.0, cast=float)  # 0..1
+PROFILE_SAMPLE_VIEWS = config('PROFILE_SAMPLE_VIEWS', default='data:date_detail,data:submit_judgment',
+                              cast=lambda v: tuple(s.strip() for s in v.split(',') if s.strip()))
+PROFILE_SAMPLE_MEMORY = config('PROFILE_SAMPLE_MEMORY', default=False, cast=bool)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
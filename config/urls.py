@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 
 
 @login_required
@@ -15,3 +16,6 @@ urlpatterns = [
     path("east-data/", include("data.urls")),
     path("", home, name="home"),
 ]
+
+# uvicorn does not serve static files like runserver does (only added when DEBUG)
+urlpatterns += staticfiles_urlpatterns()
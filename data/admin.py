@@ -1,3 +1,100 @@
 from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .models import Night, Judgment, FinalJudgment, Remark, Presence, SyncEvent, Profile
+from .profiling import delete_profiles, profile_dir
 
-# Register your models here.
+
+@admin.register(Night)
+class NightAdmin(admin.ModelAdmin):
+    list_display = ('date', 'synced_rows', 'last_synced_at', 'judgments_imported_at')
+    search_fields = ('date',)
+
+
+@admin.register(Judgment)
+class JudgmentAdmin(admin.ModelAdmin):
+    list_display = ('date', 'row_index', 'username', 'value', 'updated_at')
+    list_filter = ('date', 'value')
+    search_fields = ('username',)
+
+
+@admin.register(FinalJudgment)
+class FinalJudgmentAdmin(admin.ModelAdmin):
+    list_display = ('date', 'row_index', 'final', 'final_by', 'updated_at')
+    list_filter = ('date', 'final')
+
+
+@admin.register(Remark)
+class RemarkAdmin(admin.ModelAdmin):
+    list_display = ('date', 'row_index', 'remark', 'updated_by', 'updated_at')
+    list_filter = ('date',)
+
+
+@admin.register(Presence)
+class PresenceAdmin(admin.ModelAdmin):
+    list_display = ('date', 'username', 'row', 'last_seen')
+    list_filter = ('date',)
+
+
+@admin.register(SyncEvent)
+class SyncEventAdmin(admin.ModelAdmin):
+    list_display = ('date', 'sync_count', 'added_rows', 'synced_by', 'total_rows')
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status_code', 'duration_ms', 'memory_peak',
+                    'username', 'trigger')
+    list_filter = ('trigger', 'view_name', 'method')
+    search_fields = ('path', 'view_name', 'username')
+    fields = ('created_at', 'method', 'path', 'view_name', 'status_code', 'duration_ms', 'username',
+              'trigger', 'stats_download', 'stats', 'memory_peak', 'memory')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Stats file')
+    def stats_download(self, obj):
+        if not obj.stats_file:
+            return '-'
+        url = reverse('admin:data_profile_stats', args=(obj.pk,))
+        return format_html('<a href="{}">{}</a> (pstats / snakeviz)', url, obj.stats_file)
+
+    @admin.display(description='cProfile (cumulative)')
+    def stats(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto">{}</pre>', obj.stats_summary)
+
+    @admin.display(description='Top allocations')
+    def memory(self, obj):
+        if not obj.memory_summary:
+            return '-'
+        return format_html('<pre style="white-space: pre; overflow-x: auto">{}</pre>', obj.memory_summary)
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/stats/', self.admin_site.admin_view(self.download_stats),
+                 name='data_profile_stats'),
+        ] + super().get_urls()
+
+    def download_stats(self, request, pk):
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = get_object_or_404(Profile, pk=pk)
+        try:
+            f = open(profile_dir() / profile.stats_file, 'rb')
+        except (FileNotFoundError, IsADirectoryError):
+            raise Http404("Stats file not found")
+        return FileResponse(f, as_attachment=True, filename=profile.stats_file,
+                            content_type='application/octet-stream')
+
+    def delete_model(self, request, obj):
+        delete_profiles([obj])
+
+    def delete_queryset(self, request, queryset):
+        delete_profiles(queryset)
@@ -0,0 +1,391 @@
+# data/candidate_table.py - 候选体表的列式内存结构
+
+import math
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # 可选，只用于 as_numpy()
+    np = None
+
+_INT_MIN, _INT_MAX = -(2 ** 63), 2 ** 63 - 1
+# 整数列中表示空单元格的值
+_INT_MISSING = _INT_MIN
+# 浮点数能精确表示的最大整数
+_FLOAT_EXACT_INT = 2 ** 53
+# 估算 object 列大小时采样的值数
+_SIZE_SAMPLE = 200
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class IntColumn:
+    """整数列 (array('q'))，空单元格存为 _INT_MISSING"""
+
+    __slots__ = ('data',)
+    kind = 'int'
+
+    def __init__(self, values=()):
+        self.data = array('q', (_INT_MISSING if v is None else v for v in values))
+
+    @staticmethod
+    def accepts(value):
+        return value is None or (isinstance(value, int) and not isinstance(value, bool)
+                                 and _INT_MIN < value <= _INT_MAX)
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, i):
+        value = self.data[i]
+        return None if value == _INT_MISSING else value
+
+    def set(self, i, value):
+        self.data[i] = _INT_MISSING if value is None else value
+
+    def append(self, value):
+        self.data.append(_INT_MISSING if value is None else value)
+
+    def extend_missing(self, count):
+        self.data.extend(array('q', [_INT_MISSING]) * count)
+
+    def values(self):
+        return [None if v == _INT_MISSING else v for v in self.data]
+
+    def copy(self):
+        column = IntColumn()
+        column.data = self.data[:]
+        return column
+
+    def nbytes(self):
+        return sys.getsizeof(self.data)
+
+
+class FloatColumn:
+    """
+    浮点列 (array('d'))，空单元格存为NaN (Excel中不会出现NaN)
+
+    整数和小数混合的列 (如 15 和 15.5) 也用此类型：存为整数的行号记录在 ints 中，
+    取值时还原为int，导出的值与读入时一致。
+    """
+
+    __slots__ = ('data', 'ints')
+    kind = 'float'
+
+    def __init__(self, values=()):
+        self.data = array('d')
+        self.ints = set()
+        for value in values:
+            self.append(value)
+
+    @staticmethod
+    def accepts(value):
+        # 超出 2**53 的整数转成浮点数会丢失精度
+        return value is None or isinstance(value, float) or (
+            _is_number(value) and -_FLOAT_EXACT_INT <= value <= _FLOAT_EXACT_INT)
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, i):
+        value = self.data[i]
+        if value != value:
+            return None
+        return int(value) if i in self.ints else value
+
+    def set(self, i, value):
+        self.data[i] = math.nan if value is None else value
+        if isinstance(value, int):
+            self.ints.add(i)
+        else:
+            self.ints.discard(i)
+
+    def append(self, value):
+        if isinstance(value, int):
+            self.ints.add(len(self.data))
+        self.data.append(math.nan if value is None else value)
+
+    def extend_missing(self, count):
+        self.data.extend(array('d', [math.nan]) * count)
+
+    def values(self):
+        ints = self.ints
+        return [None if v != v else int(v) if i in ints else v for i, v in enumerate(self.data)]
+
+    def copy(self):
+        column = FloatColumn()
+        column.data = self.data[:]
+        column.ints = set(self.ints)
+        return column
+
+    def nbytes(self):
+        return sys.getsizeof(self.data) + sys.getsizeof(self.ints)
+
+
+class StrColumn:
+    """
+    字符串列 (字典编码)
+
+    每个不同的字符串只保存一次 (并经 sys.intern 驻留，多个日期之间共享)，
+    每行只存一个 array('I') 编码；编码0表示空单元格。
+    """
+
+    __slots__ = ('codes', 'lookup', 'index')
+    kind = 'str'
+
+    def __init__(self, values=()):
+        self.lookup = [None]
+        self.index = {}
+        self.codes = array('I', (self._encode(v) for v in values))
+
+    @staticmethod
+    def accepts(value):
+        return value is None or isinstance(value, str)
+
+    def _encode(self, value):
+        if value is None:
+            return 0
+        code = self.index.get(value)
+        if code is None:
+            code = len(self.lookup)
+            value = sys.intern(value)
+            self.lookup.append(value)
+            self.index[value] = code
+        return code
+
+    def __len__(self):
+        return len(self.codes)
+
+    def get(self, i):
+        return self.lookup[self.codes[i]]
+
+    def set(self, i, value):
+        self.codes[i] = self._encode(value)
+
+    def append(self, value):
+        self.codes.append(self._encode(value))
+
+    def extend_missing(self, count):
+        self.codes.extend(array('I', [0]) * count)
+
+    def values(self):
+        lookup = self.lookup
+        return [lookup[c] for c in self.codes]
+
+    def copy(self):
+        column = StrColumn()
+        column.codes = self.codes[:]
+        column.lookup = self.lookup[:]
+        column.index = dict(self.index)
+        return column
+
+    def nbytes(self):
+        # 驻留的字符串可能被其他日期共享，这里按独占估算 (偏大)
+        return (sys.getsizeof(self.codes) + sys.getsizeof(self.lookup) + sys.getsizeof(self.index)
+                + sum(sys.getsizeof(v) for v in self.lookup))
+
+
+class ObjectColumn:
+    """其他类型 (日期时间、混合类型等) 的列，普通列表"""
+
+    __slots__ = ('data',)
+    kind = 'object'
+
+    def __init__(self, values=()):
+        self.data = list(values)
+
+    @staticmethod
+    def accepts(value):
+        return True
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, i):
+        return self.data[i]
+
+    def set(self, i, value):
+        self.data[i] = value
+
+    def append(self, value):
+        self.data.append(value)
+
+    def extend_missing(self, count):
+        self.data.extend([None] * count)
+
+    def values(self):
+        return list(self.data)
+
+    def copy(self):
+        return ObjectColumn(self.data)
+
+    def nbytes(self):
+        sample = self.data[:_SIZE_SAMPLE]
+        per_value = sum(sys.getsizeof(v) for v in sample if v is not None) / len(sample) if sample else 0
+        return sys.getsizeof(self.data) + int(per_value * len(self.data))
+
+
+def make_column(values):
+    """按列中的值选择最紧凑的列类型 (全空的列按字符串列处理，通常是判定/备注列)"""
+    if all(v is None for v in values):
+        return StrColumn(values)
+    for column_type in (IntColumn, FloatColumn, StrColumn):
+        if all(column_type.accepts(v) for v in values):
+            return column_type(values)
+    return ObjectColumn(values)
+
+
+class RowView:
+    """表中一行的只读视图，按列索引取值 (不复制数据)"""
+
+    __slots__ = ('_columns', '_i')
+
+    def __init__(self, columns, i):
+        self._columns = columns
+        self._i = i
+
+    @property
+    def index(self):
+        """数据行号 (从1开始)"""
+        return self._i + 1
+
+    def __getitem__(self, col):
+        if isinstance(col, slice):
+            return [c.get(self._i) for c in self._columns[col]]
+        return self._columns[col].get(self._i)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def __iter__(self):
+        i = self._i
+        return (c.get(i) for c in self._columns)
+
+    def to_list(self):
+        return list(self)
+
+    def __repr__(self):
+        return f'RowView({self.index}, {self.to_list()!r})'
+
+
+class CandidateTable:
+    """
+    候选体表的列式存储
+
+    每列按内容选用 array('q') / array('d') / 字典编码字符串 / 列表，
+    比逐行的 list-of-lists 节省大部分内存 (没有每个单元格一个Python对象的开销)。
+    写入类型不符的值时该列自动升级为更通用的类型。
+    """
+
+    def __init__(self, headers, columns):
+        self.headers = headers
+        self.columns = columns  # 与 headers 一一对应
+        self.row_count = len(columns[0]) if columns else 0
+
+    @classmethod
+    def from_rows(cls, headers, rows):
+        """
+        由逐行数据构建
+
+        Args:
+            headers: 表头列表
+            rows: 可迭代的行 (序列)，缺少的单元格为None，超出表头的单元格被忽略
+        """
+        width = len(headers)
+        raw = [[] for _ in range(width)]
+        for row in rows:
+            n = min(len(row), width)
+            for c in range(n):
+                raw[c].append(row[c])
+            for c in range(n, width):
+                raw[c].append(None)
+        columns = []
+        for c in range(width):
+            columns.append(make_column(raw[c]))
+            raw[c] = None  # 尽早释放临时列表
+        return cls(list(headers), columns)
+
+    def copy(self):
+        """独立的副本 (数组整块复制，之后对原表的修改不影响副本)"""
+        table = CandidateTable(list(self.headers), [column.copy() for column in self.columns])
+        table.row_count = self.row_count
+        return table
+
+    def row(self, row_index):
+        """按数据行号 (从1开始) 取行视图，不存在返回None"""
+        if 1 <= row_index <= self.row_count:
+            return RowView(self.columns, row_index - 1)
+        return None
+
+    def iter_rows(self, start=1, stop=None):
+        """行号 start..stop (含) 的行视图"""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        columns = self.columns
+        for i in range(max(start, 1) - 1, stop):
+            yield RowView(columns, i)
+
+    def column_values(self, col):
+        """一整列的值 (列表)"""
+        return self.columns[col].values()
+
+    def as_numpy(self, col):
+        """
+        数值列的 NumPy 视图 (不复制；整数列中的空值为最小int64，浮点列为NaN)
+
+        Raises:
+            TypeError: 不是数值列
+            RuntimeError: 未安装 NumPy
+        """
+        if np is None:
+            raise RuntimeError('需要安装 NumPy')
+        column = self.columns[col]
+        if column.kind == 'int':
+            return np.frombuffer(column.data, dtype=np.int64)
+        if column.kind == 'float':
+            return np.frombuffer(column.data, dtype=np.float64)
+        raise TypeError(f'不是数值列: {self.headers[col]}')
+
+    def add_column(self, name):
+        """追加一列 (全部为空)，返回列索引"""
+        column = StrColumn()
+        column.extend_missing(self.row_count)
+        self.headers.append(name)
+        self.columns.append(column)
+        return len(self.columns) - 1
+
+    def _column_for(self, col, value):
+        """
+        返回能存放 value 的列，必要时把该列升级为更通用的类型
+
+        升级后的列替换 self.columns 中的同一位置，已有的行视图引用的是同一个列表，仍然有效。
+        """
+        column = self.columns[col]
+        if column.accepts(value):
+            return column
+        values = column.values()
+        for column_type in (FloatColumn, StrColumn):
+            if column_type.accepts(value) and all(column_type.accepts(v) for v in values):
+                break
+        else:
+            column_type = ObjectColumn
+        column = self.columns[col] = column_type(values)
+        return column
+
+    def set_cell(self, row_index, col, value):
+        """修改一个单元格 (行号从1开始，行号超出时先补空行)"""
+        while self.row_count < row_index:
+            self.append_row(())
+        self._column_for(col, value).set(row_index - 1, value)
+
+    def append_row(self, row):
+        """在表尾追加一行，缺少的单元格为None，超出表头的单元格被忽略"""
+        for c in range(len(self.columns)):
+            value = row[c] if c < len(row) else None
+            self._column_for(c, value).append(value)
+        self.row_count += 1
+
+    def nbytes(self):
+        return sum(column.nbytes() for column in self.columns) + sys.getsizeof(self.columns)
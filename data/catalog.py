@@ -0,0 +1,152 @@
+# data/catalog.py - 观测夜目录及审核进度统计的缓存
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+from django.db.models import Count
+from .metrics import phase
+
+DATE_DIR_PATTERN = re.compile(r'^\d{8}$')
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+class NightCatalog:
+    """
+    日期列表页使用的观测夜目录
+
+    - 日期目录列表: 按 DATA_ROOT 的 mtime 校验，新建/删除日期目录时才重新列目录
+    - 每个日期是否有数据: 按候选体目录的 mtime 校验，每个日期最多每 ttl 秒 stat 一次
+    - 审核进度: 按 Night 的 (version, synced_rows, last_synced_at) 校验，
+      判定或同步之后只重新统计发生变化的日期 (每次一条 Night 查询)；
+      还没有同步水位线的日期用 sidecar 中的行数，校验戳再加上候选体目录的 mtime
+    - 在线审核人: 每次从在线状态存储读取，不缓存
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._root_mtime = None
+        self._dates = []
+        self._dirs = {}   # {date: (checked_monotonic, dir_mtime_ns, has_data)}
+        self._stats = {}  # {date: (stamp, stats)}
+        self._lock = threading.Lock()
+
+    def _ttl(self):
+        return settings.NIGHT_CATALOG_TTL if self.ttl is None else self.ttl
+
+    def _list_dates(self, data_root):
+        mtime = _mtime_ns(data_root)
+        if mtime is None:
+            self._root_mtime, self._dates = None, []
+        elif mtime != self._root_mtime:
+            with phase('directory_scan'), os.scandir(data_root) as it:
+                dates = [entry.name for entry in it
+                         if entry.is_dir() and DATE_DIR_PATTERN.match(entry.name)]
+            self._root_mtime, self._dates = mtime, sorted(dates, reverse=True)
+        return self._dates
+
+    def _has_data(self, data_root, date):
+        now = time.monotonic()
+        cached = self._dirs.get(date)
+        if cached is not None and now - cached[0] < self._ttl():
+            return cached[2]
+
+        data_file = data_root / date / settings.DATA_FILE
+        dir_mtime = _mtime_ns(data_file.parent)
+        if cached is not None and cached[1] == dir_mtime:
+            has_data = cached[2]
+        else:
+            has_data = dir_mtime is not None and data_file.exists()
+        self._dirs[date] = (now, dir_mtime, has_data)
+        return has_data
+
+    def _refresh_stats(self, dates):
+        """重新统计校验戳已变化的日期"""
+        from .excel_manager import known_row_count
+        from .models import Night, FinalJudgment
+
+        nights = {date: (version, synced_rows, last_synced_at)
+                  for date, version, synced_rows, last_synced_at in
+                  Night.objects.filter(date__in=dates)
+                  .values_list('date', 'version', 'synced_rows', 'last_synced_at')}
+
+        stamps = {}
+        for date in dates:
+            night = nights.get(date)
+            # 未同步过的日期: 工作文件/sidecar 创建后目录 mtime 变化，重新读取行数
+            stamps[date] = (night, self._dirs[date][1] if night is None or night[1] is None else None)
+
+        stale = [date for date in dates
+                 if date not in self._stats or self._stats[date][0] != stamps[date]]
+        if not stale:
+            return
+
+        finals = {date: {} for date in stale}
+        for date, final, count in (FinalJudgment.objects.filter(date__in=stale)
+                                   .exclude(final='')
+                                   .values_list('date', 'final')
+                                   .annotate(count=Count('id'))):
+            finals[date][final] = count
+
+        for date in stale:
+            night = nights.get(date)
+            total_rows = night[1] if night else None
+            if total_rows is None:
+                total_rows = known_row_count(date)
+            judged = sum(finals[date].values())
+            self._stats[date] = (stamps[date], {
+                # 行数来自同步水位线或sidecar，从未打开过的日期为None
+                'total_rows': total_rows,
+                'judged': judged,
+                'unjudged': max(total_rows - judged, 0) if total_rows is not None else None,
+                'finals': finals[date],
+                'last_synced_at': night[2] if night else None,
+            })
+
+    def nights(self):
+        """
+        所有日期 (新的在前) 及其审核进度
+
+        Returns:
+            list: [{'name', 'has_data', 'total_rows', 'judged', 'unjudged',
+                    'finals': {final: count}, 'last_synced_at', 'reviewers': [在线用户名]}]
+        """
+        from .presence import get_presence_store
+
+        data_root = Path(settings.DATA_ROOT)
+        active = get_presence_store().active_users()
+        with self._lock:
+            dates = self._list_dates(data_root)
+            has_data = {date: self._has_data(data_root, date) for date in dates}
+            self._refresh_stats([date for date in dates if has_data[date]])
+
+            nights = []
+            for date in dates:
+                night = {'name': date, 'has_data': has_data[date]}
+                if has_data[date]:
+                    night.update(self._stats[date][1])
+                    night['reviewers'] = sorted(active.get(date, ()))
+                nights.append(night)
+            return nights
+
+    def invalidate(self, date=None):
+        """丢弃缓存 (date 为 None 时全部丢弃)"""
+        with self._lock:
+            if date is None:
+                self._root_mtime = None
+                self._dirs.clear()
+                self._stats.clear()
+            else:
+                self._dirs.pop(date, None)
+                self._stats.pop(date, None)
+
+
+night_catalog = NightCatalog()
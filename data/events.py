@@ -0,0 +1,92 @@
+# data/events.py - 按日期的事件推送 (Server-Sent Events)
+
+import asyncio
+import json
+import threading
+
+# 每个订阅者缓冲的最大事件数，超出后丢弃 (客户端重连后会重新拉取全量)
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class Subscription:
+    """一个事件流连接的订阅，只能在创建它的事件循环中使用"""
+
+    def __init__(self, bus, date):
+        self.bus = bus
+        self.date = date
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, item):
+        # 在订阅者的事件循环线程中执行
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout):
+        """等待下一个事件，超时返回None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    进程内的发布/订阅
+
+    publish 可以在任意线程 (包括同步视图) 中调用，事件通过
+    call_soon_threadsafe 投递到各个订阅者所在的事件循环。
+    """
+
+    def __init__(self):
+        self._subscribers = {}  # {date: set(Subscription)}
+        self._lock = threading.Lock()
+
+    def subscribe(self, date):
+        sub = Subscription(self, date)
+        with self._lock:
+            self._subscribers.setdefault(date, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.date)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.date]
+
+    def subscriber_count(self, date):
+        with self._lock:
+            return len(self._subscribers.get(date, ()))
+
+    def publish(self, date, event, data):
+        """
+        向某日期的所有订阅者推送事件
+
+        Args:
+            date: 日期字符串 (YYYYMMDD 格式)
+            event: 事件类型 ('presence' / 'judgments' / 'sync')
+            data: 可JSON序列化的数据
+        """
+        with self._lock:
+            subs = list(self._subscribers.get(date, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, (event, data))
+            except RuntimeError:
+                # 事件循环已关闭
+                self.unsubscribe(sub)
+
+
+event_bus = EventBus()
+
+
+def format_sse(event, data):
+    """编码为一条 text/event-stream 消息"""
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n'
@@ -1,9 +1,21 @@
 # data/excel_manager.py - Excel 文件管理模块
 
+import logging
 import shutil
 from pathlib import Path
 from datetime import datetime
 from django.conf import settings
+from django.utils import timezone
+from .file_index import file_index
+from .locks import working_file_lock
+from .metrics import phase, sync_rows_added
+from .sheet_cache import sheet_cache, sheet_stamp
+from .sidecar import CandidateSidecar, file_stamp
+
+logger = logging.getLogger(__name__)
+
+# 已解析的工作文件路径 {date: Path}，避免每次请求都glob整个目录
+_working_paths = {}
 
 
 def get_working_excel_path(date):
@@ -28,26 +40,50 @@ def get_working_excel_path(date):
     if not original_path.exists():
         raise FileNotFoundError(f"原始Excel文件不存在: {original_path}")
 
+    cached = _working_paths.get(date)
+    if cached is not None and cached.exists():
+        return cached
+
     # 工作文件目录 (与原始文件同目录)
     excel_dir = original_path.parent
 
-    # 查找是否已存在该日期的工作文件
-    existing_file = _find_existing_working_file(excel_dir, date)
+    # 加锁后再查找/复制，避免多个进程各自复制出一份工作文件
+    with working_file_lock(date):
+        # 查找是否已存在该日期的工作文件
+        existing_file = _find_existing_working_file(excel_dir, date)
 
-    if existing_file:
-        return existing_file
+        if existing_file:
+            _working_paths[date] = existing_file
+            return existing_file
 
-    # 生成新的工作文件名（带时间戳）
-    now = datetime.now().strftime('%Y%m%d-%H%M%S')
-    working_filename = f"candidate-final-{date}-{now}.xlsx"
-    working_path = excel_dir / working_filename
+        # 生成新的工作文件名（带时间戳）
+        now = datetime.now().strftime('%Y%m%d-%H%M%S')
+        working_filename = f"candidate-final-{date}-{now}.xlsx"
+        working_path = excel_dir / working_filename
 
-    # 复制原始文件一次
-    shutil.copy2(original_path, working_path)
+        # 复制原始文件一次
+        shutil.copy2(original_path, working_path)
 
+    _working_paths[date] = working_path
     return working_path
 
 
+def known_row_count(date):
+    """
+    已转换过的工作数据的行数 (不复制原始文件，不解析xlsx)
+
+    Returns:
+        int: 工作文件或其sidecar还不存在时返回None
+    """
+    working_path = _working_paths.get(date)
+    if working_path is None:
+        excel_dir = Path(settings.DATA_ROOT) / date / Path(settings.DATA_FILE).parent
+        working_path = _find_existing_working_file(excel_dir, date)
+        if working_path is None:
+            return None
+    return CandidateSidecar(working_path).row_count()
+
+
 def _find_existing_working_file(excel_dir, date):
     """
     查找该日期是否已存在工作文件
@@ -84,8 +120,6 @@ def sync_new_rows_from_original(date):
             'message': str
         }
     """
-    import openpyxl
-
     data_root = Path(settings.DATA_ROOT)
     data_file = settings.DATA_FILE
 
@@ -112,77 +146,198 @@ def sync_new_rows_from_original(date):
         }
 
     try:
-        # 读取原始文件
-        wb_original = openpyxl.load_workbook(original_path, read_only=True)
-        ws_original = wb_original.active
-        original_rows = list(ws_original.iter_rows(values_only=True))
-        wb_original.close()
-
-        # 读取工作文件
-        wb_working = openpyxl.load_workbook(working_path)
-        ws_working = wb_working.active
-        working_rows = list(ws_working.iter_rows(values_only=True))
-
-        # 检查表头是否一致（比较数据列）
-        if len(original_rows) == 0 or len(working_rows) == 0:
-            wb_working.close()
-            return {
-                'success': False,
-                'added_rows': 0,
-                'total_rows': len(working_rows) - 1 if working_rows else 0,
-                'message': 'Excel文件为空'
-            }
-
-        original_header = original_rows[0]
-        working_header = working_rows[0]
-
-        # 获取工作副本中的数据列数（原始列数）
-        original_col_count = len(original_header)
-
-        # 当前工作副本的数据行数
-        current_row_count = len(working_rows) - 1  # 不含表头
-        original_row_count = len(original_rows) - 1  # 不含表头
-
-        # 如果原始文件行数 <= 工作副本行数，无需同步
-        if original_row_count <= current_row_count:
-            wb_working.close()
-            return {
-                'success': True,
-                'added_rows': 0,
-                'total_rows': current_row_count,
-                'message': f'无新行需要同步（原始: {original_row_count}行, 副本: {current_row_count}行）'
-            }
-
-        # 复制新行（从工作副本的下一行开始）
-        added_count = 0
-        for i in range(current_row_count + 1, original_row_count + 1):
-            original_row = original_rows[i]  # 原始文件的第i行（从1开始，0是表头）
-            new_row_index = len(working_rows) + 1  # 工作副本的新行号
-
-            # 只复制原始数据列
-            for col_idx in range(original_col_count):
-                if col_idx < len(original_row):
-                    ws_working.cell(row=new_row_index, column=col_idx + 1, value=original_row[col_idx])
-
-            working_rows.append(original_row)  # 更新working_rows列表
-            added_count += 1
-
-        # 保存工作文件
-        wb_working.save(working_path)
-        wb_working.close()
+        # 与判定导出等写操作互斥（含其他进程）
+        with working_file_lock(date):
+            return _sync_tail(date, original_path, working_path)
 
+    except Exception as e:
+        return {
+            'success': False,
+            'added_rows': 0,
+            'total_rows': 0,
+            'message': f'同步失败: {str(e)}'
+        }
+
+
+def _read_original(original_path, min_row):
+    """
+    只读流式读取原始Excel活动表
+
+    Returns:
+        tuple: (表头, 第 min_row 行起的数据行列表 (只保留表头宽度的列))，文件为空时表头为None
+    """
+    import openpyxl
+
+    with phase('workbook_load'):
+        wb = openpyxl.load_workbook(original_path, read_only=True)
+        try:
+            ws = wb.active
+            header = next(ws.iter_rows(max_row=1, values_only=True), None)
+            if not header:
+                return None, []
+            width = len(header)
+            rows = [row[:width] for row in ws.iter_rows(min_row=min_row, values_only=True)]
+        finally:
+            wb.close()
+    return header, rows
+
+
+def _same_row(original_row, working_row, width):
+    """原始文件中的行与工作数据中同一行的原始列是否一致"""
+    if original_row is None or working_row is None:
+        return False
+    original = list(original_row[:width]) + [None] * (width - len(original_row))
+    working = list(working_row[:width]) + [None] * (width - len(working_row))
+    return original == working
+
+
+def _sync_tail(date, original_path, working_path):
+    """
+    按水位线增量同步 (调用方需持有该日期的写锁)
+
+    水位线记录已同步的数据行数以及当时原始文件的 (mtime, size)：
+    原始文件未变化时直接跳过；否则从水位线处的行开始读取，该行与工作数据一致
+    (原始文件只是被追加) 时一次性追加之后的行，不一致或已不存在
+    (原始文件被改写、截短或替换) 时全量同步。
+    """
+    from .models import Night
+
+    night, _ = Night.objects.get_or_create(date=date)
+    original_stamp = file_stamp(original_path)
+
+    if night.synced_rows is None:
+        # 首次同步: 以工作副本当前的数据行数作为水位线
+        night.synced_rows = sheet_cache.get(working_path).row_count
+    elif (night.original_mtime_ns, night.original_size) == original_stamp:
         return {
             'success': True,
-            'added_rows': added_count,
-            'total_rows': len(working_rows) - 1,
-            'message': f'成功同步 {added_count}行新数据'
+            'added_rows': 0,
+            'total_rows': night.synced_rows,
+            'message': f'原始文件未变化，无新行需要同步（副本: {night.synced_rows}行）'
         }
 
-    except Exception as e:
+    current_row_count = night.synced_rows
+
+    # 第 current_row_count 个数据行在Excel的第 current_row_count + 1 行
+    original_header, tail = _read_original(original_path, current_row_count + 1 if current_row_count else 2)
+    if not original_header:
         return {
             'success': False,
             'added_rows': 0,
-            'total_rows': 0,
-            'message': f'同步失败: {str(e)}'
+            'total_rows': current_row_count,
+            'message': 'Excel文件为空'
         }
 
+    resynced = False
+    if current_row_count:
+        width = len(original_header)
+        if _same_row(tail[0] if tail else None, sheet_cache.get(working_path).get_row(current_row_count), width):
+            new_rows = tail[1:]
+        else:
+            resynced = True
+    else:
+        new_rows = tail
+
+    if resynced:
+        # 判定按行号保存，原始文件中行的顺序变化后判定会对应到新的行
+        logger.warning('原始Excel已被改写或替换，全量同步: %s', original_path)
+        _, rows = _read_original(original_path, 2)
+        CandidateSidecar(working_path).replace_rows(rows)
+        sheet_cache.invalidate(working_path)
+        added_rows = max(len(rows) - current_row_count, 0)
+        night.synced_rows = len(rows)
+    else:
+        added_rows = len(new_rows)
+        if new_rows:
+            # 追加到sidecar (按行号插入，不需要重写xlsx)，并扩展缓存中的行索引
+            stamp = sheet_stamp(working_path)
+            CandidateSidecar(working_path).append_rows(new_rows, current_row_count + 1)
+            sheet_cache.append_rows(working_path, new_rows, stamp)
+        night.synced_rows = current_row_count + added_rows
+    if added_rows:
+        sync_rows_added.inc(added_rows)
+
+    night.original_mtime_ns, night.original_size = original_stamp
+    night.last_synced_at = timezone.now()
+    night.save(update_fields=['synced_rows', 'original_mtime_ns', 'original_size', 'last_synced_at'])
+
+    if resynced:
+        message = f'原始文件已被改写，已全量同步（副本: {night.synced_rows}行）'
+    elif not added_rows:
+        message = f'无新行需要同步（副本: {night.synced_rows}行）'
+    else:
+        message = f'成功同步 {added_rows}行新数据'
+    return {
+        'success': True,
+        'added_rows': added_rows,
+        'total_rows': night.synced_rows,
+        'message': message
+    }
+
+
+def write_judgments(date, row_indexes=None):
+    """
+    把数据库中的判定和备注写入工作数据 (sidecar)
+    (judge_<user> / final_judge / final_judge_by / final_remark 列)
+
+    Args:
+        date: 日期字符串 (YYYYMMDD 格式)
+        row_indexes: 只写入这些行，None表示全部
+
+    Returns:
+        int: 写入的行数
+
+    Raises:
+        FileNotFoundError: 原始或工作Excel文件不存在
+    """
+    from .judgment_store import ensure_imported, load_cell_values
+
+    working_path = get_working_excel_path(date)
+    ensure_imported(date)
+    cells = load_cell_values(date, row_indexes)
+    if not cells:
+        return 0
+
+    with working_file_lock(date):
+        stamp = sheet_stamp(working_path)
+        CandidateSidecar(working_path).set_cells(cells)
+        sheet_cache.update(working_path, cells, stamp)
+
+    return len(cells)
+
+
+def write_working_excel(date):
+    """
+    把sidecar中的修改写回工作Excel (没有未导出的修改时不写，也不加锁)
+
+    Returns:
+        Path: 工作Excel文件路径
+
+    Raises:
+        FileNotFoundError: 原始或工作Excel文件不存在
+    """
+    working_path = get_working_excel_path(date)
+    sidecar = CandidateSidecar(working_path)
+    if not sidecar.is_dirty():
+        return working_path
+    with working_file_lock(date), file_index.replacing(date):
+        stamp = sheet_stamp(working_path)
+        if sidecar.write_xlsx():
+            # 数据没有变化，只刷新缓存的校验戳
+            sheet_cache.update(working_path, {}, stamp)
+    return working_path
+
+
+def export_judgments_to_excel(date):
+    """
+    把数据库中的全部判定和备注写回工作Excel
+
+    Returns:
+        int: 写回的行数
+
+    Raises:
+        FileNotFoundError: 原始或工作Excel文件不存在
+    """
+    count = write_judgments(date)
+    write_working_excel(date)
+    return count
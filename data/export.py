@@ -0,0 +1,216 @@
+# data/export.py - 候选体和判定结果的流式导出 (CSV / JSON Lines / xlsx)
+
+import csv
+import datetime
+import io
+import json
+from django.db import transaction
+
+# 格式 → (Content-Type, 扩展名)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+# 不作为列过滤条件的查询参数 (另外以 _ 开头的参数也忽略，如 ?_=时间戳、__profile)
+RESERVED_PARAMS = ('format', 'columns')
+
+# 显式指定列过滤条件的前缀 (?filter.final_judge=suspect)，列不存在时报错
+FILTER_PREFIX = 'filter.'
+
+# 判定/备注列: 还没有人判定过的日期也视为存在 (全部为空)
+JUDGMENT_COLUMNS = ('final_judge', 'final_judge_by', 'final_remark')
+
+# 每次输出的行数
+CHUNK_ROWS = 500
+
+
+def is_judgment_column(name):
+    return name in JUDGMENT_COLUMNS or name.startswith('judge_')
+
+
+def parse_filters(params):
+    """
+    从查询参数中解析列过滤条件 (?final_judge=suspect,exclude&attribute=new)
+
+    多个值用逗号分隔 (满足任意一个即可)，空值匹配空单元格。带 FILTER_PREFIX 前缀的参数
+    一定是过滤条件；其他参数只有在列存在时才作为过滤条件 (见 CandidateExport 的 loose_filters)，
+    保留参数和以 _ 开头的参数忽略。
+
+    Returns:
+        tuple: (filters, loose_filters)，均为 {列名: set(值)}
+    """
+    filters, loose = {}, {}
+    for name in params:
+        if name in RESERVED_PARAMS or name.startswith('_'):
+            continue
+        values = set()
+        for value in params.getlist(name) if hasattr(params, 'getlist') else [params[name]]:
+            values.update(value.split(','))
+        if name.startswith(FILTER_PREFIX):
+            filters[name[len(FILTER_PREFIX):]] = values
+        else:
+            loose[name] = values
+    return filters, loose
+
+
+def _cell_text(value):
+    return '' if value is None else str(value)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return str(value)
+
+
+class CandidateExport:
+    """
+    某日期工作数据和判定结果的一致快照
+
+    数据行来自缓存工作表的独立副本，判定/备注列用数据库中的最新值覆盖 (包括还在写回队列中的改动)。
+    快照建立后不持有任何锁，输出再慢也不会阻塞评审者的写入。
+
+    Args:
+        date: 日期字符串 (YYYYMMDD 格式)
+        filters: {列名: set(值)}，见 parse_filters()
+        columns: 只输出这些列 (默认全部)；每行前都有 row_index
+        loose_filters: 同 filters，但忽略不存在的列 (查询参数中不带前缀的条件)
+
+    判定/备注列 (final_judge、judge_<用户> 等) 即使还不存在也可以用于过滤和输出，值全部为空。
+
+    Raises:
+        FileNotFoundError: 原始或工作Excel文件不存在
+        ValueError: 过滤条件或输出列中有不存在的列
+    """
+
+    def __init__(self, date, filters=None, columns=None, loose_filters=None):
+        from .excel_manager import get_working_excel_path
+        from .judgment_store import ensure_imported, load_cell_values
+        from .sheet_cache import sheet_cache
+
+        self.date = date
+        working_path = get_working_excel_path(date)
+        ensure_imported(date)
+        sheet = sheet_cache.snapshot(working_path)
+        with transaction.atomic():
+            cells = load_cell_values(date)
+        for row_index, values in cells.items():
+            sheet.set_cells(row_index, values)
+
+        filters = dict(filters or {})
+        for name, values in (loose_filters or {}).items():
+            if name in sheet.header_map or is_judgment_column(name):
+                filters.setdefault(name, set()).update(values)
+        for name in list(filters) + list(columns or []):
+            if name not in sheet.header_map and is_judgment_column(name):
+                sheet.ensure_column(name)
+        unknown = [c for c in list(filters) + list(columns or []) if c not in sheet.header_map]
+        if unknown:
+            raise ValueError(f'Unknown columns: {", ".join(unknown)}')
+
+        self.sheet = sheet
+        self.headers = list(columns) if columns else list(sheet.headers)
+        self.col_indexes = [sheet.header_map[c] for c in self.headers]
+        self.row_indexes = self._matching_rows(filters)
+
+    def _matching_rows(self, filters):
+        """按列整体比较过滤条件，返回匹配的数据行号"""
+        matched = None
+        for name, allowed in filters.items():
+            values = self.sheet.column_values(self.sheet.header_map[name])
+            rows = {i for i, value in enumerate(values, start=1) if _cell_text(value) in allowed}
+            matched = rows if matched is None else matched & rows
+        if matched is None:
+            return range(1, self.sheet.row_count + 1)
+        return sorted(matched)
+
+    @property
+    def row_count(self):
+        return len(self.row_indexes)
+
+    @property
+    def filename(self):
+        return f'candidates-{self.date}'
+
+    def iter_rows(self):
+        """[row_index, 各输出列的值] (按行号顺序)"""
+        table = self.sheet.table
+        col_indexes = self.col_indexes
+        for row_index in self.row_indexes:
+            row = table.row(row_index)
+            yield [row_index] + [row[c] for c in col_indexes]
+
+    def _chunks(self, lines):
+        buffer = []
+        for line in lines:
+            buffer.append(line)
+            if len(buffer) >= CHUNK_ROWS:
+                yield ''.join(buffer)
+                buffer = []
+        if buffer:
+            yield ''.join(buffer)
+
+    def iter_csv(self):
+        """逐块生成CSV文本 (每块 CHUNK_ROWS 行)"""
+        out = io.StringIO()
+        writer = csv.writer(out)
+
+        def lines():
+            for row in self.iter_rows():
+                writer.writerow(row)
+                line = out.getvalue()
+                out.seek(0)
+                out.truncate()
+                yield line
+
+        writer.writerow(['row_index'] + self.headers)
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+        yield from self._chunks(lines())
+
+    def iter_jsonl(self):
+        """逐块生成JSON Lines文本，每行一个 {列名: 值} 对象"""
+        keys = ['row_index'] + self.headers
+
+        def lines():
+            for row in self.iter_rows():
+                yield json.dumps(dict(zip(keys, row)), default=_json_default, ensure_ascii=False) + '\n'
+
+        return self._chunks(lines())
+
+    def write_xlsx(self, target):
+        """
+        用openpyxl只写模式写入xlsx (行数据边生成边写入临时文件，内存占用与行数无关)
+
+        Args:
+            target: 文件路径或可写的二进制文件对象
+        """
+        import openpyxl
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(self.date)
+        ws.append(['row_index'] + self.headers)
+        for row in self.iter_rows():
+            ws.append(row)
+        wb.save(target)
+
+    def write(self, fmt, target):
+        """
+        按格式写入文件对象 (csv/jsonl 为文本，xlsx 为二进制)
+
+        Raises:
+            ValueError: 不支持的格式
+        """
+        if fmt == 'xlsx':
+            self.write_xlsx(target)
+        elif fmt == 'csv':
+            target.writelines(self.iter_csv())
+        elif fmt == 'jsonl':
+            target.writelines(self.iter_jsonl())
+        else:
+            raise ValueError(f'Unsupported format: {fmt}')
@@ -0,0 +1,151 @@
+# data/file_index.py - 候选体目录的文件名索引
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+from .metrics import phase
+
+# 每个候选体的文件后缀 (文件名为 attribute_seq_base + 后缀)
+FITS_SUFFIXES = ('_lib.fits', '_new.fits')
+JPG_SUFFIXES = ('_SEPlib.jpg', '_SEPnew.jpg')
+ROW_FILE_SUFFIXES = FITS_SUFFIXES + JPG_SUFFIXES
+
+
+def candidate_dir(date):
+    """某日期的候选体文件目录 (与数据Excel同目录)"""
+    return Path(settings.DATA_ROOT) / date / Path(settings.DATA_FILE).parent
+
+
+class DirectoryIndex:
+    """一次 os.scandir 得到的目录快照"""
+
+    def __init__(self, path, mtime_ns, names):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.names = frozenset(names)
+        # {attribute_seq_base: {后缀: 文件名}}
+        self.by_prefix = {}
+        for name in self.names:
+            for suffix in ROW_FILE_SUFFIXES:
+                if name.endswith(suffix):
+                    self.by_prefix.setdefault(name[:-len(suffix)], {})[suffix] = name
+                    break
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def files_for(self, prefix):
+        """某个候选体前缀的所有文件 {后缀: 文件名}"""
+        return self.by_prefix.get(prefix, {})
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def scan_directory(path):
+    """
+    扫描目录中的普通文件
+
+    Returns:
+        DirectoryIndex: 目录不存在时返回None
+    """
+    try:
+        with phase('directory_scan'):
+            mtime_ns = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                names = [entry.name for entry in it if entry.is_file()]
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return DirectoryIndex(path, mtime_ns, names)
+
+
+class FileIndexCache:
+    """
+    按日期缓存目录索引
+
+    每次查询只对目录做一次 stat，目录 mtime 变化 (新增/删除/重命名文件) 时
+    重新 scandir；候选体目录在网络存储上，逐个文件 stat 的代价很高。
+    """
+
+    def __init__(self):
+        self._indexes = {}  # {date: DirectoryIndex}
+        self._lock = threading.Lock()
+
+    def get(self, date):
+        """
+        获取某日期的目录索引
+
+        Returns:
+            DirectoryIndex: 目录不存在时返回None
+        """
+        path = candidate_dir(date)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            self.invalidate(date)
+            return None
+
+        with self._lock:
+            index = self._indexes.get(date)
+        if index is not None and index.mtime_ns == mtime_ns:
+            return index
+
+        index = scan_directory(path)
+        with self._lock:
+            if index is None:
+                self._indexes.pop(date, None)
+            else:
+                self._indexes[date] = index
+        return index
+
+    @contextmanager
+    def replacing(self, date):
+        """
+        本程序原地替换候选体目录中的文件 (文件名不变，如重新生成工作Excel) 时使用，
+        替换造成的目录 mtime 变化不使索引失效
+
+        Usage:
+            with file_index.replacing(date):
+                os.replace(tmp_path, path)
+
+        进入前目录已有其他变化 (与索引记录的 mtime 不一致) 时照常失效；
+        替换期间其他进程的修改会被忽略，直到目录下次变化。
+        """
+        path = candidate_dir(date)
+        before = _mtime_ns(path)
+        yield
+        after = _mtime_ns(path)
+        with self._lock:
+            index = self._indexes.get(date)
+            if index is not None and before is not None and after is not None and index.mtime_ns == before:
+                index.mtime_ns = after
+
+    def invalidate(self, date):
+        with self._lock:
+            self._indexes.pop(date, None)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+file_index = FileIndexCache()
+
+
+def find_file(date, filename):
+    """
+    在索引中查找候选体目录下的文件
+
+    Returns:
+        Path: 文件路径，不存在时返回None
+    """
+    index = file_index.get(date)
+    if index is None or filename not in index:
+        return None
+    return index.path / filename
@@ -0,0 +1,181 @@
+# data/file_serving.py - 数据文件的下载响应 (条件请求 / Range / sendfile)
+
+import os
+import re
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+# 分段读取文件时每块的大小
+CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_validators(stat_result):
+    """
+    由 (mtime_ns, size) 生成强校验值
+
+    Returns:
+        tuple: (etag, last_modified)，last_modified 为秒级时间戳
+    """
+    etag = quote_etag(f'{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}')
+    return etag, int(stat_result.st_mtime)
+
+
+def parse_range(header, size):
+    """
+    解析单个字节范围 (bytes=start-end / bytes=start- / bytes=-suffix)
+
+    多段范围或无法解析的值按规范忽略 (返回整个文件)。
+
+    Returns:
+        tuple: (start, end) 闭区间；None 表示返回整个文件
+
+    Raises:
+        ValueError: 范围无法满足 (应返回416)
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # 最后 N 个字节
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError(header)
+    end = int(last) if last else size - 1
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def _if_range_passes(request, etag, last_modified):
+    """If-Range 与当前文件匹配时才使用 Range，否则返回整个文件"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+class _FileRange:
+    """
+    文件中一段字节的分块迭代器
+
+    StreamingHttpResponse 在响应关闭时调用 close()，即使正文从未被读取 (如HEAD请求或客户端断开)，
+    文件也会被关闭。
+    """
+
+    def __init__(self, path, start, length):
+        self.file = open(path, 'rb')
+        self.start = start
+        self.length = length
+
+    def __iter__(self):
+        f = self.file
+        f.seek(self.start)
+        remaining = self.length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        self.file.close()
+
+
+def _sendfile_location(path):
+    """X-Accel-Redirect 的内部地址 (文件不在任何映射目录下时返回None)"""
+    resolved = Path(path).resolve()
+    for root, prefix in settings.SENDFILE_ACCEL_MAP.items():
+        try:
+            relative = resolved.relative_to(Path(root).resolve())
+        except ValueError:
+            continue
+        return prefix.rstrip('/') + '/' + relative.as_posix()
+    return None
+
+
+def _set_common_headers(response, etag, last_modified, content_type=None, filename=None, immutable=True):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # 需要登录，所以只允许浏览器缓存
+    if immutable:
+        response['Cache-Control'] = f'private, max-age={settings.DATA_FILE_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    response['Accept-Ranges'] = 'bytes'
+    if content_type:
+        response['Content-Type'] = content_type
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def serve_file(request, path, content_type, filename=None, immutable=True):
+    """
+    返回一个数据文件
+
+    - ETag/Last-Modified 校验，命中时返回304 (或前置条件失败的412)
+    - 单段 Range 请求返回206，无法满足时返回416
+    - settings.SENDFILE_BACKEND 为 'x-accel-redirect' 或 'x-sendfile' 时，
+      只返回头部，由前端代理 (nginx/Apache) 发送文件内容和处理Range
+
+    Args:
+        path: 文件路径
+        content_type: Content-Type
+        filename: 指定时作为附件下载
+        immutable: 浏览器在 DATA_FILE_MAX_AGE 内直接使用缓存 (写入后不再修改的数据文件)；
+            为False时每次用ETag重新验证 (由源文件生成的预览/缩略图: URL不随源文件变化，
+            源文件被原地替换后必须能拿到新的结果)
+
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag, last_modified = file_validators(stat_result)
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return _set_common_headers(conditional, etag, last_modified, immutable=immutable)
+
+    backend = settings.SENDFILE_BACKEND
+    if backend == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = str(Path(path).resolve())
+        return _set_common_headers(response, etag, last_modified, content_type, filename, immutable)
+    if backend == 'x-accel-redirect':
+        location = _sendfile_location(path)
+        if location is not None:
+            response = HttpResponse()
+            response['X-Accel-Redirect'] = location
+            return _set_common_headers(response, etag, last_modified, content_type, filename, immutable)
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and request.method in ('GET', 'HEAD') and _if_range_passes(request, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return _set_common_headers(response, etag, last_modified, immutable=immutable)
+
+    start, end = byte_range if byte_range else (0, size - 1)
+    length = end - start + 1 if size else 0
+    response = StreamingHttpResponse(_FileRange(path, start, length), status=206 if byte_range else 200)
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return _set_common_headers(response, etag, last_modified, content_type, filename, immutable)
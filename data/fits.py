@@ -0,0 +1,249 @@
+# data/fits.py - FITS 头解析与图像数据的内存映射读取
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖，只有预览/裁剪功能需要
+    np = None
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+
+# BITPIX → 大端 dtype
+BITPIX_DTYPES = {
+    8: 'u1',
+    16: '>i2',
+    32: '>i4',
+    64: '>i8',
+    -32: '>f4',
+    -64: '>f8',
+}
+
+
+class FitsError(ValueError):
+    """不支持或损坏的FITS文件"""
+
+
+def numpy_available():
+    return np is not None
+
+
+def _parse_value(raw):
+    raw = raw.strip()
+    if raw.startswith("'"):
+        # 字符串值，'' 表示转义的单引号
+        end = 1
+        chars = []
+        while end < len(raw):
+            if raw[end] == "'":
+                if raw[end + 1:end + 2] == "'":
+                    chars.append("'")
+                    end += 2
+                    continue
+                break
+            chars.append(raw[end])
+            end += 1
+        return ''.join(chars).rstrip()
+    value = raw.split('/', 1)[0].strip()
+    if value == 'T':
+        return True
+    if value == 'F':
+        return False
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value.replace('D', 'E'))
+    except ValueError:
+        return value or None
+
+
+class FitsImage:
+    """
+    一个图像HDU: 头关键字和数据在文件中的位置
+
+    Attributes:
+        header: {关键字: 值}
+        offset: 数据起始的字节偏移
+        shape: (NAXIS2, NAXIS1)，多维数据只取第一个平面
+    """
+
+    def __init__(self, path, header, offset):
+        self.path = path
+        self.header = header
+        self.offset = offset
+        self.bitpix = header['BITPIX']
+        if self.bitpix not in BITPIX_DTYPES:
+            raise FitsError(f'不支持的BITPIX: {self.bitpix}')
+        self.shape = (header['NAXIS2'], header['NAXIS1'])
+        self.bscale = header.get('BSCALE', 1.0)
+        self.bzero = header.get('BZERO', 0.0)
+        self.blank = header.get('BLANK') if self.bitpix > 0 else None
+
+    @property
+    def dtype(self):
+        return BITPIX_DTYPES[self.bitpix]
+
+    @property
+    def row_nbytes(self):
+        return self.shape[1] * abs(self.bitpix) // 8
+
+    def memmap(self):
+        """原始数据的只读内存映射 (只有被访问的页才会从磁盘读取)"""
+        if np is None:
+            raise RuntimeError('需要安装 NumPy')
+        return np.memmap(self.path, dtype=self.dtype, mode='r', offset=self.offset, shape=self.shape)
+
+    def physical(self, raw):
+        """把原始值换算为物理值 (float32)，BLANK 像素置为NaN"""
+        data = raw.astype(np.float32)
+        if self.blank is not None:
+            data[raw == self.blank] = np.nan
+        if self.bscale != 1 or self.bzero != 0:
+            data = data * np.float32(self.bscale) + np.float32(self.bzero)
+        return data
+
+
+def _read_header(f):
+    """从当前位置读取一个头，返回 ({关键字: 值}, 读取的字节数)"""
+    header = {}
+    consumed = 0
+    while True:
+        block = f.read(BLOCK_SIZE)
+        if len(block) < BLOCK_SIZE:
+            raise FitsError('FITS头不完整')
+        consumed += BLOCK_SIZE
+        for i in range(0, BLOCK_SIZE, CARD_SIZE):
+            card = block[i:i + CARD_SIZE].decode('ascii', errors='replace')
+            keyword = card[:8].strip()
+            if keyword == 'END':
+                return header, consumed
+            if card[8:10] == '= ' and keyword not in header:
+                header[keyword] = _parse_value(card[10:])
+
+
+def _data_nbytes(header):
+    naxis = header.get('NAXIS', 0)
+    if naxis == 0:
+        return 0
+    count = 1
+    for axis in range(1, naxis + 1):
+        count *= header.get(f'NAXIS{axis}', 0)
+    count = header.get('GCOUNT', 1) * (header.get('PCOUNT', 0) + count)
+    nbytes = count * abs(header.get('BITPIX', 8)) // 8
+    return (nbytes + BLOCK_SIZE - 1) // BLOCK_SIZE * BLOCK_SIZE
+
+
+def open_image(path):
+    """
+    找到文件中第一个二维 (或更高维) 图像HDU
+
+    主HDU没有数据时 (NAXIS=0) 继续查找 IMAGE 扩展；不支持压缩图像 (BINTABLE)。
+
+    Raises:
+        FitsError: 文件中没有可用的图像
+    """
+    with open(path, 'rb') as f:
+        if f.read(6) != b'SIMPLE':
+            raise FitsError('不是FITS文件')
+        f.seek(0)
+        position = 0
+        while True:
+            try:
+                header, consumed = _read_header(f)
+            except FitsError:
+                break
+            offset = position + consumed
+            if header.get('NAXIS', 0) >= 2 and header.get('XTENSION', 'IMAGE') == 'IMAGE':
+                return FitsImage(path, header, offset)
+            position = offset + _data_nbytes(header)
+            f.seek(position)
+    raise FitsError('FITS文件中没有图像数据')
+
+
+class TanWCS:
+    """
+    简单的 TAN (gnomonic) 投影WCS，只使用线性部分 (CD 或 CDELT/PC/CROTA2)
+
+    带 -SIP 的头忽略畸变项，对小视场内的裁剪定位足够。
+    """
+
+    def __init__(self, crval, crpix, cd):
+        self.crval = crval
+        self.crpix = crpix
+        self.cd = cd
+        (a, b), (c, d) = cd
+        det = a * d - b * c
+        if det == 0:
+            raise FitsError('WCS的CD矩阵不可逆')
+        self.inverse = ((d / det, -b / det), (-c / det, a / det))
+
+    @classmethod
+    def from_header(cls, header):
+        """
+        从FITS头构造WCS
+
+        Returns:
+            TanWCS: 头中没有TAN投影的天球坐标时返回None
+        """
+        ctype1 = str(header.get('CTYPE1', ''))
+        ctype2 = str(header.get('CTYPE2', ''))
+        if not (ctype1.startswith('RA') and ctype2.startswith('DEC')
+                and '-TAN' in ctype1 and '-TAN' in ctype2):
+            return None
+        try:
+            crval = (float(header['CRVAL1']), float(header['CRVAL2']))
+            crpix = (float(header['CRPIX1']), float(header['CRPIX2']))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        if 'CD1_1' in header or 'CD2_2' in header:
+            cd = ((header.get('CD1_1', 0.0), header.get('CD1_2', 0.0)),
+                  (header.get('CD2_1', 0.0), header.get('CD2_2', 0.0)))
+        else:
+            cdelt1 = header.get('CDELT1', 1.0)
+            cdelt2 = header.get('CDELT2', 1.0)
+            if any(key in header for key in ('PC1_1', 'PC1_2', 'PC2_1', 'PC2_2')):
+                pc = ((header.get('PC1_1', 1.0), header.get('PC1_2', 0.0)),
+                      (header.get('PC2_1', 0.0), header.get('PC2_2', 1.0)))
+                cd = ((cdelt1 * pc[0][0], cdelt1 * pc[0][1]),
+                      (cdelt2 * pc[1][0], cdelt2 * pc[1][1]))
+            else:
+                # AIPS 约定: 先按 CDELT 缩放像素轴再旋转 (CDi_j = CDELTj 乘旋转矩阵的 (i, j) 元素)
+                rot = math.radians(header.get('CROTA2', 0.0))
+                cd = ((cdelt1 * math.cos(rot), -cdelt2 * math.sin(rot)),
+                      (cdelt1 * math.sin(rot), cdelt2 * math.cos(rot)))
+        return cls(crval, crpix, cd)
+
+    def world_to_pixel(self, ra, dec):
+        """
+        天球坐标 (度) → FITS像素坐标 (从1开始)
+
+        Raises:
+            ValueError: 位置在投影切平面的背面
+        """
+        ra0, dec0 = math.radians(self.crval[0]), math.radians(self.crval[1])
+        ra, dec = math.radians(ra), math.radians(dec)
+        cos_c = (math.sin(dec0) * math.sin(dec)
+                 + math.cos(dec0) * math.cos(dec) * math.cos(ra - ra0))
+        if cos_c <= 0:
+            raise ValueError('位置不在该图像的投影范围内')
+        xi = math.degrees(math.cos(dec) * math.sin(ra - ra0) / cos_c)
+        eta = math.degrees((math.cos(dec0) * math.sin(dec)
+                            - math.sin(dec0) * math.cos(dec) * math.cos(ra - ra0)) / cos_c)
+        (a, b), (c, d) = self.inverse
+        return self.crpix[0] + a * xi + b * eta, self.crpix[1] + c * xi + d * eta
+
+    def pixel_to_world(self, x, y):
+        """FITS像素坐标 (从1开始) → 天球坐标 (度)"""
+        (a, b), (c, d) = self.cd
+        dx, dy = x - self.crpix[0], y - self.crpix[1]
+        xi = math.radians(a * dx + b * dy)
+        eta = math.radians(c * dx + d * dy)
+        ra0, dec0 = math.radians(self.crval[0]), math.radians(self.crval[1])
+        denom = math.cos(dec0) - eta * math.sin(dec0)
+        ra = ra0 + math.atan2(xi, denom)
+        dec = math.atan2(math.sin(dec0) + eta * math.cos(dec0), math.hypot(xi, denom))
+        return math.degrees(ra) % 360.0, math.degrees(dec)
@@ -0,0 +1,154 @@
+# data/fits_cutout.py - 候选体位置附近的FITS裁剪
+
+from django.conf import settings
+from .fits import BLOCK_SIZE, CARD_SIZE, FitsError, TanWCS, open_image, np
+
+# 复制到裁剪结果中的关键字 (WCS 和观测信息)，CRPIX 会按裁剪原点平移
+_COPIED_KEYWORDS = (
+    'CTYPE1', 'CTYPE2', 'CUNIT1', 'CUNIT2', 'CRVAL1', 'CRVAL2', 'CRPIX1', 'CRPIX2',
+    'CD1_1', 'CD1_2', 'CD2_1', 'CD2_2', 'CDELT1', 'CDELT2',
+    'PC1_1', 'PC1_2', 'PC2_1', 'PC2_2', 'CROTA2',
+    'EQUINOX', 'RADESYS', 'DATE-OBS', 'MJD-OBS', 'EXPTIME', 'FILTER', 'OBJECT',
+)
+
+
+def parse_cutout(params):
+    """
+    解析裁剪参数
+
+    位置用 x/y (FITS像素坐标，从1开始) 或 ra/dec (度) 指定；
+    size 为边长 (像素)，format 为 'fits' 或 'raw' (小端 float32)。
+
+    Returns:
+        dict: {'x', 'y', 'ra', 'dec', 'size', 'format'}
+
+    Raises:
+        ValueError: 参数缺失或无效
+    """
+    def number(name):
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f'无效的参数 {name}: {value}')
+
+    spec = {name: number(name) for name in ('x', 'y', 'ra', 'dec')}
+    has_pixel = spec['x'] is not None and spec['y'] is not None
+    has_sky = spec['ra'] is not None and spec['dec'] is not None
+    if not has_pixel and not has_sky:
+        raise ValueError('需要指定 x/y 或 ra/dec')
+
+    size = params.get('size') or settings.FITS_CUTOUT_SIZE
+    try:
+        size = int(size)
+    except ValueError:
+        raise ValueError(f'无效的尺寸: {size}')
+    if not 1 <= size <= settings.FITS_CUTOUT_MAX_SIZE:
+        raise ValueError(f'尺寸必须在 1 到 {settings.FITS_CUTOUT_MAX_SIZE} 之间')
+    spec['size'] = size
+
+    spec['format'] = params.get('format', 'fits')
+    if spec['format'] not in ('fits', 'raw'):
+        raise ValueError(f'不支持的格式: {spec["format"]}')
+    return spec
+
+
+class Cutout:
+    """
+    裁剪结果
+
+    Attributes:
+        data: float32 数组 (size, size)，超出图像的部分为NaN
+        origin: 裁剪区域左下角在原图中的 (x, y) 像素坐标 (从1开始)
+        header: 原图的头关键字
+    """
+
+    def __init__(self, data, origin, header):
+        self.data = data
+        self.origin = origin
+        self.header = header
+
+
+def make_cutout(path, size, x=None, y=None, ra=None, dec=None):
+    """
+    以某个位置为中心裁剪图像
+
+    通过内存映射只读取裁剪区域覆盖的行，I/O 与裁剪大小成正比而不是整个文件。
+
+    Raises:
+        FitsError: 文件不支持，或按 ra/dec 定位但没有TAN WCS
+        ValueError: 位置不在图像的投影范围内
+    """
+    image = open_image(path)
+    if x is None or y is None:
+        wcs = TanWCS.from_header(image.header)
+        if wcs is None:
+            raise FitsError('FITS头中没有可用的TAN WCS，请用 x/y 指定位置')
+        x, y = wcs.world_to_pixel(ra, dec)
+
+    height, width = image.shape
+    # 中心像素 (从0开始) 和裁剪区域在原图中的范围
+    x0 = int(round(x)) - 1 - size // 2
+    y0 = int(round(y)) - 1 - size // 2
+    data = np.full((size, size), np.nan, dtype=np.float32)
+
+    src_x0, src_x1 = max(x0, 0), min(x0 + size, width)
+    src_y0, src_y1 = max(y0, 0), min(y0 + size, height)
+    if src_x0 < src_x1 and src_y0 < src_y1:
+        raw = image.memmap()
+        window = np.array(raw[src_y0:src_y1, src_x0:src_x1])
+        del raw
+        data[src_y0 - y0:src_y1 - y0, src_x0 - x0:src_x1 - x0] = image.physical(window)
+
+    return Cutout(data, (x0 + 1, y0 + 1), image.header)
+
+
+def _format_card(keyword, value):
+    if isinstance(value, bool):
+        text = ('T' if value else 'F').rjust(20)
+    elif isinstance(value, int):
+        text = str(value).rjust(20)
+    elif isinstance(value, float):
+        text = repr(value).upper().rjust(20)
+    else:
+        escaped = str(value).replace("'", "''")
+        text = f"'{escaped.ljust(8)}'".ljust(20)
+    return f'{keyword.ljust(8)}= {text}'[:CARD_SIZE].ljust(CARD_SIZE)
+
+
+def encode_fits(cutout):
+    """裁剪结果编码为只有主HDU的最小FITS (BITPIX=-32)"""
+    height, width = cutout.data.shape
+    cards = [
+        _format_card('SIMPLE', True),
+        _format_card('BITPIX', -32),
+        _format_card('NAXIS', 2),
+        _format_card('NAXIS1', width),
+        _format_card('NAXIS2', height),
+    ]
+    for keyword in _COPIED_KEYWORDS:
+        value = cutout.header.get(keyword)
+        if value is None:
+            continue
+        if keyword == 'CRPIX1':
+            value = float(value) - (cutout.origin[0] - 1)
+        elif keyword == 'CRPIX2':
+            value = float(value) - (cutout.origin[1] - 1)
+        cards.append(_format_card(keyword, value))
+    # IRAF 约定: 物理坐标 = 图像坐标 - LTV
+    cards.append(_format_card('LTV1', float(1 - cutout.origin[0])))
+    cards.append(_format_card('LTV2', float(1 - cutout.origin[1])))
+    cards.append('END'.ljust(CARD_SIZE))
+
+    header = ''.join(cards).encode('ascii', errors='replace')
+    header += b' ' * (-len(header) % BLOCK_SIZE)
+    body = cutout.data.astype('>f4').tobytes()
+    body += b'\0' * (-len(body) % BLOCK_SIZE)
+    return header + body
+
+
+def encode_raw(cutout):
+    """裁剪结果的原始 float32 (小端，按行存储，第一行为 y 最小的一行)"""
+    return cutout.data.astype('<f4').tobytes()
@@ -0,0 +1,154 @@
+# data/fits_preview.py - FITS 图像的拉伸预览 (PNG)
+
+import struct
+import zlib
+from django.conf import settings
+from .fits import open_image, np
+from .variant_cache import variant_cache, variant_key
+
+STRETCHES = ('linear', 'asinh', 'sqrt', 'log')
+INTERVALS = ('zscale', 'minmax', '99.5', '99', '98')
+
+# zscale 采样的像素数
+ZSCALE_SAMPLES = 1000
+
+
+def parse_preview(params):
+    """
+    解析预览参数 (?stretch=asinh&interval=zscale)，缺省值来自 settings
+
+    Returns:
+        tuple: (stretch, interval)
+
+    Raises:
+        ValueError: 参数不受支持
+    """
+    stretch = params.get('stretch') or settings.FITS_PREVIEW_STRETCH
+    interval = params.get('interval') or settings.FITS_PREVIEW_INTERVAL
+    if stretch not in STRETCHES:
+        raise ValueError(f'不支持的拉伸: {stretch}')
+    if interval not in INTERVALS:
+        raise ValueError(f'不支持的范围: {interval}')
+    return stretch, interval
+
+
+def zscale_limits(samples, contrast=0.25, max_reject=0.5, min_npixels=5, krej=2.5, max_iterations=5):
+    """
+    IRAF zscale 算法: 对排序后的采样值做带迭代剔除的直线拟合，
+    以中值为中心、按斜率/contrast 确定显示范围
+
+    Returns:
+        tuple: (vmin, vmax)
+    """
+    samples = np.sort(samples[np.isfinite(samples)])
+    npix = samples.size
+    if npix == 0:
+        return 0.0, 1.0
+    zmin, zmax = float(samples[0]), float(samples[-1])
+    center = (npix - 1) // 2
+    median = float(np.median(samples))
+
+    minpix = max(min_npixels, int(npix * max_reject))
+    x = np.arange(npix, dtype=np.float64)
+    good = np.ones(npix, dtype=bool)
+    ngood, last_ngood = npix, npix + 1
+    slope = 0.0
+    for _ in range(max_iterations):
+        if ngood >= last_ngood or ngood < minpix:
+            break
+        slope, intercept = np.polyfit(x[good], samples[good], 1)
+        residual = samples - (intercept + slope * x)
+        threshold = krej * residual[good].std()
+        last_ngood = ngood
+        good = np.abs(residual) <= threshold
+        ngood = int(good.sum())
+
+    if ngood >= minpix and contrast > 0:
+        slope /= contrast
+        zmin = max(zmin, median - (center - 1) * slope)
+        zmax = min(zmax, median + (npix - center) * slope)
+    return zmin, zmax
+
+
+def interval_limits(data, interval):
+    finite = data[np.isfinite(data)]
+    if finite.size == 0:
+        return 0.0, 1.0
+    if interval == 'zscale':
+        step = max(1, finite.size // ZSCALE_SAMPLES)
+        return zscale_limits(finite[::step])
+    if interval == 'minmax':
+        return float(finite.min()), float(finite.max())
+    percent = float(interval)
+    low, high = np.percentile(finite, [(100 - percent) / 2, 100 - (100 - percent) / 2])
+    return float(low), float(high)
+
+
+def stretch_values(data, vmin, vmax, stretch):
+    """归一化到 [0, 1] 后应用拉伸函数"""
+    scale = vmax - vmin if vmax > vmin else 1.0
+    x = np.clip((data - vmin) / scale, 0.0, 1.0)
+    if stretch == 'asinh':
+        a = settings.FITS_PREVIEW_ASINH_A
+        return np.arcsinh(x / a) / np.arcsinh(1.0 / a)
+    if stretch == 'sqrt':
+        return np.sqrt(x)
+    if stretch == 'log':
+        a = 1000.0
+        return np.log1p(a * x) / np.log1p(a)
+    return x
+
+
+def encode_png(pixels):
+    """8位灰度数组编码为PNG (每行无滤波，zlib压缩)"""
+    height, width = pixels.shape
+    raw = np.zeros((height, width + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels
+    compressed = zlib.compress(raw.tobytes(), 6)
+
+    def chunk(kind, body):
+        return (struct.pack('>I', len(body)) + kind + body
+                + struct.pack('>I', zlib.crc32(kind + body) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', compressed)
+            + chunk(b'IEND', b''))
+
+
+def render_preview(path, stretch, interval, max_size):
+    """
+    渲染FITS预览PNG
+
+    图像通过内存映射读取，超过 max_size 时按步长抽样，只会读取被访问到的页。
+    按天文习惯把第一行 (y=1) 放在底部。
+    """
+    image = open_image(path)
+    raw = image.memmap()
+    step = max(1, -(-max(image.shape) // max_size))
+    data = image.physical(np.asarray(raw[::step, ::step]))
+    del raw
+
+    vmin, vmax = interval_limits(data, interval)
+    values = stretch_values(data, vmin, vmax, stretch)
+    pixels = np.nan_to_num(values * 255.0 + 0.5, nan=0.0).astype(np.uint8)
+    return encode_png(pixels[::-1])
+
+
+def get_preview(path, stretch, interval):
+    """
+    获取 (必要时渲染并缓存) FITS预览图
+
+    Returns:
+        Path: PNG文件路径
+
+    Raises:
+        FileNotFoundError: 源文件不存在
+        FitsError: 不支持的FITS文件
+    """
+    max_size = settings.FITS_PREVIEW_MAX_SIZE
+    params = (stretch, interval, max_size)
+    if stretch == 'asinh':
+        params += (settings.FITS_PREVIEW_ASINH_A,)
+    key = variant_key(path, 'fits-preview', *params)
+    return variant_cache.get_or_create(key, 'png', lambda: render_preview(path, stretch, interval, max_size))
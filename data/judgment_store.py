@@ -0,0 +1,251 @@
+# data/judgment_store.py - 判定与备注的数据库存储
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Night, Judgment, FinalJudgment, Remark
+
+# 本进程已确认导入过Excel判定列的日期
+_imported_dates = set()
+
+
+def ensure_imported(date):
+    """
+    首次访问某日期时，把工作Excel中已有的判定列导入数据库
+
+    Args:
+        date: 日期字符串 (YYYYMMDD 格式)
+
+    Raises:
+        FileNotFoundError: 原始或工作Excel文件不存在
+    """
+    if date in _imported_dates:
+        return
+
+    night, _ = Night.objects.get_or_create(date=date)
+    if night.judgments_imported_at is None:
+        from .sheet_cache import get_sheet
+
+        sheet = get_sheet(date)
+        judge_cols, final_col, final_by_col, remark_col = sheet.judgment_columns()
+
+        def column(col_idx):
+            # 整列读取 (列式存储下比逐行取单元格快)，空单元格为 ''
+            if col_idx is None:
+                return [''] * sheet.row_count
+            return ['' if v is None else str(v) for v in sheet.column_values(col_idx)]
+
+        judgments, finals, remarks = [], [], []
+        for username, col_idx in judge_cols.items():
+            for row_idx, value in enumerate(column(col_idx), start=1):
+                if value:
+                    judgments.append(Judgment(date=date, row_index=row_idx,
+                                              username=username, value=value))
+        final_by_values = column(final_by_col)
+        for row_idx, final in enumerate(column(final_col), start=1):
+            if final:
+                finals.append(FinalJudgment(date=date, row_index=row_idx, final=final,
+                                            final_by=final_by_values[row_idx - 1]))
+        for row_idx, remark in enumerate(column(remark_col), start=1):
+            if remark:
+                remarks.append(Remark(date=date, row_index=row_idx, remark=remark))
+
+        with transaction.atomic():
+            night = Night.objects.select_for_update().get(pk=night.pk)
+            if night.judgments_imported_at is None:
+                Judgment.objects.bulk_create(judgments, ignore_conflicts=True)
+                FinalJudgment.objects.bulk_create(finals, ignore_conflicts=True)
+                Remark.objects.bulk_create(remarks, ignore_conflicts=True)
+                night.judgments_imported_at = timezone.now()
+                night.save(update_fields=['judgments_imported_at'])
+
+    _imported_dates.add(date)
+
+
+def _next_version(date):
+    """在当前事务内递增并返回该日期的变更版本号"""
+    Night.objects.filter(date=date).update(version=F('version') + 1)
+    return Night.objects.filter(date=date).values_list('version', flat=True).get()
+
+
+def current_version(date):
+    """该日期当前的变更版本号 (日期未知时为0)"""
+    return Night.objects.filter(date=date).values_list('version', flat=True).first() or 0
+
+
+def set_judgment(date, row_index, username, judgment):
+    """
+    记录一次判定 (单行upsert)
+
+    Args:
+        judgment: 'exclude'、'suspect' 或 'cancel' (清除该用户判定和最终判定)
+
+    Returns:
+        int: 本次修改后的版本号
+    """
+    return set_judgments_bulk(date, username, [(row_index, judgment, None)])
+
+
+def set_judgments_bulk(date, username, items):
+    """
+    在一个事务中记录多行判定，所有行共用一次版本号递增
+
+    Args:
+        username: 判定人
+        items: [(row_index, judgment, remark)]，judgment 同 set_judgment；
+            remark 为None时不修改该行备注
+
+    Returns:
+        int: 本次修改后的版本号
+    """
+    judgments, finals, remarks = [], [], []
+    with transaction.atomic():
+        version = _next_version(date)
+        for row_index, judgment, remark in items:
+            value = '' if judgment == 'cancel' else judgment
+            final_by = '' if judgment == 'cancel' else username
+            judgments.append(Judgment(date=date, row_index=row_index, username=username,
+                                      value=value, version=version))
+            finals.append(FinalJudgment(date=date, row_index=row_index, final=value,
+                                        final_by=final_by, version=version))
+            if remark is not None:
+                remarks.append(Remark(date=date, row_index=row_index, remark=remark,
+                                      updated_by=username, version=version))
+
+        Judgment.objects.bulk_create(
+            judgments,
+            update_conflicts=True,
+            unique_fields=['date', 'row_index', 'username'],
+            update_fields=['value', 'version', 'updated_at'],
+        )
+        FinalJudgment.objects.bulk_create(
+            finals,
+            update_conflicts=True,
+            unique_fields=['date', 'row_index'],
+            update_fields=['final', 'final_by', 'version', 'updated_at'],
+        )
+        if remarks:
+            Remark.objects.bulk_create(
+                remarks,
+                update_conflicts=True,
+                unique_fields=['date', 'row_index'],
+                update_fields=['remark', 'updated_by', 'version', 'updated_at'],
+            )
+    return version
+
+
+def set_remark(date, row_index, username, remark):
+    """
+    记录一行的备注 (单行upsert)
+
+    Returns:
+        int: 本次修改后的版本号
+    """
+    with transaction.atomic():
+        version = _next_version(date)
+        Remark.objects.bulk_create(
+            [Remark(date=date, row_index=row_index, remark=remark, updated_by=username,
+                    version=version)],
+            update_conflicts=True,
+            unique_fields=['date', 'row_index'],
+            update_fields=['remark', 'updated_by', 'version', 'updated_at'],
+        )
+    return version
+
+
+def changed_rows(date, since):
+    """版本号大于 since 的所有行号"""
+    rows = set()
+    for model in (Judgment, FinalJudgment, Remark):
+        rows.update(model.objects.filter(date=date, version__gt=since)
+                    .values_list('row_index', flat=True))
+    return rows
+
+
+def final_judged_rows(date):
+    """已有最终判定的所有行号"""
+    return set(FinalJudgment.objects.filter(date=date).exclude(final='')
+               .values_list('row_index', flat=True))
+
+
+def load_judgments(date, row_indexes=None):
+    """
+    读取某日期的判定和备注
+
+    Args:
+        date: 日期字符串
+        row_indexes: 只读取这些行，None表示全部。指定时每一行都会出现在结果中
+            (没有有效判定的行为空记录)，便于客户端清除已取消的判定
+
+    Returns:
+        dict: {row_index: {'users': {username: value}, 'final', 'final_by', 'remark'}}
+    """
+    judgments = {}
+
+    def entry(row_idx):
+        if row_idx not in judgments:
+            judgments[row_idx] = {'users': {}, 'final': None, 'final_by': None, 'remark': None}
+        return judgments[row_idx]
+
+    def scoped(qs):
+        if row_indexes is not None:
+            qs = qs.filter(row_index__in=list(row_indexes))
+        return qs
+
+    if row_indexes is not None:
+        for row_idx in row_indexes:
+            entry(row_idx)
+
+    for row_idx, username, value in (scoped(Judgment.objects.filter(date=date))
+                                     .exclude(value='')
+                                     .values_list('row_index', 'username', 'value')):
+        entry(row_idx)['users'][username] = value
+
+    for row_idx, final, final_by in (scoped(FinalJudgment.objects.filter(date=date))
+                                     .exclude(final='')
+                                     .values_list('row_index', 'final', 'final_by')):
+        item = entry(row_idx)
+        item['final'] = final
+        item['final_by'] = final_by or None
+
+    for row_idx, remark in (scoped(Remark.objects.filter(date=date))
+                            .exclude(remark='')
+                            .values_list('row_index', 'remark')):
+        entry(row_idx)['remark'] = remark
+
+    return dict(sorted(judgments.items()))
+
+
+def load_cell_values(date, row_indexes=None):
+    """
+    生成写回Excel用的单元格值 (含已取消的空值，以便清除旧内容)
+
+    Args:
+        date: 日期字符串
+        row_indexes: 只导出这些行，None表示全部
+
+    Returns:
+        dict: {row_index: {列名: 值}}
+    """
+    cells = {}
+
+    def scoped(qs):
+        if row_indexes is not None:
+            qs = qs.filter(row_index__in=list(row_indexes))
+        return qs
+
+    for row_idx, username, value in scoped(Judgment.objects.filter(date=date)).values_list(
+            'row_index', 'username', 'value'):
+        cells.setdefault(row_idx, {})[f'judge_{username}'] = value
+
+    for row_idx, final, final_by in scoped(FinalJudgment.objects.filter(date=date)).values_list(
+            'row_index', 'final', 'final_by'):
+        row_cells = cells.setdefault(row_idx, {})
+        row_cells['final_judge'] = final
+        row_cells['final_judge_by'] = final_by
+
+    for row_idx, remark in scoped(Remark.objects.filter(date=date)).values_list(
+            'row_index', 'remark'):
+        cells.setdefault(row_idx, {})['final_remark'] = remark
+
+    return cells
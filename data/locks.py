@@ -0,0 +1,187 @@
+# data/locks.py - 工作Excel写操作的按日期加锁
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+from .metrics import phase_seconds
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+def lock_file_path(date):
+    """某日期的锁文件路径 (与工作Excel同目录，不随工作文件名变化)"""
+    data_root = Path(settings.DATA_ROOT)
+    excel_dir = data_root / date / Path(settings.DATA_FILE).parent
+    return excel_dir / f'.candidate-final-{date}.lock'
+
+
+def _lock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK 重试约10秒后失败，继续等待
+                continue
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class _DateLock:
+    """单个日期的锁: 进程内可重入锁 + 跨进程的文件锁"""
+
+    def __init__(self, date):
+        self.date = date
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.fd = None
+
+    def acquire(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            try:
+                fd = os.open(lock_file_path(self.date), os.O_RDWR | os.O_CREAT, 0o666)
+                try:
+                    _lock_fd(fd)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self.thread_lock.release()
+                raise
+            self.fd = fd
+        self.depth += 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            fd, self.fd = self.fd, None
+            try:
+                _unlock_fd(fd)
+            finally:
+                os.close(fd)
+        self.thread_lock.release()
+
+
+class LockStats:
+    """某日期锁的等待/持有时间累计 (秒)"""
+
+    __slots__ = ('acquisitions', 'contended', 'wait_total', 'wait_max', 'hold_total', 'hold_max')
+
+    # 等待超过该秒数计为一次争用
+    CONTENDED_THRESHOLD = 0.001
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def record(self, wait, hold):
+        self.acquisitions += 1
+        if wait > self.CONTENDED_THRESHOLD:
+            self.contended += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.hold_total += hold
+        self.hold_max = max(self.hold_max, hold)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class WorkingFileLockManager:
+    """
+    每个日期一把锁，不同日期的写操作可以并行
+
+    同一线程可以嵌套获取同一日期的锁；跨进程通过锁文件上的
+    flock (Windows 下为 msvcrt.locking) 互斥。
+    每次获取 (最外层) 的等待时间和持有时间按日期累计在 stats() 中。
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._stats = {}
+        self._guard = threading.Lock()
+
+    def _get(self, date):
+        with self._guard:
+            lock = self._locks.get(date)
+            if lock is None:
+                lock = self._locks[date] = _DateLock(date)
+            return lock
+
+    @contextmanager
+    def lock(self, date):
+        date_lock = self._get(date)
+        start = time.perf_counter()
+        date_lock.acquire()
+        acquired = time.perf_counter()
+        # 嵌套获取不重复计数
+        outermost = date_lock.depth == 1
+        try:
+            yield
+        finally:
+            date_lock.release()
+            if outermost:
+                released = time.perf_counter()
+                phase_seconds.observe(acquired - start, phase='lock_wait')
+                phase_seconds.observe(released - acquired, phase='lock_hold')
+                with self._guard:
+                    stats = self._stats.get(date)
+                    if stats is None:
+                        stats = self._stats[date] = LockStats()
+                    stats.record(acquired - start, released - acquired)
+
+    def stats(self, date=None):
+        """
+        锁的等待/持有统计
+
+        Returns:
+            dict: date 为None时返回 {date: 统计}，否则返回该日期的统计 (未使用过时为全0)
+        """
+        with self._guard:
+            if date is not None:
+                return (self._stats.get(date) or LockStats()).as_dict()
+            return {d: stats.as_dict() for d, stats in self._stats.items()}
+
+    def reset_stats(self):
+        with self._guard:
+            self._stats.clear()
+
+
+lock_manager = WorkingFileLockManager()
+
+
+def working_file_lock(date):
+    """
+    获取某日期工作Excel的写锁
+
+    Usage:
+        with working_file_lock(date):
+            ...  # load / modify / save
+    """
+    return lock_manager.lock(date)
@@ -0,0 +1,45 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from data.export import EXPORT_FORMATS, CandidateExport
+
+
+class Command(BaseCommand):
+    help = 'Export a night\'s candidates with judgments as csv, jsonl or xlsx'
+
+    def add_arguments(self, parser):
+        parser.add_argument('date', help='Date (YYYYMMDD)')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('-o', '--output', help='Output file (stdout if omitted; required for xlsx)')
+        parser.add_argument('--filter', action='append', default=[], metavar='COLUMN=VALUES',
+                            help='Keep rows whose column matches one of the comma-separated values '
+                                 '(e.g. final_judge=suspect); repeatable')
+        parser.add_argument('--columns', help='Comma-separated columns to export (default: all)')
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        filters = {}
+        for spec in options['filter']:
+            name, sep, values = spec.partition('=')
+            if not sep:
+                raise CommandError(f'Invalid filter (expected COLUMN=VALUES): {spec}')
+            filters.setdefault(name, set()).update(values.split(','))
+        columns = [c for c in (options['columns'] or '').split(',') if c]
+
+        try:
+            export = CandidateExport(options['date'], filters, columns)
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(str(e))
+
+        output = options['output']
+        if fmt == 'xlsx':
+            if not output:
+                raise CommandError('--output is required for xlsx')
+            export.write_xlsx(output)
+        elif output:
+            with open(output, 'w', encoding='utf-8', newline='') as f:
+                export.write(fmt, f)
+        else:
+            export.write(fmt, sys.stdout)
+
+        if output:
+            self.stdout.write(self.style.SUCCESS(f'{options["date"]}: exported {export.row_count} rows to {output}'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from data.excel_manager import export_judgments_to_excel
+from data.models import Night
+
+
+class Command(BaseCommand):
+    help = 'Write judgments and remarks from the DB back into the working xlsx files (regenerated from the sidecar)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dates', nargs='*', help='Dates (YYYYMMDD); all known nights if omitted')
+
+    def handle(self, *args, **options):
+        dates = options['dates'] or list(Night.objects.order_by('date').values_list('date', flat=True))
+
+        for date in dates:
+            try:
+                count = export_judgments_to_excel(date)
+            except FileNotFoundError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'{date}: exported {count} rows'))
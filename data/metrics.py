@@ -0,0 +1,219 @@
+# data/metrics.py - 请求和内部阶段的计数/耗时指标 (Prometheus 文本格式输出)
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+# 耗时直方图的桶上界 (秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """单调递增的计数，按标签值分组"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in items]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """
+    耗时分布，按标签值分组
+
+    每次记录只在锁内做一次二分查找和三次加法，累计桶计数在输出时才计算。
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # {标签值: [各桶计数 (最后一个为 +Inf), 总和]}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        key = tuple(labels[n] for n in self.labelnames)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][idx] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class MetricsRegistry:
+    """进程内的全部指标 (每个工作进程各自一份，抓取的是处理该请求的进程)"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'指标 {name} 已注册为 {metric.kind}')
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Prometheus 文本格式 (version 0.0.4)"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'east_http_requests_total', 'HTTP requests by view, method and status code',
+    ('view', 'method', 'status'))
+http_request_seconds = registry.histogram(
+    'east_http_request_duration_seconds',
+    'Time until the view returned its response (streamed bodies not included)', ('view',))
+phase_seconds = registry.histogram(
+    'east_phase_duration_seconds',
+    'Time spent in internal phases (workbook_load, workbook_save, lock_wait, lock_hold, '
+    'directory_scan, template_render)', ('phase',))
+served_bytes = registry.counter(
+    'east_served_bytes_total', 'Response body bytes of served data files', ('kind',))
+sync_rows_added = registry.counter(
+    'east_sync_rows_added_total', 'Rows appended to working copies from the original files')
+
+
+def phase(name):
+    """
+    计时一个内部阶段
+
+    用法:
+        with phase('workbook_load'):
+            wb = openpyxl.load_workbook(...)
+    """
+    return phase_seconds.time(phase=name)
+
+
+def record_served_bytes(kind, response):
+    """按响应的 Content-Length 累计发送的文件字节数 (304/416 等没有正文的响应不计)"""
+    length = response.get('Content-Length') if response.status_code in (200, 206) else None
+    if length:
+        served_bytes.inc(int(length), kind=kind)
+
+
+def _record_request(request, response, elapsed):
+    match = request.resolver_match
+    # 未匹配路由的请求归为一类，避免任意路径产生新的标签值
+    view = match.view_name if match is not None else 'unresolved'
+    http_requests.inc(view=view, method=request.method, status=response.status_code)
+    http_request_seconds.observe(elapsed, view=view)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """记录每个视图的请求数和耗时 (放在 MIDDLEWARE 最前面，包括其他中间件的耗时)"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = time.perf_counter()
+            response = await get_response(request)
+            _record_request(request, response, time.perf_counter() - start)
+            return response
+    else:
+        def middleware(request):
+            start = time.perf_counter()
+            response = get_response(request)
+            _record_request(request, response, time.perf_counter() - start)
+            return response
+    return middleware
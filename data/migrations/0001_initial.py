@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Night',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.CharField(max_length=8, unique=True)),
+                ('judgments_imported_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FinalJudgment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.CharField(max_length=8)),
+                ('row_index', models.PositiveIntegerField()),
+                ('final', models.CharField(blank=True, max_length=16)),
+                ('final_by', models.CharField(blank=True, max_length=150)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'row_index'), name='unique_final_judgment_per_row')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Judgment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.CharField(max_length=8)),
+                ('row_index', models.PositiveIntegerField()),
+                ('username', models.CharField(max_length=150)),
+                ('value', models.CharField(blank=True, max_length=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'row_index'], name='data_judgme_date_05c820_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'row_index', 'username'), name='unique_judgment_per_user')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Remark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.CharField(max_length=8)),
+                ('row_index', models.PositiveIntegerField()),
+                ('remark', models.TextField(blank=True)),
+                ('updated_by', models.CharField(blank=True, max_length=150)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'row_index'), name='unique_remark_per_row')],
+            },
+        ),
+    ]
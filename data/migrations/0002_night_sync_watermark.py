@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='night',
+            name='last_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='night',
+            name='original_mtime_ns',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='night',
+            name='original_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='night',
+            name='synced_rows',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
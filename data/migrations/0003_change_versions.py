@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0002_night_sync_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='finaljudgment',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='judgment',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='night',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='remark',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='finaljudgment',
+            index=models.Index(fields=['date', 'version'], name='data_finalj_date_eabdd7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='judgment',
+            index=models.Index(fields=['date', 'version'], name='data_judgme_date_ffac5c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='remark',
+            index=models.Index(fields=['date', 'version'], name='data_remark_date_3ec655_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0003_change_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.CharField(max_length=8, unique=True)),
+                ('last_sync_time', models.FloatField()),
+                ('sync_count', models.PositiveIntegerField(default=0)),
+                ('added_rows', models.PositiveIntegerField(default=0)),
+                ('synced_by', models.CharField(blank=True, max_length=150)),
+                ('total_rows', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Presence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.CharField(max_length=8)),
+                ('username', models.CharField(max_length=150)),
+                ('row', models.IntegerField(blank=True, null=True)),
+                ('last_seen', models.FloatField(db_index=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'username'), name='unique_presence_per_user')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0004_presence_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('view_name', models.CharField(blank=True, max_length=200)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('duration_ms', models.FloatField()),
+                ('username', models.CharField(blank=True, max_length=150)),
+                ('trigger', models.CharField(choices=[('request', 'Requested'), ('sample', 'Sampled')], max_length=8)),
+                ('stats_file', models.CharField(blank=True, max_length=255)),
+                ('stats_summary', models.TextField(blank=True)),
+                ('memory_peak', models.BigIntegerField(blank=True, null=True)),
+                ('memory_summary', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,3 +1,131 @@
 from django.db import models
 
-# Create your models here.
+
+class Night(models.Model):
+    """Per-date bookkeeping for one observation night"""
+    date = models.CharField(max_length=8, unique=True)
+    # When the judgment columns of the working xlsx were imported into the DB
+    judgments_imported_at = models.DateTimeField(null=True, blank=True)
+    # Sync watermark: data rows copied from the original, and the original's stamp at that time
+    synced_rows = models.PositiveIntegerField(null=True, blank=True)
+    original_size = models.BigIntegerField(null=True, blank=True)
+    original_mtime_ns = models.BigIntegerField(null=True, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    # Monotonic change counter, bumped by every judgment/remark mutation
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return self.date
+
+
+class Judgment(models.Model):
+    """One reviewer's judgment of a row (mirrors the judge_<user> column)"""
+    date = models.CharField(max_length=8)
+    row_index = models.PositiveIntegerField()
+    username = models.CharField(max_length=150)
+    # 'exclude', 'suspect', or '' once cancelled
+    value = models.CharField(max_length=16, blank=True)
+    version = models.BigIntegerField(default=0)  # Night.version of the last change
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'row_index', 'username'],
+                                    name='unique_judgment_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'row_index']),
+            models.Index(fields=['date', 'version']),
+        ]
+
+    def __str__(self):
+        return f'{self.date}#{self.row_index} {self.username}: {self.value}'
+
+
+class FinalJudgment(models.Model):
+    """Final verdict of a row (mirrors final_judge / final_judge_by)"""
+    date = models.CharField(max_length=8)
+    row_index = models.PositiveIntegerField()
+    final = models.CharField(max_length=16, blank=True)
+    final_by = models.CharField(max_length=150, blank=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'row_index'],
+                                    name='unique_final_judgment_per_row'),
+        ]
+        indexes = [models.Index(fields=['date', 'version'])]
+
+    def __str__(self):
+        return f'{self.date}#{self.row_index}: {self.final}'
+
+
+class Remark(models.Model):
+    """Remark of a row (mirrors final_remark)"""
+    date = models.CharField(max_length=8)
+    row_index = models.PositiveIntegerField()
+    remark = models.TextField(blank=True)
+    updated_by = models.CharField(max_length=150, blank=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'row_index'],
+                                    name='unique_remark_per_row'),
+        ]
+        indexes = [models.Index(fields=['date', 'version'])]
+
+    def __str__(self):
+        return f'{self.date}#{self.row_index}'
+
+
+class Presence(models.Model):
+    """A reviewer currently viewing a date (DatabasePresenceStore)"""
+    date = models.CharField(max_length=8)
+    username = models.CharField(max_length=150)
+    row = models.IntegerField(null=True, blank=True)
+    last_seen = models.FloatField(db_index=True)  # time.time()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'username'], name='unique_presence_per_user'),
+        ]
+
+
+class SyncEvent(models.Model):
+    """Last sync that added rows to a date (DatabasePresenceStore)"""
+    date = models.CharField(max_length=8, unique=True)
+    last_sync_time = models.FloatField()
+    sync_count = models.PositiveIntegerField(default=0)
+    added_rows = models.PositiveIntegerField(default=0)
+    synced_by = models.CharField(max_length=150, blank=True)
+    total_rows = models.PositiveIntegerField(default=0)
+
+
+class Profile(models.Model):
+    """One profiled request (data.profiling); the raw cProfile stats live in PROFILE_DIR"""
+    TRIGGER_CHOICES = [('request', 'Requested'), ('sample', 'Sampled')]
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    duration_ms = models.FloatField()
+    username = models.CharField(max_length=150, blank=True)
+    trigger = models.CharField(max_length=8, choices=TRIGGER_CHOICES)
+    # File name under PROFILE_DIR, loadable with pstats / snakeviz
+    stats_file = models.CharField(max_length=255, blank=True)
+    stats_summary = models.TextField(blank=True)
+    # tracemalloc: peak traced memory during the request and the top allocation sites
+    memory_peak = models.BigIntegerField(null=True, blank=True)
+    memory_summary = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
@@ -0,0 +1,236 @@
+# data/presence.py - 在线用户与同步事件的存储
+
+import heapq
+import threading
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+ONLINE_TIMEOUT = 10  # seconds
+
+# touch() 的 row 参数: 保持原来的行不变
+KEEP_ROW = object()
+
+
+class BasePresenceStore:
+    """
+    在线状态/同步事件存储的接口
+
+    users 的格式: {username: {'row': row_index, 'last_seen': timestamp}}
+    sync_event 的格式: {'last_sync_time', 'sync_count', 'added_rows', 'synced_by', 'total_rows'}
+    """
+
+    # 状态是否在多个进程间共享 (事件流据此决定是否需要自己检查变化)
+    cross_process = False
+
+    def __init__(self, timeout=ONLINE_TIMEOUT):
+        self.timeout = timeout
+
+    def touch(self, date, username, row=KEEP_ROW):
+        """
+        记录用户在线 (可同时更新当前行)
+
+        Returns:
+            bool: 在线用户列表或某用户的行发生了变化
+        """
+        raise NotImplementedError
+
+    def users(self, date):
+        raise NotImplementedError
+
+    def active_users(self):
+        """
+        所有日期的在线用户
+
+        Returns:
+            dict: {date: set(username)}，没有在线用户的日期不出现
+        """
+        raise NotImplementedError
+
+    def expire(self):
+        """
+        清除超时的用户
+
+        Returns:
+            set: 有用户被清除的日期
+        """
+        raise NotImplementedError
+
+    def record_sync(self, date, added_rows, synced_by, total_rows):
+        """记录一次新增了行的同步，返回更新后的同步事件"""
+        raise NotImplementedError
+
+    def sync_event(self, date):
+        """最近一次同步事件，没有时返回None"""
+        raise NotImplementedError
+
+
+class MemoryPresenceStore(BasePresenceStore):
+    """
+    进程内存储 (单进程部署)
+
+    每次 touch 都向按时间排序的堆中压入 (last_seen, date, username)；
+    清理时只弹出堆顶已超时的项，过期的旧条目直接丢弃，不需要扫描所有用户。
+    """
+
+    def __init__(self, timeout=ONLINE_TIMEOUT):
+        super().__init__(timeout)
+        self._users = {}  # {date: {username: {'row', 'last_seen'}}}
+        self._heap = []
+        self._sync_events = {}
+        self._lock = threading.Lock()
+
+    def touch(self, date, username, row=KEEP_ROW):
+        now = time.time()
+        with self._lock:
+            users = self._users.setdefault(date, {})
+            previous = users.get(username)
+            if row is KEEP_ROW:
+                row = previous['row'] if previous else None
+            users[username] = {'row': row, 'last_seen': now}
+            heapq.heappush(self._heap, (now, date, username))
+            return previous is None or previous['row'] != row
+
+    def users(self, date):
+        self.expire()
+        with self._lock:
+            return {u: dict(data) for u, data in self._users.get(date, {}).items()}
+
+    def active_users(self):
+        self.expire()
+        with self._lock:
+            return {date: set(users) for date, users in self._users.items() if users}
+
+    def expire(self):
+        cutoff = time.time() - self.timeout
+        changed = set()
+        with self._lock:
+            while self._heap and self._heap[0][0] < cutoff:
+                last_seen, date, username = heapq.heappop(self._heap)
+                users = self._users.get(date)
+                # 只有最新的条目才代表用户真正超时
+                if users and username in users and users[username]['last_seen'] == last_seen:
+                    del users[username]
+                    changed.add(date)
+                    if not users:
+                        del self._users[date]
+        return changed
+
+    def record_sync(self, date, added_rows, synced_by, total_rows):
+        with self._lock:
+            event = self._sync_events.setdefault(date, {'sync_count': 0})
+            event['last_sync_time'] = time.time()
+            event['sync_count'] += 1
+            event['added_rows'] = added_rows
+            event['synced_by'] = synced_by
+            event['total_rows'] = total_rows
+            return dict(event)
+
+    def sync_event(self, date):
+        with self._lock:
+            event = self._sync_events.get(date)
+            return dict(event) if event else None
+
+
+class DatabasePresenceStore(BasePresenceStore):
+    """
+    数据库存储 (多进程部署)，所有worker看到同一份在线状态
+
+    last_seen 有索引，清理是一次按时间范围的删除；
+    每个进程最多每 expire_interval 秒执行一次。
+    """
+
+    cross_process = True
+
+    def __init__(self, timeout=ONLINE_TIMEOUT, expire_interval=1.0):
+        super().__init__(timeout)
+        self.expire_interval = expire_interval
+        self._last_expire = 0.0
+
+    def touch(self, date, username, row=KEEP_ROW):
+        from .models import Presence
+
+        now = time.time()
+        previous = list(Presence.objects.filter(date=date, username=username,
+                                                last_seen__gte=now - self.timeout)
+                        .values_list('row', flat=True)[:1])
+        is_new = not previous
+        previous = previous[0] if previous else None
+        if row is KEEP_ROW:
+            row = previous
+        Presence.objects.bulk_create(
+            [Presence(date=date, username=username, row=row, last_seen=now)],
+            update_conflicts=True,
+            unique_fields=['date', 'username'],
+            update_fields=['row', 'last_seen'],
+        )
+        return is_new or previous != row
+
+    def users(self, date):
+        from .models import Presence
+
+        self.expire()
+        cutoff = time.time() - self.timeout
+        return {
+            username: {'row': row, 'last_seen': last_seen}
+            for username, row, last_seen in Presence.objects.filter(date=date, last_seen__gte=cutoff)
+            .values_list('username', 'row', 'last_seen')
+        }
+
+    def active_users(self):
+        from .models import Presence
+
+        self.expire()
+        cutoff = time.time() - self.timeout
+        active = {}
+        for date, username in Presence.objects.filter(last_seen__gte=cutoff).values_list('date', 'username'):
+            active.setdefault(date, set()).add(username)
+        return active
+
+    def expire(self):
+        from .models import Presence
+
+        now = time.time()
+        if now - self._last_expire < self.expire_interval:
+            return set()
+        self._last_expire = now
+        expired = Presence.objects.filter(last_seen__lt=now - self.timeout)
+        changed = set(expired.values_list('date', flat=True).distinct())
+        if changed:
+            expired.delete()
+        return changed
+
+    def record_sync(self, date, added_rows, synced_by, total_rows):
+        from django.db.models import F
+        from .models import SyncEvent
+
+        SyncEvent.objects.bulk_create(
+            [SyncEvent(date=date, last_sync_time=time.time(), sync_count=0, added_rows=added_rows,
+                       synced_by=synced_by, total_rows=total_rows)],
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=['last_sync_time', 'added_rows', 'synced_by', 'total_rows'],
+        )
+        SyncEvent.objects.filter(date=date).update(sync_count=F('sync_count') + 1)
+        return self.sync_event(date)
+
+    def sync_event(self, date):
+        from .models import SyncEvent
+
+        return (SyncEvent.objects.filter(date=date)
+                .values('last_sync_time', 'sync_count', 'added_rows', 'synced_by', 'total_rows')
+                .first())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_presence_store():
+    """按 settings.PRESENCE_STORE 创建的全局存储实例"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(settings.PRESENCE_STORE)()
+    return _store
@@ -0,0 +1,266 @@
+# data/profiling.py - 按需/抽样的请求性能分析 (cProfile + tracemalloc，结果保存在 PROFILE_DIR)
+
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+# 显式请求分析: ?__profile=1 或请求头 X-Profile: 1 (=memory 时同时记录内存分配)
+PROFILE_PARAM = '__profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+# 摘要中保留的函数数 / 内存分配位置数
+SUMMARY_LINES = 40
+MEMORY_TOP = 25
+
+# tracemalloc 每个分配记录的栈帧数
+TRACEMALLOC_FRAMES = 1
+
+_MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+def _asks_for_profile(request):
+    """请求中是否带有分析参数/请求头 (不检查用户，不访问数据库)"""
+    return bool(request.GET.get(PROFILE_PARAM) or request.META.get(PROFILE_HEADER))
+
+
+def _is_async_view(request):
+    try:
+        return iscoroutinefunction(resolve(request.path_info).func)
+    except Resolver404:
+        return False
+
+
+def requested_mode(request):
+    """
+    请求显式要求的分析模式 (只对staff用户生效)
+
+    Returns:
+        str: 'cpu' (cProfile) 或 'memory' (cProfile + tracemalloc)，不分析时返回None
+    """
+    value = request.GET.get(PROFILE_PARAM) or request.META.get(PROFILE_HEADER)
+    if not value or value.lower() in ('0', 'false', 'off'):
+        return None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_staff:
+        return None
+    return 'memory' if value.lower() == 'memory' else 'cpu'
+
+
+def sampled_mode(request):
+    """
+    按 PROFILE_SAMPLE_RATE 抽样 PROFILE_SAMPLE_VIEWS 中的视图
+
+    先抽样再解析URL，未被抽中的请求只多一次随机数。
+
+    Returns:
+        str: 分析模式，未抽中时返回None
+    """
+    rate = settings.PROFILE_SAMPLE_RATE
+    if rate <= 0 or random.random() >= rate:
+        return None
+    views = settings.PROFILE_SAMPLE_VIEWS
+    if views:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if match.view_name not in views and match.url_name not in views:
+            return None
+    return 'memory' if settings.PROFILE_SAMPLE_MEMORY else 'cpu'
+
+
+class _TracemallocUsers:
+    """
+    tracemalloc 是进程级的: 第一个需要的请求开启，最后一个结束时关闭
+
+    (外部已开启时不关闭)。多个请求同时分析时，峰值和分配统计会互相包含。
+    """
+
+    def __init__(self):
+        self._users = 0
+        self._owned = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._owned = True
+            self._users += 1
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users == 0 and self._owned:
+                tracemalloc.stop()
+                self._owned = False
+
+
+_tracemalloc_users = _TracemallocUsers()
+
+
+def _stats_summary(profiler):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    return out.getvalue()
+
+
+def _memory_summary(before, after):
+    before = before.filter_traces(_MEMORY_FILTERS)
+    after = after.filter_traces(_MEMORY_FILTERS)
+    return '\n'.join(str(diff) for diff in after.compare_to(before, 'lineno')[:MEMORY_TOP])
+
+
+def profile_dir():
+    return Path(settings.PROFILE_DIR)
+
+
+def delete_profiles(profiles):
+    """删除分析记录及其统计文件"""
+    directory = profile_dir()
+    for profile in profiles:
+        if profile.stats_file:
+            (directory / profile.stats_file).unlink(missing_ok=True)
+        profile.delete()
+
+
+def rotate_profiles(max_count=None):
+    """只保留最新的 max_count (默认 PROFILE_MAX_COUNT) 条记录"""
+    from .models import Profile
+
+    max_count = settings.PROFILE_MAX_COUNT if max_count is None else max_count
+    if Profile.objects.count() > max_count:
+        delete_profiles(Profile.objects.order_by('-created_at', '-id')[max_count:])
+
+
+def save_profile(request, response, profiler, duration, trigger, memory=None):
+    """
+    保存一次分析结果 (原始统计写入 PROFILE_DIR，摘要写入数据库)
+
+    Args:
+        profiler: 已停止的 cProfile.Profile
+        duration: 请求耗时 (秒)
+        trigger: 'request' 或 'sample'
+        memory: (峰值字节数, 开始时的快照, 结束时的快照)，未记录内存时为None
+
+    Returns:
+        Profile: 新建的记录
+    """
+    from .models import Profile
+
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stats_file = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}.prof'
+    profiler.dump_stats(directory / stats_file)
+
+    match = request.resolver_match
+    user = getattr(request, 'user', None)
+    profile = Profile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:500],
+        view_name=match.view_name if match is not None else '',
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        username=user.get_username() if user is not None and user.is_authenticated else '',
+        trigger=trigger,
+        stats_file=stats_file,
+        stats_summary=_stats_summary(profiler),
+        memory_peak=memory[0] if memory else None,
+        memory_summary=_memory_summary(memory[1], memory[2]) if memory else '',
+    )
+    rotate_profiles()
+    return profile
+
+
+def profile_request(request, get_response, mode, trigger):
+    """
+    在分析器下处理请求并保存结果
+
+    流式响应只统计到视图返回响应为止 (不包括正文的生成)。保存失败只记录日志，不影响响应。
+    """
+    profiler = cProfile.Profile()
+    memory = None
+    if mode == 'memory':
+        _tracemalloc_users.acquire()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    try:
+        profiler.enable()
+    except ValueError:
+        # 同一线程中已有分析器在运行 (例如外层的调试工具)
+        logger.warning('无法分析请求，已有分析器在运行: %s', request.path)
+        profiler = None
+    try:
+        response = get_response(request)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        duration = time.perf_counter() - start
+        if mode == 'memory':
+            peak = tracemalloc.get_traced_memory()[1]
+            memory = (peak, before, tracemalloc.take_snapshot())
+            _tracemalloc_users.release()
+
+    if profiler is not None:
+        try:
+            profile = save_profile(request, response, profiler, duration, trigger, memory)
+            response['X-Profile-Id'] = str(profile.pk)
+        except Exception:
+            logger.exception('保存分析结果失败: %s', request.path)
+    return response
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    """
+    staff 用户用 ?__profile=1 / X-Profile 请求头分析单个请求，或按比例抽样指定视图
+
+    放在 AuthenticationMiddleware 之后。PROFILING_ENABLED 为False时不加载 (没有任何开销)。
+    WSGI 和 ASGI 下都可用: ASGI 下被选中的请求改为在一个工作线程中处理，
+    同步视图 (thread_sensitive) 在同一线程中执行，因此能被 cProfile 记录；
+    异步视图 (事件流) 不分析。
+    """
+    if not settings.PROFILING_ENABLED:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            mode, trigger = None, 'request'
+            if _asks_for_profile(request):
+                # request.user 是惰性的，检查 is_staff 需要查询数据库
+                mode = await sync_to_async(requested_mode)(request)
+            if mode is None:
+                mode, trigger = sampled_mode(request), 'sample'
+            if mode is None or _is_async_view(request):
+                return await get_response(request)
+            return await sync_to_async(profile_request)(request, async_to_sync(get_response), mode, trigger)
+        return middleware
+
+    def middleware(request):
+        mode, trigger = requested_mode(request), 'request'
+        if mode is None:
+            mode, trigger = sampled_mode(request), 'sample'
+        if mode is None:
+            return get_response(request)
+        return profile_request(request, get_response, mode, trigger)
+    return middleware
@@ -0,0 +1,236 @@
+# data/sheet_cache.py - 工作数据解析结果的进程内缓存
+
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .candidate_table import CandidateTable
+from .sidecar import CandidateSidecar
+
+
+def sheet_stamp(path):
+    """工作文件 (sidecar + xlsx) 的校验戳，见 CandidateSidecar.stamp()"""
+    return CandidateSidecar(path).stamp()
+
+
+class ParsedSheet:
+    """
+    工作Excel活动表的解析结果 (表头 + 数据行)
+
+    数据以列式的 CandidateTable 保存，get_row() / iter_rows() 返回行视图。
+    """
+
+    def __init__(self, path, table, stamp):
+        self.path = path
+        self.table = table  # 数据行号 row_index 对应Excel第 row_index+1 行
+        self.stamp = stamp
+        self.header_map = {}
+        self._rebuild_header_map()
+        self.nbytes = table.nbytes()
+
+    @property
+    def headers(self):
+        return self.table.headers
+
+    def _rebuild_header_map(self):
+        self.header_map = {h: idx for idx, h in enumerate(self.headers)}
+
+    @property
+    def row_count(self):
+        return self.table.row_count
+
+    def get_row(self, row_index):
+        """按数据行号 (从1开始，不含表头) 取行视图，不存在返回None"""
+        return self.table.row(row_index)
+
+    def iter_rows(self, start=1, stop=None):
+        """数据行号 start..stop (含) 的行视图"""
+        return self.table.iter_rows(start, stop)
+
+    def column_values(self, col_idx):
+        """一整列的值 (按数据行顺序)"""
+        return self.table.column_values(col_idx)
+
+    def judgment_columns(self):
+        """
+        查找判定相关列
+
+        Returns:
+            tuple: (judge_cols, final_col, final_by_col, remark_col)
+                judge_cols 为 {username: 列索引}
+        """
+        judge_cols = {}
+        final_col = None
+        final_by_col = None
+        remark_col = None
+        for idx, h in enumerate(self.headers):
+            if h and isinstance(h, str) and h.startswith('judge_'):
+                judge_cols[h[6:]] = idx
+            elif h == 'final_judge':
+                final_col = idx
+            elif h == 'final_judge_by':
+                final_by_col = idx
+            elif h == 'final_remark':
+                remark_col = idx
+        return judge_cols, final_col, final_by_col, remark_col
+
+    def ensure_column(self, col_name):
+        """列不存在时追加一个空列，返回列索引"""
+        if col_name not in self.header_map:
+            self.table.add_column(col_name)
+            self._rebuild_header_map()
+        return self.header_map[col_name]
+
+    def set_cells(self, row_index, values):
+        """
+        在缓存中修改一行的若干列 (列不存在时追加到表尾)
+
+        Args:
+            row_index: 数据行号 (从1开始)
+            values: {列名: 值}，空字符串按openpyxl读回的结果存为None
+        """
+        for col_name, value in values.items():
+            self.table.set_cell(row_index, self.ensure_column(col_name), value if value != '' else None)
+
+
+def parse_sheet(path):
+    """从sidecar读取工作数据 (sidecar不存在或过期时先由xlsx转换)"""
+    headers, rows, stamp = CandidateSidecar(path).read()
+    return ParsedSheet(path, CandidateTable.from_rows(headers, rows), stamp)
+
+
+class SheetCache:
+    """
+    以工作文件路径为键的解析结果缓存
+
+    每次读取都会用 (mtime, size) 校验，文件被外部修改后自动重新解析；
+    超过日期数或字节数上限时按LRU淘汰。
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _limits(self):
+        max_entries = self.max_entries
+        if max_entries is None:
+            max_entries = settings.SHEET_CACHE_MAX_DATES
+        max_bytes = self.max_bytes
+        if max_bytes is None:
+            max_bytes = settings.SHEET_CACHE_MAX_BYTES
+        return max_entries, max_bytes
+
+    def get(self, path):
+        """
+        获取解析后的工作表，缓存失效时重新解析
+
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        key = str(path)
+        stamp = sheet_stamp(path)
+        if stamp[2] is None:
+            self.invalidate(path)
+            raise FileNotFoundError(f"工作Excel文件不存在: {path}")
+
+        with self._lock:
+            sheet = self._entries.get(key)
+            if sheet is not None and sheet.stamp == stamp:
+                self._entries.move_to_end(key)
+                return sheet
+
+        sheet = parse_sheet(path)
+
+        with self._lock:
+            self._entries[key] = sheet
+            self._entries.move_to_end(key)
+            self._evict()
+        return sheet
+
+    def snapshot(self, path):
+        """
+        获取工作表的独立副本 (导出等长时间读取用，不受之后写入的影响)
+
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        sheet = self.get(path)
+        with self._lock:
+            # 缓存中的表只在持有锁时修改
+            return ParsedSheet(sheet.path, sheet.table.copy(), sheet.stamp)
+
+    def _evict(self):
+        max_entries, max_bytes = self._limits()
+        total = sum(s.nbytes for s in self._entries.values())
+        # 至少保留最近使用的一项
+        while len(self._entries) > 1 and (
+                len(self._entries) > max_entries or total > max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.nbytes
+
+    def update(self, path, updates, previous_stamp):
+        """
+        写入sidecar后同步修改缓存，避免下次读取时重新加载
+
+        Args:
+            path: 工作文件路径
+            updates: {row_index: {列名: 值}}，row_index 从1开始
+            previous_stamp: 写入前的 sheet_stamp()，与缓存不一致时直接失效
+        """
+        key = str(path)
+        with self._lock:
+            sheet = self._entries.get(key)
+            if sheet is None:
+                return
+            if sheet.stamp != previous_stamp:
+                del self._entries[key]
+                return
+            for row_index, values in updates.items():
+                sheet.set_cells(row_index, values)
+            sheet.stamp = sheet_stamp(path)
+
+    def append_rows(self, path, rows, previous_stamp):
+        """
+        同步追加新行后扩展缓存的行索引，而不是整表重新解析
+
+        Args:
+            path: 工作文件路径
+            rows: 追加的数据行 (按顺序)
+            previous_stamp: 写入前的 sheet_stamp()，与缓存不一致时直接失效
+        """
+        key = str(path)
+        with self._lock:
+            sheet = self._entries.get(key)
+            if sheet is None:
+                return
+            if sheet.stamp != previous_stamp:
+                del self._entries[key]
+                return
+            for row in rows:
+                sheet.table.append_row(row)
+            sheet.nbytes = sheet.table.nbytes()
+            sheet.stamp = sheet_stamp(path)
+
+    def invalidate(self, path):
+        with self._lock:
+            self._entries.pop(str(path), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+sheet_cache = SheetCache()
+
+
+def get_sheet(date):
+    """
+    获取某日期工作Excel的解析结果
+
+    Raises:
+        FileNotFoundError: 原始或工作Excel文件不存在
+    """
+    from .excel_manager import get_working_excel_path
+
+    return sheet_cache.get(get_working_excel_path(date))
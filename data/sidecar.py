@@ -0,0 +1,404 @@
+# data/sidecar.py - 工作Excel旁的SQLite数据文件 (读写都走这里，xlsx按需重新生成)
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from django.conf import settings
+from .metrics import phase
+
+logger = logging.getLogger(__name__)
+
+# 文件格式版本，不一致时从xlsx重建
+FORMAT_VERSION = 1
+
+# 等待其他进程释放SQLite写锁的秒数
+BUSY_TIMEOUT = 30
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS rows (row_index INTEGER PRIMARY KEY, data TEXT NOT NULL);
+'''
+
+
+def file_stamp(path):
+    """
+    获取文件的校验戳 (mtime_ns, size)
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        tuple: (mtime_ns, size)，文件不存在时返回None
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def sidecar_path(working_path):
+    """
+    工作Excel对应的sidecar路径 (SIDECAR_DIR 下，按工作文件的完整路径区分)
+
+    不放在候选体目录中: 每次提交时SQLite的日志文件被创建和删除，会改变目录的 mtime，
+    使该目录的文件索引失效 (见 file_index.FileIndexCache)。
+    """
+    working_path = Path(working_path).resolve()
+    digest = hashlib.sha1(str(working_path).encode('utf-8')).hexdigest()[:12]
+    return Path(settings.SIDECAR_DIR) / f'{working_path.stem}-{digest}.sqlite'
+
+
+def change_counter(path):
+    """
+    SQLite文件头中的修改计数 (每次提交递增，rollback journal 模式下有效)
+
+    Returns:
+        int: 文件不存在或为空时返回None
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(24)
+            raw = f.read(4)
+    except FileNotFoundError:
+        return None
+    return int.from_bytes(raw, 'big') if len(raw) == 4 else None
+
+
+def _encode_value(value):
+    # JSON 不支持的单元格类型 (openpyxl 读出的日期时间)
+    if isinstance(value, datetime.datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {'$time': value.isoformat()}
+    if isinstance(value, datetime.timedelta):
+        return {'$timedelta': value.total_seconds()}
+    raise TypeError(f'不支持的单元格类型: {type(value).__name__}')
+
+
+def _decode_value(obj):
+    if len(obj) == 1:
+        key, value = next(iter(obj.items()))
+        if key == '$datetime':
+            return datetime.datetime.fromisoformat(value)
+        if key == '$date':
+            return datetime.date.fromisoformat(value)
+        if key == '$time':
+            return datetime.time.fromisoformat(value)
+        if key == '$timedelta':
+            return datetime.timedelta(seconds=value)
+    return obj
+
+
+def encode_row(row):
+    return json.dumps(list(row), default=_encode_value, ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_row(data):
+    return json.loads(data, object_hook=_decode_value)
+
+
+def _read_xlsx(xlsx_path):
+    """用openpyxl只读模式读取活动表，返回 (表头, 数据行列表, 表名)"""
+    import openpyxl
+
+    with phase('workbook_load'):
+        wb = openpyxl.load_workbook(xlsx_path, read_only=True)
+        try:
+            ws = wb.active
+            rows = ws.iter_rows(values_only=True)
+            headers = list(next(rows, ()))
+            data = [list(row) for row in rows]
+            title = ws.title
+        finally:
+            wb.close()
+    return headers, data, title
+
+
+class CandidateSidecar:
+    """
+    某日期工作数据的SQLite副本
+
+    首次访问时从工作Excel转换一次，之后所有读取、同步追加和判定写回都只操作这个文件
+    (按行号索引，单行修改不需要重写整个xlsx)。xlsx 只在下载或导出时由 write_xlsx() 更新。
+
+    meta 表记录表头、版本号 (每次修改递增)、已写入xlsx的版本号和当时xlsx的 (mtime, size)：
+    xlsx 被外部修改且sidecar没有未导出的修改时，下次访问从xlsx重建。
+    """
+
+    def __init__(self, working_path):
+        self.working_path = Path(working_path)
+        self.path = sidecar_path(working_path)
+
+    def _connect(self):
+        # 手动管理事务；出错时直接关闭连接即回滚
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_SCHEMA)
+        return conn
+
+    @staticmethod
+    def _meta(conn):
+        return {key: json.loads(value) for key, value in conn.execute('SELECT key, value FROM meta')}
+
+    @staticmethod
+    def _set_meta(conn, **values):
+        conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                         [(key, json.dumps(value)) for key, value in values.items()])
+
+    def _needs_rebuild(self, meta, xlsx_stamp):
+        """
+        Returns:
+            True 需要从xlsx重建；False 已是最新；
+            None xlsx被外部修改但sidecar有未导出的修改 (保留sidecar，只更新记录的xlsx校验戳)
+        """
+        if meta.get('format') != FORMAT_VERSION:
+            return True
+        if meta.get('xlsx_stamp') == (list(xlsx_stamp) if xlsx_stamp else None):
+            return False
+        if meta.get('version') != meta.get('exported_version'):
+            # 两边都被修改过: 保留sidecar (下次生成xlsx时覆盖外部修改)
+            return None
+        return True
+
+    def _rebuild(self, conn, xlsx_stamp):
+        headers, rows, title = _read_xlsx(self.working_path)
+        conn.execute('DELETE FROM rows')
+        conn.executemany('INSERT INTO rows (row_index, data) VALUES (?, ?)',
+                         ((i, encode_row(row)) for i, row in enumerate(rows, start=1)))
+        version = self._meta(conn).get('version', 0) + 1
+        self._set_meta(conn, format=FORMAT_VERSION, headers=headers, title=title,
+                       row_count=len(rows), version=version, exported_version=version,
+                       xlsx_stamp=list(xlsx_stamp))
+
+    def _begin_current(self, conn):
+        """
+        开始写事务，必要时先从xlsx重建
+
+        Returns:
+            dict: 当前 meta
+        """
+        conn.execute('BEGIN IMMEDIATE')
+        xlsx_stamp = file_stamp(self.working_path)
+        meta = self._meta(conn)
+        rebuild = self._needs_rebuild(meta, xlsx_stamp)
+        if rebuild:
+            if xlsx_stamp is None:
+                raise FileNotFoundError(f'工作Excel文件不存在: {self.working_path}')
+            self._rebuild(conn, xlsx_stamp)
+            meta = self._meta(conn)
+        elif rebuild is None:
+            logger.warning('工作Excel被外部修改，但sidecar有未导出的修改，忽略外部修改: %s',
+                           self.working_path)
+            self._set_meta(conn, xlsx_stamp=list(xlsx_stamp))
+            meta['xlsx_stamp'] = list(xlsx_stamp)
+        return meta
+
+    def ensure_current(self):
+        """确保sidecar存在且与xlsx一致 (只在需要时取写锁)"""
+        conn = self._connect()
+        try:
+            if self._needs_rebuild(self._meta(conn), file_stamp(self.working_path)) is False:
+                return
+            self._begin_current(conn)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def stamp(self):
+        """
+        校验戳: sidecar 的 (mtime, size)、修改计数和 xlsx 的 (mtime, size)
+
+        任何一方被修改 (包括其他进程的写入) 后都会变化。
+        """
+        return file_stamp(self.path), change_counter(self.path), file_stamp(self.working_path)
+
+    def read(self):
+        """
+        读取全部数据 (一致的快照)
+
+        Returns:
+            tuple: (表头, 数据行列表, 快照对应的 stamp())
+
+        Raises:
+            FileNotFoundError: 工作Excel不存在
+        """
+        self.ensure_current()
+        conn = self._connect()
+        try:
+            # 读事务期间其他进程无法提交，校验戳与读到的数据一致
+            conn.execute('BEGIN')
+            headers = self._meta(conn)['headers']
+            rows = [decode_row(data) for (data,) in
+                    conn.execute('SELECT data FROM rows ORDER BY row_index')]
+            stamp = self.stamp()
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        return headers, rows, stamp
+
+    def append_rows(self, rows, first_row_index):
+        """
+        从 first_row_index 开始写入若干数据行 (同步原始文件的新行)
+
+        Args:
+            rows: 数据行 (按顺序)
+            first_row_index: 第一行的数据行号 (从1开始)
+        """
+        conn = self._connect()
+        try:
+            meta = self._begin_current(conn)
+            conn.executemany('INSERT OR REPLACE INTO rows (row_index, data) VALUES (?, ?)',
+                             ((first_row_index + i, encode_row(row)) for i, row in enumerate(rows)))
+            row_count = max(meta.get('row_count', 0), first_row_index + len(rows) - 1)
+            self._set_meta(conn, row_count=row_count, version=meta['version'] + 1)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def replace_rows(self, rows):
+        """
+        用原始文件的全部数据行重写 (原始文件被改写或替换后的全量同步)
+
+        每行只覆盖前 len(row) 列，其后的列 (判定/备注) 按行号保留；多出的旧行被删除。
+        """
+        conn = self._connect()
+        try:
+            meta = self._begin_current(conn)
+            existing = dict(conn.execute('SELECT row_index, data FROM rows'))
+            replaced = []
+            for row_index, row in enumerate(rows, start=1):
+                old = decode_row(existing[row_index]) if row_index in existing else []
+                replaced.append((row_index, encode_row(list(row) + old[len(row):])))
+            conn.execute('DELETE FROM rows')
+            conn.executemany('INSERT INTO rows (row_index, data) VALUES (?, ?)', replaced)
+            self._set_meta(conn, row_count=len(rows), version=meta['version'] + 1)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def set_cells(self, updates):
+        """
+        修改若干行的若干列 (列不存在时追加到表尾)
+
+        Args:
+            updates: {row_index: {列名: 值}}，空字符串存为None (与openpyxl读回的结果一致)
+        """
+        if not updates:
+            return
+        conn = self._connect()
+        try:
+            meta = self._begin_current(conn)
+            headers = meta['headers']
+            header_map = {h: idx for idx, h in enumerate(headers)}
+            for values in updates.values():
+                for col_name in values:
+                    if col_name not in header_map:
+                        header_map[col_name] = len(headers)
+                        headers.append(col_name)
+
+            indexes = sorted(updates)
+            existing = {}
+            for start in range(0, len(indexes), 500):
+                chunk = indexes[start:start + 500]
+                existing.update(conn.execute(
+                    f'SELECT row_index, data FROM rows WHERE row_index IN ({",".join("?" * len(chunk))})',
+                    chunk))
+
+            changed = []
+            for row_index in indexes:
+                row = decode_row(existing[row_index]) if row_index in existing else []
+                for col_name, value in updates[row_index].items():
+                    col_idx = header_map[col_name]
+                    if len(row) <= col_idx:
+                        row.extend([None] * (col_idx + 1 - len(row)))
+                    row[col_idx] = value if value != '' else None
+                changed.append((row_index, encode_row(row)))
+            conn.executemany('INSERT OR REPLACE INTO rows (row_index, data) VALUES (?, ?)', changed)
+            self._set_meta(conn, headers=headers, version=meta['version'] + 1,
+                           row_count=max(meta.get('row_count', 0), indexes[-1]))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def row_count(self):
+        """
+        已记录的数据行数 (不从xlsx转换)
+
+        Returns:
+            int: sidecar 还不存在时返回None
+        """
+        if not self.path.exists():
+            return None
+        conn = self._connect()
+        try:
+            return self._meta(conn).get('row_count')
+        finally:
+            conn.close()
+
+    def is_dirty(self):
+        """是否有尚未写入xlsx的修改"""
+        conn = self._connect()
+        try:
+            meta = self._meta(conn)
+        finally:
+            conn.close()
+        return bool(meta) and meta.get('version') != meta.get('exported_version')
+
+    def write_xlsx(self):
+        """
+        把sidecar中的数据写回工作Excel (先写临时文件再替换)
+
+        在原工作Excel上逐格更新活动表 (保留其他工作表、列宽和单元格样式)，
+        新增的列追加在表尾。调用方需持有该日期的写锁。
+
+        Returns:
+            bool: 是否重新生成 (没有未导出的修改时不写)
+        """
+        import openpyxl
+
+        conn = self._connect()
+        try:
+            meta = self._begin_current(conn)
+            if meta['version'] == meta.get('exported_version'):
+                conn.execute('COMMIT')
+                return False
+
+            with phase('workbook_load'):
+                wb = openpyxl.load_workbook(self.working_path)
+            title = meta.get('title')
+            ws = wb[title] if title in wb.sheetnames else wb.active
+
+            headers = meta['headers']
+            width = len(headers)
+            for col, header in enumerate(headers, start=1):
+                ws.cell(row=1, column=col).value = header
+            last_row = 1
+            for row_index, data in conn.execute('SELECT row_index, data FROM rows ORDER BY row_index'):
+                row = decode_row(data)
+                row += [None] * (width - len(row))
+                for col, value in enumerate(row, start=1):
+                    ws.cell(row=row_index + 1, column=col).value = value
+                last_row = row_index + 1
+            if ws.max_row > last_row:
+                # xlsx 被外部修改后多出的行 (sidecar 的修改优先)
+                ws.delete_rows(last_row + 1, ws.max_row - last_row)
+
+            with phase('workbook_save'):
+                tmp_path = self.working_path.with_name(f'.{self.working_path.name}.tmp')
+                wb.save(tmp_path)
+            os.replace(tmp_path, self.working_path)
+
+            self._set_meta(conn, exported_version=meta['version'],
+                           xlsx_stamp=list(file_stamp(self.working_path)))
+            conn.execute('COMMIT')
+            return True
+        finally:
+            conn.close()
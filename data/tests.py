@@ -1,3 +1,1060 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import math
+import struct
+import unittest
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+import openpyxl
+import openpyxl.styles
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import (AsyncClient, Client, RequestFactory, SimpleTestCase, TransactionTestCase,
+                         override_settings)
 
-# Create your tests here.
+from . import excel_manager, judgment_store
+from .candidate_table import CandidateTable
+from .catalog import night_catalog
+from .events import EventBus, format_sse
+from .models import FinalJudgment, Judgment, Night, Profile
+from .presence import DatabasePresenceStore, MemoryPresenceStore, get_presence_store
+from .file_index import file_index
+from .locks import fcntl, lock_file_path, working_file_lock
+from . import file_serving
+from .file_serving import file_validators, serve_file
+from .fits import TanWCS, numpy_available
+from .metrics import MetricsRegistry
+from .sheet_cache import SheetCache, sheet_cache, sheet_stamp
+from .sidecar import CandidateSidecar
+from .variant_cache import VariantCache
+from .views import BULK_JUDGMENT_MAX_ITEMS, ROW_FILES_MAX_RADIUS
+from .write_behind import WriteBehindQueue, write_behind
+
+HEADERS = ['id', 'attribute', 'sequence_number', 'mag_new', 'time_utc_new', 'fits_filename_new',
+           'time_utc_old', 'fits_filename_old']
+
+
+def fits_bytes(values, width=8):
+    """最简单的二维 float32 FITS 文件"""
+    cards = ['SIMPLE  =                    T', 'BITPIX  =                  -32', 'NAXIS   =                    2',
+             f'NAXIS1  = {width:>20}', f'NAXIS2  = {len(values) // width:>20}', 'END']
+    header = ''.join(card.ljust(80) for card in cards).encode('ascii')
+    data = struct.pack(f'>{len(values)}f', *values)
+    return header.ljust(2880, b' ') + data.ljust(-(-len(data) // 2880) * 2880, b'\0')
+
+
+def make_rows(count, start=1):
+    return [[i, ('new', 'mov', 'var')[i % 3], i, 15.5, '2024-01-01 12:00:00', f'frame{i:05d}_new.fits',
+             '2023-12-01 11:00:00', f'ref{i:05d}_new.fits'] for i in range(start, start + count)]
+
+
+class NightTestCase(TransactionTestCase):
+    """每个测试一个临时 DATA_ROOT，write_night() 写入某日期的原始Excel"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.data_root = Path(tmp.name)
+        settings_override = override_settings(
+            DATA_ROOT=str(self.data_root), VARIANT_CACHE_DIR=str(self.data_root / 'variants'),
+            SIDECAR_DIR=str(self.data_root / 'sidecars'),
+            WRITE_BEHIND_MAX_LATENCY=3600, WRITE_BEHIND_MAX_BATCH=10 ** 9)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for cache in (sheet_cache, file_index):
+            cache.clear()
+        excel_manager._working_paths.clear()
+        judgment_store._imported_dates.clear()
+        self.addCleanup(write_behind.flush)
+
+        self.user = User.objects.create_user('alice', password='pw', is_staff=True)
+        self.client.force_login(self.user)
+
+    def write_night(self, date, rows, headers=HEADERS, sheets=None):
+        path = self.data_root / date / settings.DATA_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'candidates'
+        ws.append(headers)
+        for row in rows:
+            ws.append(row)
+        for title, values in (sheets or {}).items():
+            extra = wb.create_sheet(title)
+            for row in values:
+                extra.append(row)
+        wb.save(path)
+        return path
+
+
+class VariantCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = VariantCache(root=Path(tmp.name), max_bytes=1024 * 1024)
+
+    def test_lru_eviction_and_single_build(self):
+        cache = VariantCache(root=self.cache.root, max_bytes=250)
+        kept = cache.put('aa' * 32, 'png', b'x' * 100)
+        cache.put('bb' * 32, 'png', b'x' * 100)
+        cache.get('aa' * 32, 'png')
+        cache.put('cc' * 32, 'png', b'x' * 100)
+        self.assertTrue(kept.exists())
+        self.assertIsNone(cache.get('bb' * 32, 'png'))
+
+        builds = []
+
+        def build():
+            builds.append(1)
+            return b'y' * 10
+
+        path = cache.get_or_create('dd' * 32, 'png', build)
+        self.assertEqual(cache.get_or_create('dd' * 32, 'png', build), path)
+        self.assertEqual(path.read_bytes(), b'y' * 10)
+        self.assertEqual(len(builds), 1)
+
+    def test_hits_keep_validators_stable(self):
+        path = self.cache.put('ab' * 32, 'png', b'x' * 100)
+        before = file_validators(os.stat(path))
+        time.sleep(0.01)
+        for _ in range(3):
+            self.assertEqual(self.cache.get('ab' * 32, 'png'), path)
+        self.assertEqual(file_validators(os.stat(path)), before)
+
+    def test_lru_order_survives_reload(self):
+        old = self.cache.put('aa' * 32, 'png', b'x' * 100)
+        self.cache.put('bb' * 32, 'png', b'x' * 100)
+        time.sleep(0.01)
+        self.cache.get('aa' * 32, 'png')
+
+        # 新实例按 atime 重建顺序: 最近命中的 aa 不应先被淘汰
+        reloaded = VariantCache(root=self.cache.root, max_bytes=250)
+        reloaded.put('cc' * 32, 'png', b'x' * 100)
+        self.assertTrue(old.exists())
+        self.assertFalse(reloaded._path(f'{"bb" * 32}.png').exists())
+
+
+class SheetCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        settings_override = override_settings(SIDECAR_DIR=str(self.root / 'sidecars'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def write_sheet(self, name, rows):
+        path = self.root / f'{name}.xlsx'
+        wb = openpyxl.Workbook()
+        wb.active.append(HEADERS)
+        for row in rows:
+            wb.active.append(row)
+        wb.save(path)
+        return path
+
+    def cached(self, cache):
+        return [Path(key).stem for key in cache._entries]
+
+    def test_stamp_invalidation(self):
+        cache = SheetCache(max_entries=10, max_bytes=10 ** 9)
+        path = self.write_sheet('a', make_rows(3))
+        sheet = cache.get(path)
+        self.assertIs(cache.get(path), sheet)
+
+        # 外部改写xlsx
+        st = os.stat(path)
+        self.write_sheet('a', make_rows(5))
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        sheet = cache.get(path)
+        self.assertEqual(sheet.row_count, 5)
+
+        # 其他进程写入sidecar
+        CandidateSidecar(path).set_cells({2: {'judge_bob': 'exclude'}})
+        reparsed = cache.get(path)
+        self.assertIsNot(reparsed, sheet)
+        self.assertEqual(reparsed.get_row(2)[reparsed.header_map['judge_bob']], 'exclude')
+
+        path.unlink()
+        with self.assertRaises(FileNotFoundError):
+            cache.get(path)
+        self.assertEqual(self.cached(cache), [])
+
+    def test_update_keeps_entry_when_stamp_matches(self):
+        cache = SheetCache(max_entries=10, max_bytes=10 ** 9)
+        path = self.write_sheet('a', make_rows(3))
+        sheet = cache.get(path)
+
+        previous = sheet.stamp
+        CandidateSidecar(path).set_cells({1: {'judge_alice': 'suspect'}})
+        cache.update(path, {1: {'judge_alice': 'suspect'}}, previous)
+        self.assertIs(cache.get(path), sheet)
+        self.assertEqual(sheet.get_row(1)[sheet.header_map['judge_alice']], 'suspect')
+
+        # 其他进程先写入，写入前的校验戳与缓存不一致: 直接失效
+        CandidateSidecar(path).set_cells({2: {'judge_alice': 'exclude'}})
+        previous = sheet_stamp(path)
+        CandidateSidecar(path).set_cells({3: {'judge_alice': 'exclude'}})
+        cache.update(path, {3: {'judge_alice': 'exclude'}}, previous)
+        self.assertEqual(self.cached(cache), [])
+        reparsed = cache.get(path)
+        self.assertEqual(reparsed.get_row(2)[reparsed.header_map['judge_alice']], 'exclude')
+
+    def test_lru_eviction_by_entries(self):
+        cache = SheetCache(max_entries=2, max_bytes=10 ** 9)
+        a, b, c = (self.write_sheet(name, make_rows(3)) for name in 'abc')
+        cache.get(a)
+        cache.get(b)
+        cache.get(a)
+        cache.get(c)
+        self.assertEqual(self.cached(cache), ['a', 'c'])
+
+    def test_lru_eviction_by_bytes(self):
+        a, b, c = (self.write_sheet(name, make_rows(50)) for name in 'abc')
+        size = SheetCache(max_entries=10, max_bytes=10 ** 9).get(a).nbytes
+        cache = SheetCache(max_entries=10, max_bytes=size * 2 + size // 2)
+        cache.get(a)
+        cache.get(b)
+        cache.get(a)
+        cache.get(c)
+        self.assertEqual(self.cached(cache), ['a', 'c'])
+
+        # 超过上限的单个表仍保留最近使用的一项
+        cache.max_bytes = size // 2
+        cache.get(b)
+        self.assertEqual(self.cached(cache), ['b'])
+
+
+class TanWCSTests(SimpleTestCase):
+    HEADER = {
+        'CTYPE1': 'RA---TAN', 'CTYPE2': 'DEC--TAN',
+        'CRVAL1': 150.0, 'CRVAL2': 2.0, 'CRPIX1': 100.0, 'CRPIX2': 100.0,
+    }
+
+    def test_crota2_matches_cd_convention(self):
+        rot = math.radians(30)
+        cdelt1, cdelt2 = -0.001, 0.001
+        rotated = TanWCS.from_header(dict(self.HEADER, CDELT1=cdelt1, CDELT2=cdelt2, CROTA2=30.0))
+        cd = TanWCS.from_header(dict(
+            self.HEADER,
+            CD1_1=cdelt1 * math.cos(rot), CD1_2=-cdelt2 * math.sin(rot),
+            CD2_1=cdelt1 * math.sin(rot), CD2_2=cdelt2 * math.cos(rot)))
+        for ra, dec in ((150.0, 2.01), (150.02, 1.97), (149.95, 2.05)):
+            for got, expected in zip(rotated.world_to_pixel(ra, dec), cd.world_to_pixel(ra, dec)):
+                self.assertAlmostEqual(got, expected, places=6)
+
+    def test_crota2_north_offset(self):
+        # CDELT1<0 (东向左)、旋转30°: 正北 0.01° 在像素上是 (-5, +8.66)
+        wcs = TanWCS.from_header(dict(self.HEADER, CDELT1=-0.001, CDELT2=0.001, CROTA2=30.0))
+        x, y = wcs.world_to_pixel(150.0, 2.01)
+        self.assertAlmostEqual(x, 95.0, places=3)
+        self.assertAlmostEqual(y, 100 + 10 * math.cos(math.radians(30)), places=3)
+
+    def test_pixel_world_round_trip(self):
+        wcs = TanWCS.from_header(dict(self.HEADER, CDELT1=-0.001, CDELT2=0.001, CROTA2=-75.0))
+        for x, y in ((1.0, 1.0), (100.0, 100.0), (350.5, 20.25)):
+            ra, dec = wcs.pixel_to_world(x, y)
+            px, py = wcs.world_to_pixel(ra, dec)
+            self.assertAlmostEqual(px, x, places=6)
+            self.assertAlmostEqual(py, y, places=6)
+
+
+class WriteBehindQueueTests(SimpleTestCase):
+    def make_queue(self, **limits):
+        self.flushed = []
+        self.flushed_event = threading.Event()
+
+        def flush_fn(date, rows):
+            self.flushed.append((date, set(rows)))
+            self.flushed_event.set()
+
+        queue = WriteBehindQueue(flush_fn, **{'max_latency': 3600, 'max_batch': 10 ** 9, **limits})
+        self.addCleanup(queue.shutdown)
+        return queue
+
+    def test_rows_are_coalesced_per_date(self):
+        queue = self.make_queue()
+        queue.enqueue('20240101', [1, 2])
+        queue.enqueue('20240101', [2, 3])
+        queue.enqueue('20240102', [7])
+        self.assertEqual(self.flushed, [])
+
+        queue.flush('20240101')
+        self.assertEqual(self.flushed, [('20240101', {1, 2, 3})])
+        queue.flush()
+        queue.flush()
+        self.assertEqual(self.flushed, [('20240101', {1, 2, 3}), ('20240102', {7})])
+
+    def test_full_batch_is_flushed_without_waiting(self):
+        queue = self.make_queue(max_batch=3)
+        queue.enqueue('20240101', [1, 2])
+        self.assertFalse(self.flushed_event.wait(0.2))
+        queue.enqueue('20240101', [3])
+        self.assertTrue(self.flushed_event.wait(5))
+        self.assertEqual(self.flushed, [('20240101', {1, 2, 3})])
+
+    def test_rows_are_flushed_after_max_latency(self):
+        queue = self.make_queue(max_latency=0.1)
+        start = time.monotonic()
+        queue.enqueue('20240101', [1])
+        queue.enqueue('20240101', [2])
+        self.assertTrue(self.flushed_event.wait(5))
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(self.flushed, [('20240101', {1, 2})])
+
+    def test_shutdown_drains_the_queue(self):
+        queue = self.make_queue()
+        queue.enqueue('20240101', [1, 2])
+        queue.shutdown()
+        self.assertEqual(self.flushed, [('20240101', {1, 2})])
+        # 关闭后直接同步写回
+        queue.enqueue('20240101', [5])
+        self.assertEqual(self.flushed[-1], ('20240101', {5}))
+
+    def test_failed_flush_is_retried(self):
+        queue = self.make_queue()
+        calls = []
+
+        def failing(date, rows):
+            calls.append(set(rows))
+            if len(calls) == 1:
+                raise OSError('disk full')
+
+        queue.flush_fn = failing
+        queue.enqueue('20240101', [1])
+        with self.assertLogs('data.write_behind', 'ERROR'):
+            queue.flush()
+        queue.enqueue('20240101', [2])
+        queue.flush()
+        self.assertEqual(calls, [{1}, {1, 2}])
+
+
+class ServeFileTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.content = bytes(range(256)) * 4
+        self.path = Path(tmp.name) / 'frame_SEPnew.jpg'
+        self.path.write_bytes(self.content)
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        response = serve_file(self.factory.get('/', headers=headers), self.path, 'image/jpeg')
+        self.addCleanup(response.close)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_whole_file(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, self.content))
+        self.assertEqual(response['Content-Length'], '1024')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_byte_ranges(self):
+        for header, start, end in (('bytes=10-19', 10, 19), ('bytes=1000-', 1000, 1023),
+                                   ('bytes=1000-5000', 1000, 1023), ('bytes=-24', 1000, 1023),
+                                   ('bytes=-5000', 0, 1023)):
+            response, body = self.get(range=header)
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(body, self.content[start:end + 1], header)
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/1024', header)
+            self.assertEqual(response['Content-Length'], str(end - start + 1), header)
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        for header in ('bytes=1024-', 'bytes=5000-6000', 'bytes=-0'):
+            response, _ = self.get(range=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], 'bytes */1024', header)
+        # 多段、格式错误和颠倒的范围按规范忽略，返回整个文件
+        for header in ('bytes=0-1,5-6', 'items=0-1', 'bytes=20-10'):
+            response, body = self.get(range=header)
+            self.assertEqual((response.status_code, body), (200, self.content), header)
+
+    def test_conditional_requests(self):
+        etag = self.get()[0]['ETag']
+        response, body = self.get(if_none_match=etag)
+        self.assertEqual((response.status_code, body), (304, b''))
+        self.assertEqual(response['ETag'], etag)
+        response, _ = self.get(if_none_match='"other"')
+        self.assertEqual(response.status_code, 200)
+
+        response, body = self.get(range='bytes=0-9', if_range=etag)
+        self.assertEqual((response.status_code, body), (206, self.content[:10]))
+        response, body = self.get(range='bytes=0-9', if_range='"stale"')
+        self.assertEqual((response.status_code, body), (200, self.content))
+
+    def test_file_closed_without_reading_the_body(self):
+        opened = []
+        original_init = file_serving._FileRange.__init__
+
+        def init(body, *args):
+            original_init(body, *args)
+            opened.append(body.file)
+
+        with mock.patch.object(file_serving._FileRange, '__init__', init):
+            response = serve_file(self.factory.get('/'), self.path, 'image/jpeg')
+        self.assertFalse(opened[0].closed)
+        response.close()
+        self.assertTrue(opened[0].closed)
+
+
+class CandidateTableTests(SimpleTestCase):
+    def test_mixed_int_float_column_round_trip(self):
+        rows = [[1, 15], [2, 15.5], [3, None], [4, -2], [5, 2 ** 60]]
+        table = CandidateTable.from_rows(['id', 'mag'], rows[:4])
+        self.assertEqual(table.columns[1].kind, 'float')
+        values = table.column_values(1)
+        self.assertEqual(values, [15, 15.5, None, -2])
+        self.assertEqual([type(v) for v in values], [int, float, type(None), int])
+
+        table.set_cell(1, 1, 16.25)
+        table.set_cell(2, 1, 16)
+        self.assertEqual([type(v) for v in table.copy().column_values(1)][:2], [float, int])
+
+        table.append_row(rows[4])
+        self.assertEqual([r.to_list() for r in table.iter_rows()],
+                         [[1, 16.25], [2, 16], [3, None], [4, -2], [5, 2 ** 60]])
+
+        ids = CandidateTable.from_rows(['id'], [[1], [2]])
+        ids.set_cell(2, 0, 2.5)
+        self.assertEqual(ids.column_values(0), [1, 2.5])
+        self.assertIsInstance(ids.column_values(0)[0], int)
+
+
+class ExportFilterTests(NightTestCase):
+    def export(self, query):
+        response = self.client.get(f'/east-data/20240101/export/?format=jsonl&{query}')
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def setUp(self):
+        super().setUp()
+        self.write_night('20240101', make_rows(6))
+
+    def test_judgment_columns_exist_before_anyone_judged(self):
+        response, body = self.export('final_judge=suspect')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Row-Count'], '0')
+        response, _ = self.export('columns=id,judge_bob&judge_bob=')
+        self.assertEqual(response['X-Row-Count'], '6')
+
+    def test_non_column_parameters_are_ignored(self):
+        response, _ = self.export('_=1700000000&__profile=1&page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Row-Count'], '6')
+
+    def test_integer_cells_stay_integers(self):
+        rows = make_rows(6)
+        rows[1][3] = 16
+        self.write_night('20240106', rows)
+        response = self.client.get('/east-data/20240106/export/?format=jsonl')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([r['mag_new'] for r in records], [15.5, 16, 15.5, 15.5, 15.5, 15.5])
+        self.assertEqual([type(r['mag_new']) for r in records][:2], [float, int])
+        self.assertTrue(all(type(r['id']) is int for r in records))
+
+    def test_column_filters(self):
+        response, _ = self.export('attribute=new')
+        self.assertEqual(response['X-Row-Count'], '2')
+        response, _ = self.export('filter.attribute=new,mov')
+        self.assertEqual(response['X-Row-Count'], '4')
+        response, _ = self.export('filter.nosuch=1')
+        self.assertEqual(response.status_code, 400)
+
+
+class WorkingExcelTests(NightTestCase):
+    def download(self, date):
+        response = self.client.get(f'/east-data/{date}/download/')
+        self.assertEqual(response.status_code, 200)
+        b''.join(response.streaming_content)
+        return excel_manager.get_working_excel_path(date)
+
+    def test_download_keeps_other_sheets_and_formatting(self):
+        path = self.write_night('20240107', make_rows(5), sheets={'notes': [['seeing', 1.8], ['moon', 'full']]})
+        wb = openpyxl.load_workbook(path)
+        wb['candidates']['A1'].font = openpyxl.styles.Font(bold=True)
+        wb['candidates'].column_dimensions['F'].width = 40
+        wb.save(path)
+
+        self.client.post('/east-data/20240107/row/2/judge/', json.dumps({'judgment': 'suspect'}),
+                         content_type='application/json')
+        working = self.download('20240107')
+
+        wb = openpyxl.load_workbook(working)
+        self.assertEqual(wb.sheetnames, ['candidates', 'notes'])
+        self.assertEqual([[c.value for c in row] for row in wb['notes'].iter_rows()],
+                         [['seeing', 1.8], ['moon', 'full']])
+        ws = wb['candidates']
+        self.assertTrue(ws['A1'].font.bold)
+        self.assertEqual(ws.column_dimensions['F'].width, 40)
+        headers = [c.value for c in ws[1]]
+        self.assertEqual(headers[:len(HEADERS)], HEADERS)
+        self.assertEqual(ws.cell(row=3, column=headers.index('judge_alice') + 1).value, 'suspect')
+        self.assertEqual(ws.max_row, 6)
+
+    def test_clean_download_does_not_rewrite(self):
+        self.write_night('20240108', make_rows(5))
+        working = self.download('20240108')
+        stamp = os.stat(working).st_mtime_ns
+        self.download('20240108')
+        self.assertEqual(os.stat(working).st_mtime_ns, stamp)
+
+
+class NightCatalogTests(NightTestCase):
+    def night(self, date):
+        night_catalog.invalidate()
+        return next(n for n in night_catalog.nights() if n['name'] == date)
+
+    def test_progress_before_first_sync(self):
+        self.write_night('20240109', make_rows(12))
+        self.assertIsNone(self.night('20240109')['total_rows'])
+
+        sheet_cache.get(excel_manager.get_working_excel_path('20240109'))
+        self.client.post('/east-data/20240109/judge/bulk/',
+                         json.dumps({'items': [{'row_index': 3, 'judgment': 'exclude'}]}),
+                         content_type='application/json')
+        self.assertFalse(Night.objects.filter(date='20240109', synced_rows__isnull=False).exists())
+        night = self.night('20240109')
+        self.assertEqual((night['total_rows'], night['judged'], night['unjudged']), (12, 1, 11))
+
+    def test_reviewers_are_the_users_online(self):
+        self.write_night('20240110', make_rows(3))
+        Judgment.objects.create(date='20240110', row_index=1, username='carol', value='suspect')
+        get_presence_store().touch('20240110', 'bob', row=2)
+        self.assertEqual(self.night('20240110')['reviewers'], ['bob'])
+
+
+class RowsWindowTests(NightTestCase):
+    def test_windows_and_columns(self):
+        self.write_night('20240121', make_rows(25))
+        data = self.client.get('/east-data/20240121/rows/?offset=10&limit=5').json()
+        self.assertEqual((data['total'], data['offset'], data['headers']), (25, 10, HEADERS))
+        self.assertEqual([row['index'] for row in data['rows']], [11, 12, 13, 14, 15])
+        self.assertEqual(data['rows'][0]['data'], make_rows(1, start=11)[0])
+
+        data = self.client.get('/east-data/20240121/rows/?offset=20&limit=1000&columns=id,attribute').json()
+        self.assertEqual(data['headers'], ['id', 'attribute'])
+        self.assertEqual([row['data'] for row in data['rows']][:2], [[21, 'new'], [22, 'mov']])
+        self.assertEqual(len(data['rows']), 5)
+
+        self.assertEqual(self.client.get('/east-data/20240121/rows/?columns=nope').status_code, 400)
+        self.assertEqual(self.client.get('/east-data/20240121/rows/?offset=x').status_code, 400)
+
+
+class RowFilesTests(NightTestCase):
+    def write_files(self, date, *names):
+        directory = self.data_root / date / 'candidate-final'
+        for name in names:
+            (directory / name).write_bytes(b'x')
+
+    def test_files_of_a_row(self):
+        self.write_night('20240120', make_rows(3))
+        self.write_files('20240120', 'mov_0001_frame00001_new.fits', 'mov_0001_frame00001_SEPnew.jpg',
+                         'mov_0001_ref00001_new.fits')
+
+        data = self.client.get('/east-data/20240120/row/1/files/').json()
+        # 旧的一侧 (参考图) 观测时间较早，显示在左边
+        self.assertEqual([f['name'] for f in data['left']], ['mov_0001_ref00001_new.fits'])
+        self.assertEqual([(f['name'], f['type']) for f in data['right']],
+                         [('mov_0001_frame00001_new.fits', 'fits'), ('mov_0001_frame00001_SEPnew.jpg', 'jpg')])
+        self.assertEqual(data['left_time'], '2023-12-01 11:00:00')
+
+        self.assertEqual(self.client.get('/east-data/20240120/row/2/files/').json()['left'], [])
+        self.assertEqual(self.client.get('/east-data/20240120/row/4/files/').status_code, 404)
+
+    def test_batch_around_a_row(self):
+        self.write_night('20240123', make_rows(120))
+        self.write_files('20240123', 'var_0005_frame00005_SEPnew.jpg')
+
+        rows = self.client.get('/east-data/20240123/row-files/?center=5&radius=2').json()['rows']
+        self.assertEqual(list(rows), ['3', '4', '5', '6', '7'])
+        self.assertEqual(rows['5'], self.client.get('/east-data/20240123/row/5/files/').json())
+        self.assertEqual([f['name'] for f in rows['5']['right']], ['var_0005_frame00005_SEPnew.jpg'])
+
+        # 半径有上限，窗口截断在表的范围内
+        rows = self.client.get('/east-data/20240123/row-files/?center=100&radius=1000').json()['rows']
+        self.assertEqual((min(map(int, rows)), max(map(int, rows))), (100 - ROW_FILES_MAX_RADIUS, 120))
+        self.assertEqual(self.client.get('/east-data/20240123/row-files/?center=x').status_code, 400)
+
+
+class FileIndexTests(NightTestCase):
+    def test_judgment_writes_do_not_rescan(self):
+        self.write_night('20240111', make_rows(5))
+        self.client.get('/east-data/20240111/')
+        index = file_index.get('20240111')
+
+        self.client.post('/east-data/20240111/row/2/judge/', json.dumps({'judgment': 'suspect'}),
+                         content_type='application/json')
+        write_behind.flush('20240111')
+        self.assertIs(file_index.get('20240111'), index)
+        response = self.client.get('/east-data/20240111/download/')
+        b''.join(response.streaming_content)
+        self.assertIs(file_index.get('20240111'), index)
+
+        (index.path / 'new_0001_frame_SEPnew.jpg').write_bytes(b'jpg')
+        self.assertIn('new_0001_frame_SEPnew.jpg', file_index.get('20240111'))
+
+    def test_index_follows_directory_changes(self):
+        self.write_night('20240122', make_rows(1))
+        index = file_index.get('20240122')
+        self.assertIs(file_index.get('20240122'), index)
+        self.assertEqual(index.files_for('mov_0001_frame00001'), {})
+
+        directory = index.path
+        (directory / 'mov_0001_frame00001_new.fits').write_bytes(b'x')
+        (directory / 'mov_0001_frame00001_SEPlib.jpg').write_bytes(b'x')
+        # 目录 mtime 的精度可能较粗，显式推进
+        st = os.stat(directory)
+        os.utime(directory, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertEqual(file_index.get('20240122').files_for('mov_0001_frame00001'),
+                         {'_new.fits': 'mov_0001_frame00001_new.fits',
+                          '_SEPlib.jpg': 'mov_0001_frame00001_SEPlib.jpg'})
+
+        for path in directory.iterdir():
+            path.unlink()
+        directory.rmdir()
+        self.assertIsNone(file_index.get('20240122'))
+
+
+class TailSyncTests(NightTestCase):
+    DATE = '20240112'
+
+    def setUp(self):
+        super().setUp()
+        self.original = self.write_night(self.DATE, make_rows(10))
+        self.working = excel_manager.get_working_excel_path(self.DATE)
+
+    def sync(self):
+        with excel_manager.working_file_lock(self.DATE):
+            return excel_manager._sync_tail(self.DATE, self.original, self.working)
+
+    def ids(self):
+        return [row[0] for row in sheet_cache.get(self.working).iter_rows()]
+
+    def cell(self, row_index, column):
+        sheet = sheet_cache.get(self.working)
+        return sheet.get_row(row_index)[sheet.headers.index(column)]
+
+    def judge(self, row_index):
+        self.client.post(f'/east-data/{self.DATE}/row/{row_index}/judge/', json.dumps({'judgment': 'suspect'}),
+                         content_type='application/json')
+        write_behind.flush(self.DATE)
+
+    def test_unchanged_original_is_not_read(self):
+        self.assertEqual(self.sync()['added_rows'], 0)
+        with mock.patch('openpyxl.load_workbook', side_effect=AssertionError('original was read')):
+            result = self.sync()
+        self.assertEqual((result['success'], result['added_rows'], result['total_rows']), (True, 0, 10))
+
+    def test_only_rows_past_the_watermark_are_appended(self):
+        self.sync()
+        self.judge(4)
+        self.write_night(self.DATE, make_rows(13))
+        with mock.patch.object(CandidateSidecar, 'replace_rows', side_effect=AssertionError('full resync')):
+            result = self.sync()
+        self.assertEqual((result['added_rows'], result['total_rows']), (3, 13))
+        self.assertEqual(self.ids(), list(range(1, 14)))
+        self.assertEqual(Night.objects.get(date=self.DATE).synced_rows, 13)
+        self.assertEqual(self.cell(4, 'judge_alice'), 'suspect')
+
+        self.write_night(self.DATE, make_rows(15))
+        self.assertEqual(self.sync()['added_rows'], 2)
+        self.assertEqual(self.ids(), list(range(1, 16)))
+
+    def test_shrunk_original_is_resynced(self):
+        self.sync()
+        self.write_night(self.DATE, make_rows(6))
+        with self.assertLogs('data.excel_manager', 'WARNING'):
+            result = self.sync()
+        self.assertEqual((result['added_rows'], result['total_rows']), (0, 6))
+        self.assertEqual(self.ids(), list(range(1, 7)))
+
+    def test_replaced_original_is_resynced(self):
+        self.sync()
+        self.judge(2)
+        self.write_night(self.DATE, make_rows(12, start=101))
+        with self.assertLogs('data.excel_manager', 'WARNING'):
+            result = self.sync()
+        self.assertEqual((result['added_rows'], result['total_rows']), (2, 12))
+        self.assertEqual(self.ids(), list(range(101, 113)))
+        # 判定按行号保留
+        self.assertEqual(self.cell(2, 'judge_alice'), 'suspect')
+
+
+class JudgmentDeltaTests(NightTestCase):
+    URL = '/east-data/20240113/judgments/'
+
+    def setUp(self):
+        super().setUp()
+        self.write_night('20240113', make_rows(5))
+
+    def judge(self, row_index, judgment):
+        response = self.client.post(f'/east-data/20240113/row/{row_index}/judge/',
+                                    json.dumps({'judgment': judgment}), content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_delta_protocol(self):
+        self.judge(1, 'exclude')
+        snapshot = self.client.get(self.URL).json()
+        self.assertTrue(snapshot['full'])
+        self.assertEqual(list(snapshot['judgments']), ['1'])
+        version = snapshot['version']
+
+        self.assertEqual(self.client.get(self.URL, {'since': version}).status_code, 304)
+
+        self.judge(2, 'suspect')
+        delta = self.client.get(self.URL, {'since': version}).json()
+        self.assertFalse(delta['full'])
+        self.assertEqual(delta['judgments'], {'2': {'users': {'alice': 'suspect'}, 'final': 'suspect',
+                                                    'final_by': 'alice', 'remark': None}})
+        self.assertGreater(delta['version'], version)
+        version = delta['version']
+
+        # 取消的判定在增量中是空记录，客户端据此删除
+        self.judge(2, 'cancel')
+        delta = self.client.get(self.URL, {'since': version}).json()
+        self.assertEqual(delta['judgments'], {'2': {'users': {}, 'final': None, 'final_by': None,
+                                                    'remark': None}})
+
+    def test_cursor_from_the_future_gets_the_snapshot(self):
+        self.judge(3, 'suspect')
+        version = self.client.get(self.URL).json()['version']
+        response = self.client.get(self.URL, {'since': version + 100}).json()
+        self.assertTrue(response['full'])
+        self.assertEqual(response['version'], version)
+        self.assertEqual(list(response['judgments']), ['3'])
+        self.assertEqual(self.client.get(self.URL, {'since': 'abc'}).status_code, 400)
+
+
+@unittest.skipUnless(numpy_available(), 'FITS预览需要 NumPy')
+class DerivedFileCacheTests(NightTestCase):
+    def test_previews_are_revalidated(self):
+        self.write_night('20240114', make_rows(3))
+        fits = self.data_root / '20240114' / 'candidate-final' / 'new_0001_frame_new.fits'
+        fits.write_bytes(fits_bytes([float(i) for i in range(64)]))
+
+        original = self.client.get('/east-data/20240114/fits/new_0001_frame_new.fits')
+        self.assertIn('immutable', original['Cache-Control'])
+        original.close()
+
+        url = '/east-data/20240114/fits-preview/new_0001_frame_new.fits'
+        preview = self.client.get(url)
+        self.assertEqual(preview.status_code, 200)
+        self.assertEqual(preview['Cache-Control'], 'private, no-cache')
+        preview.close()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': preview['ETag']}).status_code, 304)
+
+        # 源文件被原地替换: 同一URL返回新的预览
+        fits.write_bytes(fits_bytes([float(i % 7) for i in range(64)]))
+        replaced = self.client.get(url, headers={'if-none-match': preview['ETag']})
+        self.assertEqual(replaced.status_code, 200)
+        self.assertNotEqual(replaced['ETag'], preview['ETag'])
+        replaced.close()
+
+
+class WriteBehindTests(NightTestCase):
+    def test_one_sidecar_write_per_batch(self):
+        self.write_night('20240115', make_rows(10))
+        self.client.get('/east-data/20240115/')
+        for row in (1, 2, 3, 2):
+            self.client.post(f'/east-data/20240115/row/{row}/judge/', json.dumps({'judgment': 'suspect'}),
+                             content_type='application/json')
+
+        with mock.patch.object(CandidateSidecar, 'set_cells', autospec=True,
+                               side_effect=CandidateSidecar.set_cells) as set_cells:
+            write_behind.flush('20240115')
+            write_behind.flush('20240115')
+        self.assertEqual(set_cells.call_count, 1)
+        self.assertEqual(sorted(set_cells.call_args.args[1]), [1, 2, 3])
+
+        sheet = sheet_cache.get(excel_manager.get_working_excel_path('20240115'))
+        column = sheet.headers.index('judge_alice')
+        self.assertEqual([sheet.get_row(i)[column] for i in (1, 2, 3, 4)], ['suspect'] * 3 + [None])
+
+
+class WorkingFileLockTests(NightTestCase):
+    def test_one_working_copy_when_threads_race(self):
+        original = self.write_night('20240116', make_rows(3))
+        copy2 = excel_manager.shutil.copy2
+
+        def slow_copy(*args, **kwargs):
+            time.sleep(0.05)
+            return copy2(*args, **kwargs)
+
+        # 每次取时间前进一秒，否则同一秒内的副本文件名相同，掩盖重复复制
+        ticks = iter(range(1000))
+
+        class Clock(datetime.datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.datetime(2024, 1, 16, 8, 0) + datetime.timedelta(seconds=next(ticks))
+
+        barrier = threading.Barrier(8)
+        paths = []
+
+        def open_night():
+            barrier.wait()
+            paths.append(excel_manager.get_working_excel_path('20240116'))
+
+        with mock.patch.object(excel_manager.shutil, 'copy2', slow_copy), \
+                mock.patch.object(excel_manager, 'datetime', Clock):
+            threads = [threading.Thread(target=open_night) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(list(original.parent.glob('candidate-final-20240116-*.xlsx'))), 1)
+        self.assertEqual(len(set(paths)), 1)
+
+    def test_lock_is_reentrant(self):
+        self.write_night('20240117', [])
+        with working_file_lock('20240117'):
+            with working_file_lock('20240117'):
+                pass
+            self.assertTrue(lock_file_path('20240117').exists())
+
+    @unittest.skipIf(fcntl is None, 'flock 只在 POSIX 上可用')
+    def test_lock_file_is_held_across_processes(self):
+        self.write_night('20240118', [])
+
+        def try_flock():
+            # 另一个打开的文件描述相当于另一个进程
+            fd = os.open(lock_file_path('20240118'), os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                return True
+            except BlockingIOError:
+                return False
+            finally:
+                os.close(fd)
+
+        with working_file_lock('20240118'):
+            with working_file_lock('20240118'):
+                self.assertFalse(try_flock())
+            # 内层释放后仍然持有
+            self.assertFalse(try_flock())
+        self.assertTrue(try_flock())
+
+
+class EventBusTests(SimpleTestCase):
+    def test_publish_from_another_thread(self):
+        bus = EventBus()
+
+        async def receive():
+            sub = bus.subscribe('20240101')
+            other = bus.subscribe('20240102')
+            publisher = threading.Thread(target=bus.publish, args=('20240101', 'sync', {'added_rows': 3}))
+            publisher.start()
+            try:
+                return await sub.get(5), await other.get(0.05)
+            finally:
+                publisher.join()
+                sub.close()
+                other.close()
+
+        self.assertEqual(asyncio.run(receive()), (('sync', {'added_rows': 3}), None))
+        self.assertEqual(bus.subscriber_count('20240101'), 0)
+
+    def test_format_sse(self):
+        self.assertEqual(format_sse('presence', {'users': {'张三': 1}}),
+                         'event: presence\ndata: {"users": {"张三": 1}}\n\n')
+
+
+class PresenceStoreTests(TransactionTestCase):
+    """同一组操作在两种存储上的结果应一致"""
+
+    def stores(self):
+        return MemoryPresenceStore(timeout=10), DatabasePresenceStore(timeout=10, expire_interval=0)
+
+    def at(self, now):
+        return mock.patch('data.presence.time.time', return_value=now)
+
+    def test_expired_users_disappear(self):
+        for store in self.stores():
+            with self.subTest(store=type(store).__name__):
+                with self.at(1000):
+                    store.touch('20240101', 'alice', row=1)
+                with self.at(1005):
+                    store.touch('20240101', 'bob', row=2)
+                    store.touch('20240102', 'carol')
+                with self.at(1009):
+                    self.assertEqual(store.active_users(), {'20240101': {'alice', 'bob'}, '20240102': {'carol'}})
+                with self.at(1012):
+                    self.assertEqual(store.active_users(), {'20240101': {'bob'}, '20240102': {'carol'}})
+                    self.assertEqual(set(store.users('20240101')), {'bob'})
+                with self.at(1020):
+                    self.assertEqual(store.active_users(), {})
+                    self.assertEqual(store.users('20240101'), {})
+
+    def test_refreshed_heartbeat_keeps_the_user(self):
+        for store in self.stores():
+            with self.subTest(store=type(store).__name__):
+                with self.at(1000):
+                    self.assertTrue(store.touch('20240101', 'alice', row=1))
+                with self.at(1008):
+                    # 只更新心跳，行不变
+                    self.assertFalse(store.touch('20240101', 'alice'))
+                with self.at(1015):
+                    # 1000 的旧条目已超时，但 alice 在 1008 刷新过
+                    self.assertEqual(store.users('20240101'), {'alice': {'row': 1, 'last_seen': 1008}})
+                    self.assertEqual(store.active_users(), {'20240101': {'alice'}})
+                with self.at(1019):
+                    self.assertEqual(store.expire(), {'20240101'})
+                    self.assertEqual(store.active_users(), {})
+
+
+class ConcurrentJudgmentTests(NightTestCase):
+    def test_concurrent_reads_and_writes(self):
+        self.write_night('20240102', make_rows(400))
+        self.client.get('/east-data/20240102/')
+        users = [User.objects.create_user(f'reviewer{n}', password='pw') for n in range(16)]
+        errors = []
+
+        def review(user, rows):
+            client = Client()
+            client.force_login(user)
+            try:
+                for row in rows:
+                    responses = [
+                        client.post(f'/east-data/20240102/row/{row}/judge/', json.dumps({'judgment': 'suspect'}),
+                                    content_type='application/json'),
+                        client.get('/east-data/20240102/judgments/'),
+                        client.get('/east-data/20240102/rows/?offset=0&limit=50'),
+                    ]
+                    errors.extend(f'{user.username} row {row}: {r.status_code} {r.content[:200]!r}'
+                                  for r in responses if r.status_code != 200)
+                    if row % 5 == 0:
+                        write_behind.flush('20240102')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=review, args=(user, range(1 + n * 20, 21 + n * 20)))
+                   for n, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Judgment.objects.filter(date='20240102', value='suspect').count(), 320)
+
+
+class JudgmentRowRangeTests(NightTestCase):
+    def test_rows_outside_the_night_are_rejected(self):
+        self.write_night('20240103', make_rows(29))
+        for row in (0, 30, 999):
+            for url, body in ((f'/east-data/20240103/row/{row}/judge/', {'judgment': 'suspect'}),
+                              (f'/east-data/20240103/row/{row}/remark/', {'remark': 'x'})):
+                response = self.client.post(url, json.dumps(body), content_type='application/json')
+                self.assertEqual(response.status_code, 400, url)
+        response = self.client.post('/east-data/20240103/row/29/judge/', json.dumps({'judgment': 'suspect'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        write_behind.flush('20240103')
+        self.assertEqual(self.client.get('/east-data/20240103/rows/').json()['total'], 29)
+
+
+class BulkJudgmentTests(NightTestCase):
+    def test_large_night_is_judged_in_chunks(self):
+        rows = BULK_JUDGMENT_MAX_ITEMS + 200
+        self.write_night('20240104', make_rows(rows))
+        page = self.client.get('/east-data/20240104/').content.decode()
+        # 页面按服务器的上限分批提交 (excludeRemainingOfAttribute / submitBulkJudgments)
+        self.assertIn(f'const BULK_MAX_ITEMS = {BULK_JUDGMENT_MAX_ITEMS};', page)
+
+        items = [{'row_index': i, 'judgment': 'exclude'} for i in range(1, rows + 1)]
+        url = '/east-data/20240104/judge/bulk/'
+        response = self.client.post(url, json.dumps({'items': items}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        for start in range(0, len(items), BULK_JUDGMENT_MAX_ITEMS):
+            chunk = items[start:start + BULK_JUDGMENT_MAX_ITEMS]
+            response = self.client.post(url, json.dumps({'items': chunk}), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['count'], len(chunk))
+        self.assertEqual(FinalJudgment.objects.filter(date='20240104', final='exclude').count(), rows)
+
+    def test_unjudged_rows_of_an_attribute(self):
+        # make_rows: attribute 按行号循环 new/mov/var，第1、4、7、10行为 mov
+        self.write_night('20240119', make_rows(10))
+        self.client.post('/east-data/20240119/row/4/judge/', json.dumps({'judgment': 'suspect'}),
+                         content_type='application/json')
+
+        response = self.client.get('/east-data/20240119/row/1/unjudged-same-attribute/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'attribute': 'mov', 'rows': [1, 7, 10]})
+        self.assertEqual(self.client.get('/east-data/20240119/row/11/unjudged-same-attribute/').status_code,
+                         404)
+
+
+class MetricsTests(NightTestCase):
+    def test_registry_render(self):
+        registry = MetricsRegistry()
+        requests = registry.counter('t_requests_total', 'Requests', ('view',))
+        seconds = registry.histogram('t_seconds', 'Time', buckets=(0.1, 1.0))
+        requests.inc(view='a "b"')
+        requests.inc(2, view='a "b"')
+        seconds.observe(0.5)
+        text = registry.render()
+        self.assertIn('# TYPE t_requests_total counter\nt_requests_total{view="a \\"b\\""} 3', text)
+        self.assertIn('t_seconds_bucket{le="0.1"} 0\nt_seconds_bucket{le="1.0"} 1\nt_seconds_bucket{le="+Inf"} 1', text)
+        self.assertIn('t_seconds_count 1', text)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_access(self):
+        self.write_night('20240124', make_rows(3))
+        self.client.get('/east-data/20240124/rows/')
+        text = self.client.get('/east-data/metrics').content.decode()
+        self.assertIn('east_http_requests_total{view="data:rows_window",method="GET",status="200"}', text)
+
+        anonymous = Client()
+        self.assertEqual(anonymous.get('/east-data/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code,
+                         200)
+        self.assertEqual(anonymous.get('/east-data/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code,
+                         403)
+        bob = User.objects.create_user('bob', password='pw')
+        anonymous.force_login(bob)
+        self.assertEqual(anonymous.get('/east-data/metrics').status_code, 403)
+
+
+class ProfilingMiddlewareTests(NightTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_night('20240105', make_rows(10))
+        settings_override = override_settings(
+            PROFILING_ENABLED=True, PROFILE_DIR=str(self.data_root / 'profiles'), PROFILE_SAMPLE_RATE=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def assertProfiled(self, response, profile):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(str(profile.pk), response['X-Profile-Id'])
+        self.assertEqual(profile.view_name, 'data:rows_window')
+        self.assertIn('rows_window', profile.stats_summary)
+
+    def test_wsgi_request_is_profiled(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get('/east-data/20240105/rows/?__profile=1')
+        self.assertProfiled(response, Profile.objects.get())
+
+    async def test_asgi_request_is_profiled(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get('/east-data/20240105/rows/?__profile=1')
+        self.assertProfiled(response, await Profile.objects.aget())
+
+        other = await User.objects.acreate_user('bob', password='pw')
+        await client.aforce_login(other)
+        response = await client.get('/east-data/20240105/rows/?__profile=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
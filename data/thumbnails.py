@@ -0,0 +1,81 @@
+# data/thumbnails.py - 候选体JPG的缩放变体
+
+import io
+from django.conf import settings
+from .variant_cache import variant_cache, variant_key
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 是可选依赖，未安装时只提供原图
+    Image = None
+
+# 输出格式: 扩展名, Content-Type
+VARIANT_FORMATS = {
+    'jpeg': ('jpg', 'image/jpeg'),
+    'webp': ('webp', 'image/webp'),
+}
+
+
+def variants_available():
+    return Image is not None
+
+
+def parse_variant(params):
+    """
+    解析请求参数中的变体规格 (?w=宽度&fmt=jpeg|webp)
+
+    只接受 settings.THUMBNAIL_WIDTHS 中的宽度，避免任意尺寸把缓存填满。
+
+    Returns:
+        tuple: (width, fmt)，不需要变体 (未指定宽度或Pillow不可用) 时返回None
+
+    Raises:
+        ValueError: 宽度或格式不受支持
+    """
+    width = params.get('w')
+    if not width:
+        return None
+    try:
+        width = int(width)
+    except ValueError:
+        raise ValueError(f'无效的宽度: {width}')
+    if width not in settings.THUMBNAIL_WIDTHS:
+        raise ValueError(f'不支持的宽度: {width}')
+    fmt = params.get('fmt', 'jpeg')
+    if fmt not in VARIANT_FORMATS:
+        raise ValueError(f'不支持的格式: {fmt}')
+    if not variants_available():
+        return None
+    return width, fmt
+
+
+def _render(source_path, width, fmt):
+    with Image.open(source_path) as img:
+        img.load()
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        out = io.BytesIO()
+        if fmt == 'webp':
+            img.save(out, 'WEBP', quality=settings.THUMBNAIL_QUALITY, method=4)
+        else:
+            img.save(out, 'JPEG', quality=settings.THUMBNAIL_QUALITY, progressive=True, optimize=True)
+        return out.getvalue()
+
+
+def get_variant(source_path, width, fmt):
+    """
+    获取 (必要时生成并缓存) 一张图片的缩放变体
+
+    Returns:
+        tuple: (文件路径, Content-Type)
+
+    Raises:
+        FileNotFoundError: 源文件不存在
+    """
+    ext, content_type = VARIANT_FORMATS[fmt]
+    key = variant_key(source_path, 'thumbnail', width, fmt, settings.THUMBNAIL_QUALITY)
+    path = variant_cache.get_or_create(key, ext, lambda: _render(source_path, width, fmt))
+    return path, content_type
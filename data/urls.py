@@ -5,16 +5,27 @@ app_name = 'data'
 
 urlpatterns = [
     path('', views.date_list, name='date_list'),
+    path('metrics', views.metrics, name='metrics'),
     path('<str:date>/', views.date_detail, name='date_detail'),
+    path('<str:date>/rows/', views.rows_window, name='rows_window'),
     path('<str:date>/row/<int:row_index>/files/', views.row_files, name='row_files'),
+    path('<str:date>/row/<int:row_index>/unjudged-same-attribute/', views.unjudged_same_attribute,
+         name='unjudged_same_attribute'),
+    path('<str:date>/row-files/', views.row_files_batch, name='row_files_batch'),
     path('<str:date>/image/<str:filename>', views.serve_image, name='serve_image'),
     path('<str:date>/fits/<str:filename>', views.serve_fits, name='serve_fits'),
+    path('<str:date>/download/', views.download_excel, name='download_excel'),
+    path('<str:date>/export/', views.export_candidates, name='export_candidates'),
+    path('<str:date>/fits-preview/<str:filename>', views.fits_preview, name='fits_preview'),
+    path('<str:date>/fits-cutout/<str:filename>', views.fits_cutout, name='fits_cutout'),
     path('<str:date>/status/', views.get_status, name='get_status'),
     path('<str:date>/status/update/', views.update_status, name='update_status'),
     path('<str:date>/row/<int:row_index>/judge/', views.submit_judgment, name='submit_judgment'),
     path('<str:date>/row/<int:row_index>/remark/', views.submit_remark, name='submit_remark'),
+    path('<str:date>/judge/bulk/', views.submit_judgments_bulk, name='submit_judgments_bulk'),
     path('<str:date>/judgments/', views.get_judgments, name='get_judgments'),
     path('<str:date>/sync-rows/', views.sync_excel_rows, name='sync_excel_rows'),
+    path('<str:date>/events/', views.event_stream, name='event_stream'),
     path('<str:date>/sync-status/', views.check_sync_status, name='check_sync_status'),
 ]
 
@@ -0,0 +1,182 @@
+# data/variant_cache.py - 派生文件 (缩略图/预览图等) 的磁盘缓存
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from django.conf import settings
+
+
+def variant_key(source_path, *params):
+    """
+    派生文件的内容寻址键
+
+    键由源文件路径、源文件的 (mtime_ns, size) 以及生成参数共同决定，
+    源文件被替换后旧的派生文件自然不再命中，随LRU淘汰。
+
+    Raises:
+        FileNotFoundError: 源文件不存在
+    """
+    st = os.stat(source_path)
+    raw = '\0'.join([str(source_path), str(st.st_mtime_ns), str(st.st_size)] + [str(p) for p in params])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class VariantCache:
+    """
+    有容量上限的磁盘缓存，按最近使用时间 (LRU) 淘汰
+
+    文件保存为 <root>/<键前2位>/<键>.<扩展名>，写入时先写临时文件再原子替换，
+    多进程共享同一目录是安全的。命中时更新文件 atime，启动时按 atime 重建LRU顺序，
+    因此淘汰顺序在进程重启和多进程之间基本保持一致。mtime 保持为生成时间不变，
+    由它得到的 ETag/Last-Modified 在多次命中之间保持稳定。
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self._root = root
+        self.max_bytes = max_bytes
+        self._entries = None  # OrderedDict {文件名: 大小}，最近使用的在末尾
+        self._total = 0
+        self._lock = threading.Lock()
+        self._building = {}  # {文件名: threading.Lock}，同一派生文件只生成一次
+
+    @property
+    def root(self):
+        return Path(self._root if self._root is not None else settings.VARIANT_CACHE_DIR)
+
+    def _limit(self):
+        return self.max_bytes if self.max_bytes is not None else settings.VARIANT_CACHE_MAX_BYTES
+
+    def _path(self, name):
+        return self.root / name[:2] / name
+
+    def _load(self):
+        # 调用方持有 self._lock
+        if self._entries is not None:
+            return
+        found = []
+        if self.root.exists():
+            for path in self.root.glob('*/*'):
+                if path.name.startswith('.'):
+                    continue
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                found.append((st.st_atime_ns, path.name, st.st_size))
+        found.sort()
+        self._entries = OrderedDict((name, size) for _, name, size in found)
+        self._total = sum(size for _, _, size in found)
+
+    def get(self, key, ext):
+        """
+        查找已缓存的派生文件
+
+        Returns:
+            Path: 文件路径，未命中时返回None
+        """
+        name = f'{key}.{ext}'
+        path = self._path(name)
+        with self._lock:
+            self._load()
+            if name in self._entries:
+                self._entries.move_to_end(name)
+            elif not path.exists():
+                return None
+            else:
+                # 其他进程生成的文件
+                size = path.stat().st_size
+                self._entries[name] = size
+                self._total += size
+        try:
+            # 只更新 atime (显式设置，不受 noatime/relatime 挂载选项影响)
+            os.utime(path, ns=(time.time_ns(), path.stat().st_mtime_ns))
+        except FileNotFoundError:
+            # 被其他进程淘汰
+            with self._lock:
+                self._total -= self._entries.pop(name, 0)
+            return None
+        return path
+
+    def put(self, key, ext, data):
+        """写入派生文件 (bytes) 并按容量淘汰，返回文件路径"""
+        name = f'{key}.{ext}'
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+        with self._lock:
+            self._load()
+            self._total -= self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._total += len(data)
+            self._evict(keep=name)
+        return path
+
+    def get_or_create(self, key, ext, build):
+        """
+        命中时直接返回，否则调用 build() 生成 bytes 并写入缓存
+
+        同一进程内并发请求同一个派生文件时只生成一次。
+        """
+        path = self.get(key, ext)
+        if path is not None:
+            return path
+
+        name = f'{key}.{ext}'
+        with self._lock:
+            building = self._building.setdefault(name, threading.Lock())
+        with building:
+            try:
+                path = self.get(key, ext)
+                if path is None:
+                    path = self.put(key, ext, build())
+                return path
+            finally:
+                with self._lock:
+                    self._building.pop(name, None)
+
+    def _evict(self, keep=None):
+        # 调用方持有 self._lock
+        limit = self._limit()
+        while self._total > limit and self._entries:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(name)
+                continue
+            del self._entries[name]
+            self._total -= size
+            try:
+                self._path(name).unlink()
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """删除所有缓存文件"""
+        with self._lock:
+            self._load()
+            for name in list(self._entries):
+                try:
+                    self._path(name).unlink()
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._total = 0
+
+
+variant_cache = VariantCache()
@@ -1,49 +1,75 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
-from django.http import JsonResponse, FileResponse, Http404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, JsonResponse, Http404, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.http import require_POST
-from pathlib import Path
 import os
-import re
-import openpyxl
+import tempfile
 import time
 import json
-from .excel_manager import get_working_excel_path, sync_new_rows_from_original
-
-# In-memory storage for online users and their current row
-# Format: {date: {username: {'row': row_index, 'last_seen': timestamp}}}
-online_users = {}
-ONLINE_TIMEOUT = 10  # seconds
-
-# In-memory storage for sync events
-# Format: {date: {'last_sync_time': timestamp, 'sync_count': int, 'added_rows': int}}
-sync_events = {}
+from .catalog import night_catalog
+from .events import event_bus, format_sse
+from .export import EXPORT_FORMATS, CandidateExport, parse_filters
+from .excel_manager import get_working_excel_path, sync_new_rows_from_original, write_working_excel
+from .file_serving import serve_file
+from .fits import FitsError, numpy_available
+from .fits_cutout import parse_cutout, make_cutout, encode_fits, encode_raw
+from .fits_preview import parse_preview, get_preview
+from .file_index import FITS_SUFFIXES, JPG_SUFFIXES, file_index, find_file
+from .judgment_store import (ensure_imported, set_judgment, set_judgments_bulk, set_remark,
+                             load_judgments, changed_rows, current_version, final_judged_rows)
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, phase, record_served_bytes, registry
+from .presence import get_presence_store
+from .sheet_cache import sheet_cache
+from .thumbnails import parse_variant, get_variant
+from .write_behind import write_behind
+
+# Row window sizes for the rows API
+ROWS_PAGE_SIZE = 200
+ROWS_MAX_LIMIT = 1000
+
+# Rows around the current one returned by the batch row files API
+ROW_FILES_RADIUS = 10
+ROW_FILES_MAX_RADIUS = 50
+
+# Largest accepted bulk judgment request
+BULK_JUDGMENT_MAX_ITEMS = 5000
+
+# Event stream timing: keepalive/presence refresh interval and client reconnect delay
+EVENT_STREAM_HEARTBEAT = 5  # seconds, must stay below presence.ONLINE_TIMEOUT
+EVENT_STREAM_RETRY_MS = 3000
+
+
+def metrics(request):
+    """Prometheus scrape endpoint: 'Authorization: Bearer <METRICS_TOKEN>' or a logged-in staff user"""
+    if not settings.METRICS_ENABLED:
+        raise Http404("Metrics are disabled")
+
+    token = settings.METRICS_TOKEN
+    authorized = bool(token) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+    if not (authorized or request.user.is_staff):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    return HttpResponse(registry.render(), content_type=METRICS_CONTENT_TYPE)
 
 
 @login_required
 def date_list(request):
-    data_root = Path(settings.DATA_ROOT)
-    data_file = settings.DATA_FILE
-    dates = []
-
-    if data_root.exists():
-        for item in sorted(data_root.iterdir(), reverse=True):
-            if item.is_dir() and re.match(r'^\d{8}$', item.name):
-                has_data = (item / data_file).exists()
-                dates.append({
-                    'name': item.name,
-                    'has_data': has_data
-                })
+    # Served from the in-memory catalog; only changed nights are re-stat'ed/re-counted
+    dates = night_catalog.nights()
 
-    return render(request, 'data/date_list.html', {'dates': dates})
+    with phase('template_render'):
+        return render(request, 'data/date_list.html', {'dates': dates})
 
 
 def get_row_files(date, attribute, seq_num, fits_new, fits_old):
     """Generate file info for a row"""
-    data_root = Path(settings.DATA_ROOT)
-    data_file = settings.DATA_FILE
-    base_dir = data_root / date / Path(data_file).parent
+    # One cached directory listing per date instead of a stat per candidate file
+    index = file_index.get(date)
 
     # Extract base names (remove _new.fits suffix)
     base_new = fits_new.replace('_new.fits', '') if fits_new else None
@@ -53,31 +79,31 @@ def get_row_files(date, attribute, seq_num, fits_new, fits_old):
     prefix = f"{attribute}_{seq_num:04d}_"
 
     files = {'new_time': [], 'old_time': []}
+    if index is None:
+        return files
 
     for base, time_key in [(base_new, 'new_time'), (base_old, 'old_time')]:
         if not base:
             continue
-        file_prefix = prefix + base
+        present = index.files_for(prefix + base)
 
         # Check for fits files
-        for suffix in ['_lib.fits', '_new.fits']:
-            fpath = base_dir / (file_prefix + suffix)
-            if fpath.exists():
+        for suffix in FITS_SUFFIXES:
+            if suffix in present:
                 files[time_key].append({
-                    'name': fpath.name,
+                    'name': present[suffix],
                     'type': 'fits',
-                    'path': str(fpath)
+                    'path': str(index.path / present[suffix])
                 })
 
         # Check for jpg files
-        for suffix in ['_SEPlib.jpg', '_SEPnew.jpg']:
-            fpath = base_dir / (file_prefix + suffix)
-            if fpath.exists():
+        for suffix in JPG_SUFFIXES:
+            if suffix in present:
                 files[time_key].append({
-                    'name': fpath.name,
+                    'name': present[suffix],
                     'type': 'jpg',
                     'subtype': 'lib' if 'lib' in suffix else 'new',
-                    'path': str(fpath)
+                    'path': str(index.path / present[suffix])
                 })
 
     return files
@@ -85,8 +111,8 @@ def get_row_files(date, attribute, seq_num, fits_new, fits_old):
 
 @login_required
 def date_detail(request, date):
-    rows = []
     headers = []
+    row_count = 0
     error = None
     excel_filename = None
 
@@ -95,34 +121,146 @@ def date_detail(request, date):
         file_path = get_working_excel_path(date)
         excel_filename = file_path.name  # 获取文件名
 
-        wb = openpyxl.load_workbook(file_path, read_only=True)
-        ws = wb.active
-        header_map = {}
-        for i, row in enumerate(ws.iter_rows(values_only=True)):
-            if i == 0:
-                headers = list(row)
-                header_map = {h: idx for idx, h in enumerate(headers)}
-            else:
-                rows.append({
-                    'index': i,
-                    'data': list(row)
-                })
-        wb.close()
+        # Rows are fetched by the page in windows from rows_window
+        sheet = sheet_cache.get(file_path)
+        headers = sheet.headers
+        row_count = sheet.row_count
     except FileNotFoundError as e:
         error = f'File not found: {e}'
     except Exception as e:
         error = f'Error: {str(e)}'
 
-    return render(request, 'data/date_detail.html', {
-        'date': date,
-        'headers': headers,
-        'rows': rows,
-        'error': error,
-        'excel_filename': excel_filename,
-        'auto_sync_interval': settings.AUTO_SYNC_INTERVAL,
-        'initial_row_count': len(rows)  # 传递当前行数给前端
-    })
+    with phase('template_render'):
+        return render(request, 'data/date_detail.html', {
+            'date': date,
+            'headers': headers,
+            'error': error,
+            'excel_filename': excel_filename,
+            'auto_sync_interval': settings.AUTO_SYNC_INTERVAL,
+            'rows_page_size': ROWS_PAGE_SIZE,
+            'bulk_max_items': BULK_JUDGMENT_MAX_ITEMS,
+            'initial_row_count': row_count  # 传递当前行数给前端
+        })
+
+
+def _json_cell(value):
+    """Cell value as shown in the table (non-JSON types rendered like the template did)"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+@login_required
+def rows_window(request, date):
+    """API to get a window of rows: ?offset=0&limit=200[&columns=a,b,c]"""
+    try:
+        offset = max(int(request.GET.get('offset', 0)), 0)
+        limit = min(max(int(request.GET.get('limit', ROWS_PAGE_SIZE)), 0), ROWS_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid offset or limit'}, status=400)
+
+    try:
+        sheet = sheet_cache.get(get_working_excel_path(date))
+    except FileNotFoundError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+
+    try:
+        headers = sheet.headers
+        col_indexes = None
+        columns = request.GET.get('columns')
+        if columns:
+            names = [c for c in columns.split(',') if c]
+            unknown = [c for c in names if c not in sheet.header_map]
+            if unknown:
+                return JsonResponse({'error': f'Unknown columns: {", ".join(unknown)}'}, status=400)
+            headers = names
+            col_indexes = [sheet.header_map[c] for c in names]
+
+        rows = []
+        for row in sheet.iter_rows(offset + 1, offset + limit):
+            if col_indexes is None:
+                data = [_json_cell(v) for v in row]
+            else:
+                data = [_json_cell(row[c]) for c in col_indexes]
+            rows.append({'index': row.index, 'data': data})
+
+        return JsonResponse({
+            'total': sheet.row_count,
+            'offset': offset,
+            'headers': headers,
+            'rows': rows
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+def unjudged_same_attribute(request, date, row_index):
+    """API to list the rows sharing this row's attribute that have no final verdict yet"""
+    try:
+        ensure_imported(date)
+        sheet = sheet_cache.get(get_working_excel_path(date))
+    except FileNotFoundError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+
+    col_idx = sheet.header_map.get('attribute')
+    if col_idx is None:
+        return JsonResponse({'error': 'No attribute column'}, status=400)
+    target_row = sheet.get_row(row_index)
+    if not target_row:
+        return JsonResponse({'error': 'Row not found'}, status=404)
+    attribute = target_row[col_idx]
+    if attribute is None:
+        return JsonResponse({'error': 'Row has no attribute'}, status=400)
+
+    try:
+        judged = final_judged_rows(date)
+        rows = [idx for idx, value in enumerate(sheet.column_values(col_idx), start=1)
+                if value == attribute and idx not in judged]
+        return JsonResponse({'attribute': _json_cell(attribute), 'rows': rows})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+def row_file_info(date, sheet, row_index):
+    """Files, coordinates and observation times of one row (None if the row does not exist)"""
+    target_row = sheet.get_row(row_index)
+
+    if not target_row:
+        return None
 
+    # Get column indices
+    h_map = sheet.header_map
+    attribute = target_row[h_map.get('attribute', 1)]
+    seq_num = target_row[h_map.get('sequence_number', 2)]
+    fits_new = target_row[h_map.get('fits_filename_new', 11)]
+    fits_old = target_row[h_map.get('fits_filename_old', 15)]
+    time_new = target_row[h_map.get('time_utc_new', 10)]
+    time_old = target_row[h_map.get('time_utc_old', 14)]
+
+    # Get coordinates
+    ra_deg = target_row[h_map.get('ra_deg_new')] if 'ra_deg_new' in h_map else None
+    dec_deg = target_row[h_map.get('dec_deg_new')] if 'dec_deg_new' in h_map else None
+    ra_hms = target_row[h_map.get('RA_hms_new')] if 'RA_hms_new' in h_map else None
+    dec_dms = target_row[h_map.get('Dec_dms_new')] if 'Dec_dms_new' in h_map else None
+
+    files = get_row_files(date, attribute, int(seq_num), fits_new, fits_old)
+
+    # Determine which is earlier
+    if time_old and time_new and str(time_old) < str(time_new):
+        result = {'left': files['old_time'], 'right': files['new_time'],
+                  'left_time': str(time_old), 'right_time': str(time_new)}
+    else:
+        result = {'left': files['new_time'], 'right': files['old_time'],
+                  'left_time': str(time_new), 'right_time': str(time_old)}
+
+    # Add coordinates
+    result['ra_deg'] = float(ra_deg) if ra_deg else None
+    result['dec_deg'] = float(dec_deg) if dec_deg else None
+    result['ra_hms'] = str(ra_hms) if ra_hms else None
+    result['dec_dms'] = str(dec_dms) if dec_dms else None
+
+    return result
 
 
 @login_required
@@ -131,54 +269,44 @@ def row_files(request, date, row_index):
     try:
         file_path = get_working_excel_path(date)
 
-        wb = openpyxl.load_workbook(file_path, read_only=True)
-        ws = wb.active
-        headers = []
-        target_row = None
-
-        for i, row in enumerate(ws.iter_rows(values_only=True)):
-            if i == 0:
-                headers = list(row)
-            elif i == row_index:
-                target_row = list(row)
-                break
-        wb.close()
+        # Direct lookup in the cached row index, independent of row position
+        sheet = sheet_cache.get(file_path)
+        result = row_file_info(date, sheet, row_index)
 
-        if not target_row:
+        if result is None:
             return JsonResponse({'error': 'Row not found'}, status=404)
 
-        # Get column indices
-        h_map = {h: idx for idx, h in enumerate(headers)}
-        attribute = target_row[h_map.get('attribute', 1)]
-        seq_num = target_row[h_map.get('sequence_number', 2)]
-        fits_new = target_row[h_map.get('fits_filename_new', 11)]
-        fits_old = target_row[h_map.get('fits_filename_old', 15)]
-        time_new = target_row[h_map.get('time_utc_new', 10)]
-        time_old = target_row[h_map.get('time_utc_old', 14)]
-
-        # Get coordinates
-        ra_deg = target_row[h_map.get('ra_deg_new')] if 'ra_deg_new' in h_map else None
-        dec_deg = target_row[h_map.get('dec_deg_new')] if 'dec_deg_new' in h_map else None
-        ra_hms = target_row[h_map.get('RA_hms_new')] if 'RA_hms_new' in h_map else None
-        dec_dms = target_row[h_map.get('Dec_dms_new')] if 'Dec_dms_new' in h_map else None
-
-        files = get_row_files(date, attribute, int(seq_num), fits_new, fits_old)
-
-        # Determine which is earlier
-        if time_old and time_new and str(time_old) < str(time_new):
-            result = {'left': files['old_time'], 'right': files['new_time'],
-                      'left_time': str(time_old), 'right_time': str(time_new)}
-        else:
-            result = {'left': files['new_time'], 'right': files['old_time'],
-                      'left_time': str(time_new), 'right_time': str(time_old)}
+        return JsonResponse(result)
+    except FileNotFoundError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
 
-        # Add coordinates
-        result['ra_deg'] = float(ra_deg) if ra_deg else None
-        result['dec_deg'] = float(dec_deg) if dec_deg else None
-        result['ra_hms'] = str(ra_hms) if ra_hms else None
-        result['dec_dms'] = str(dec_dms) if dec_dms else None
 
-        return JsonResponse(result)
+@login_required
+def row_files_batch(request, date):
+    """File info for a window of rows: ?center=<row>&radius=<n> (rows center-n .. center+n)"""
+    try:
+        center = int(request.GET.get('center', 1))
+        radius = min(max(int(request.GET.get('radius', ROW_FILES_RADIUS)), 0), ROW_FILES_MAX_RADIUS)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid center/radius'}, status=400)
+
+    try:
+        file_path = get_working_excel_path(date)
+        sheet = sheet_cache.get(file_path)
+
+        rows = {}
+        for row_index in range(max(center - radius, 1), min(center + radius, sheet.row_count) + 1):
+            try:
+                info = row_file_info(date, sheet, row_index)
+            except (TypeError, ValueError):
+                # Malformed row (e.g. missing sequence number); the single-row API reports it
+                continue
+            if info is not None:
+                rows[row_index] = info
+
+        return JsonResponse({'rows': rows})
     except FileNotFoundError as e:
         return JsonResponse({'error': str(e)}, status=404)
     except Exception as e:
@@ -187,43 +315,173 @@ def row_files(request, date, row_index):
 
 @login_required
 def serve_image(request, date, filename):
-    """Serve image file"""
-    data_root = Path(settings.DATA_ROOT)
-    data_file = settings.DATA_FILE
-    file_path = data_root / date / Path(data_file).parent / filename
+    """Serve image file, or a cached resized variant with ?w=<width>[&fmt=jpeg|webp]"""
+    file_path = find_file(date, filename)
 
-    if not file_path.exists() or not filename.endswith('.jpg'):
+    if file_path is None or not filename.endswith('.jpg'):
         raise Http404("Image not found")
 
-    return FileResponse(open(file_path, 'rb'), content_type='image/jpeg')
+    try:
+        variant = parse_variant(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        if variant is not None:
+            variant_path, content_type = get_variant(file_path, *variant)
+            response = serve_file(request, variant_path, content_type, immutable=False)
+        else:
+            response = serve_file(request, file_path, 'image/jpeg')
+    except FileNotFoundError:
+        # Removed since the directory was last scanned
+        raise Http404("Image not found")
+    record_served_bytes('image', response)
+    return response
 
 
 @login_required
 def serve_fits(request, date, filename):
     """Serve fits file for download"""
-    data_root = Path(settings.DATA_ROOT)
-    data_file = settings.DATA_FILE
-    file_path = data_root / date / Path(data_file).parent / filename
+    file_path = find_file(date, filename)
 
-    if not file_path.exists() or not filename.endswith('.fits'):
+    if file_path is None or not filename.endswith('.fits'):
         raise Http404("File not found")
 
-    response = FileResponse(open(file_path, 'rb'), content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{file_path.name}"'
+    try:
+        # Range support lets interrupted downloads resume
+        response = serve_file(request, file_path, 'application/octet-stream', filename=file_path.name)
+    except FileNotFoundError:
+        raise Http404("File not found")
+    record_served_bytes('fits', response)
     return response
 
 
-def clean_expired_users(date):
-    """Remove users who haven't been seen recently"""
-    if date not in online_users:
-        return
-    current_time = time.time()
-    expired = [user for user, data in online_users[date].items()
-               if current_time - data['last_seen'] > ONLINE_TIMEOUT]
-    for user in expired:
-        del online_users[date][user]
-    if not online_users[date]:
-        del online_users[date]
+@login_required
+def download_excel(request, date):
+    """Download the working xlsx, regenerated from the sidecar when it has unexported changes"""
+    try:
+        # Judgments still waiting in the write-behind queue go into this download too
+        write_behind.flush(date)
+        file_path = write_working_excel(date)
+        response = serve_file(request, file_path,
+                              'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                              filename=file_path.name)
+    except FileNotFoundError:
+        raise Http404("File not found")
+    # Same URL, changing content: always revalidate (the ETag still allows 304s)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def export_candidates(request, date):
+    """
+    Candidates with judgments as csv / jsonl / xlsx (?format=jsonl&final_judge=suspect&columns=a,b)
+
+    Parameters naming a column filter on it (others are ignored); filter.<column>=... must name one.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'Unsupported format: {fmt}'}, status=400)
+    columns = [c for c in request.GET.get('columns', '').split(',') if c]
+
+    try:
+        filters, loose_filters = parse_filters(request.GET)
+        export = CandidateExport(date, filters, columns, loose_filters=loose_filters)
+    except FileNotFoundError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    content_type, ext = EXPORT_FORMATS[fmt]
+    filename = f'{export.filename}.{ext}'
+    if fmt == 'xlsx':
+        # A zip container can't be streamed; spool it to a temporary file instead of memory
+        f = tempfile.TemporaryFile()
+        export.write_xlsx(f)
+        f.seek(0)
+        return FileResponse(f, as_attachment=True, filename=filename, content_type=content_type)
+
+    chunks = export.iter_csv() if fmt == 'csv' else export.iter_jsonl()
+    response = StreamingHttpResponse((chunk.encode('utf-8') for chunk in chunks), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Row-Count'] = str(export.row_count)
+    return response
+
+
+@login_required
+def fits_preview(request, date, filename):
+    """Stretched PNG preview of a fits file (?stretch=asinh|linear|sqrt|log&interval=zscale|minmax|99.5)"""
+    file_path = find_file(date, filename)
+
+    if file_path is None or not filename.endswith('.fits'):
+        raise Http404("File not found")
+    if not numpy_available():
+        return JsonResponse({'error': 'FITS预览需要安装 NumPy'}, status=501)
+
+    try:
+        stretch, interval = parse_preview(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        preview_path = get_preview(file_path, stretch, interval)
+        return serve_file(request, preview_path, 'image/png', immutable=False)
+    except FileNotFoundError:
+        raise Http404("File not found")
+    except FitsError as e:
+        return JsonResponse({'error': str(e)}, status=422)
+
+
+@login_required
+def fits_cutout(request, date, filename):
+    """
+    Sub-array of a fits file around a position
+
+    ?x=&y= (1-based pixel) or ?ra=&dec= (degrees), &size=64, &format=fits|raw.
+    raw is little-endian float32, shape and origin are in the X-Cutout-* headers.
+    """
+    file_path = find_file(date, filename)
+
+    if file_path is None or not filename.endswith('.fits'):
+        raise Http404("File not found")
+    if not numpy_available():
+        return JsonResponse({'error': 'FITS裁剪需要安装 NumPy'}, status=501)
+
+    try:
+        spec = parse_cutout(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        cutout = make_cutout(file_path, spec['size'], x=spec['x'], y=spec['y'],
+                             ra=spec['ra'], dec=spec['dec'])
+    except FileNotFoundError:
+        raise Http404("File not found")
+    except ValueError as e:
+        # FitsError included: unsupported file or no WCS
+        return JsonResponse({'error': str(e)}, status=422)
+
+    if spec['format'] == 'raw':
+        response = HttpResponse(encode_raw(cutout), content_type='application/octet-stream')
+    else:
+        response = HttpResponse(encode_fits(cutout), content_type='application/fits')
+        stem = filename[:-len('.fits')]
+        response['Content-Disposition'] = (
+            f'attachment; filename="{stem}_cutout_{cutout.origin[0]}_{cutout.origin[1]}.fits"')
+    response['X-Cutout-Shape'] = '{},{}'.format(*cutout.data.shape)
+    response['X-Cutout-Origin'] = '{},{}'.format(*cutout.origin)
+    return response
+
+
+def publish_presence(date):
+    event_bus.publish(date, 'presence', {'users': get_presence_store().users(date)})
+
+
+def expire_presence():
+    """Expire stale users and notify the dates whose online list changed"""
+    for date in get_presence_store().expire():
+        publish_presence(date)
 
 
 @login_required
@@ -235,15 +493,10 @@ def update_status(request, date):
         row_index = data.get('row_index')
         username = request.user.username
 
-        if date not in online_users:
-            online_users[date] = {}
-
-        online_users[date][username] = {
-            'row': row_index,
-            'last_seen': time.time()
-        }
-
-        clean_expired_users(date)
+        changed = get_presence_store().touch(date, username, row_index)
+        expire_presence()
+        if changed:
+            publish_presence(date)
 
         return JsonResponse({'status': 'ok'})
     except Exception as e:
@@ -253,77 +506,88 @@ def update_status(request, date):
 @login_required
 def get_status(request, date):
     """Get all online users and their current rows"""
-    clean_expired_users(date)
-
-    users = {}
-    if date in online_users:
-        for username, data in online_users[date].items():
-            users[username] = {
-                'row': data['row'],
-                'last_seen': data['last_seen']
-            }
+    expire_presence()
 
     return JsonResponse({
-        'users': users,
+        'users': get_presence_store().users(date),
         'current_user': request.user.username
     })
 
 
-# File lock for Excel operations
-import threading
-excel_lock = threading.Lock()
-
-
-def get_or_create_judge_column(ws, headers, username):
-    """Get or create a judgment column for the user"""
-    col_name = f'judge_{username}'
-    if col_name in headers:
-        return headers.index(col_name) + 1, headers
-
-    # Create new column
-    new_col_idx = len(headers) + 1
-    ws.cell(row=1, column=new_col_idx, value=col_name)
-    headers.append(col_name)
-    return new_col_idx, headers
-
-
-def get_or_create_final_judge_column(ws, headers):
-    """Get or create the final judgment column"""
-    col_name = 'final_judge'
-    if col_name in headers:
-        return headers.index(col_name) + 1, headers
-
-    # Create new column at the end
-    new_col_idx = len(headers) + 1
-    ws.cell(row=1, column=new_col_idx, value=col_name)
-    headers.append(col_name)
-    return new_col_idx, headers
-
-
-def get_or_create_final_judge_by_column(ws, headers):
-    """Get or create the final judgment by column (records who made the last judgment)"""
-    col_name = 'final_judge_by'
-    if col_name in headers:
-        return headers.index(col_name) + 1, headers
-
-    # Create new column at the end
-    new_col_idx = len(headers) + 1
-    ws.cell(row=1, column=new_col_idx, value=col_name)
-    headers.append(col_name)
-    return new_col_idx, headers
-
+@login_required
+async def event_stream(request, date):
+    """
+    Server-Sent Events for a date: presence, judgment and sync changes
+
+    Only served under ASGI; under WSGI it answers 204 so EventSource stops
+    reconnecting and the page keeps using the polling endpoints.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    username = user.username
+
+    store = get_presence_store()
+
+    def snapshot():
+        users = store.users(date)
+        rows = {name: data['row'] for name, data in users.items()}
+        return users, rows, current_version(date), store.sync_event(date)
+
+    async def stream():
+        if await sync_to_async(store.touch)(date, username):
+            await sync_to_async(publish_presence)(date)
+        sub = event_bus.subscribe(date)
+        try:
+            yield f'retry: {EVENT_STREAM_RETRY_MS}\n\n'
+            # Initial state, so the client needs no extra request after (re)connecting
+            users, rows, version, sync = await sync_to_async(snapshot)()
+            yield format_sse('presence', {'users': users})
+            while True:
+                item = await sub.get(EVENT_STREAM_HEARTBEAT)
+                if item is None:
+                    # Idle: keep this user online and expire others without any client request
+                    await sync_to_async(store.touch)(date, username)
+                    await sync_to_async(expire_presence)()
+                    if store.cross_process:
+                        # Other worker processes publish on their own event bus;
+                        # forward whatever changed in the shared store since the last event
+                        users, new_rows, new_version, new_sync = await sync_to_async(snapshot)()
+                        if new_rows != rows:
+                            yield format_sse('presence', {'users': users})
+                        if new_version > version:
+                            # No row data: the client catches up through its version cursor
+                            yield format_sse('judgments', {'version': new_version})
+                        if new_sync and new_sync != sync:
+                            yield format_sse('sync', new_sync)
+                        rows, version, sync = new_rows, new_version, new_sync
+                    yield ': keepalive\n\n'
+                else:
+                    event, data = item
+                    if event == 'presence':
+                        rows = {name: user['row'] for name, user in data['users'].items()}
+                    elif event == 'judgments':
+                        version = max(version, data['version'])
+                    elif event == 'sync':
+                        sync = data
+                    yield format_sse(event, data)
+        finally:
+            sub.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-def get_or_create_remark_column(ws, headers):
-    """Get or create the remark column"""
-    col_name = 'final_remark'
-    if col_name in headers:
-        return headers.index(col_name) + 1, headers
 
-    # Create new column at the end
-    new_col_idx = len(headers) + 1
-    ws.cell(row=1, column=new_col_idx, value=col_name)
-    headers.append(col_name)
-    return new_col_idx, headers
+def publish_judgments(date, version, row_indexes):
+    """Push the new state of changed rows to open event streams"""
+    if event_bus.subscriber_count(date):
+        event_bus.publish(date, 'judgments', {
+            'version': version,
+            'judgments': load_judgments(date, row_indexes)
+        })
 
 
 @login_required
@@ -331,9 +595,12 @@ def get_or_create_remark_column(ws, headers):
 def submit_judgment(request, date, row_index):
     """Submit a judgment for a row"""
     try:
-        file_path = get_working_excel_path(date)
+        ensure_imported(date)
+        sheet = sheet_cache.get(get_working_excel_path(date))
     except FileNotFoundError as e:
         return JsonResponse({'error': str(e)}, status=404)
+    if not 1 <= row_index <= sheet.row_count:
+        return JsonResponse({'error': 'Invalid row_index'}, status=400)
 
     try:
         data = json.loads(request.body)
@@ -343,44 +610,90 @@ def submit_judgment(request, date, row_index):
         if judgment not in ['exclude', 'suspect', 'cancel']:
             return JsonResponse({'error': 'Invalid judgment'}, status=400)
 
-        with excel_lock:
-            wb = openpyxl.load_workbook(file_path)
-            ws = wb.active
+        version = set_judgment(date, row_index, username, judgment)
 
-            # Get headers
-            headers = [cell.value for cell in ws[1]]
+        # Acknowledge now; the xlsx judgment columns are written back in batches
+        write_behind.enqueue(date, [row_index])
+        publish_judgments(date, version, [row_index])
 
-            # Get or create user's judgment column
-            user_col, headers = get_or_create_judge_column(ws, headers, username)
+        return JsonResponse({
+            'status': 'ok',
+            'judgment': judgment,
+            'user': username,
+            'version': version
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
 
-            # Get or create final judgment column
-            final_col, headers = get_or_create_final_judge_column(ws, headers)
 
-            # Get or create final judgment by column
-            final_by_col, headers = get_or_create_final_judge_by_column(ws, headers)
+def _parse_bulk_items(data, row_count):
+    """Validate bulk judgment items; returns (items, errors)"""
+    raw_items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(raw_items, list) or not raw_items:
+        return None, [{'error': 'items must be a non-empty list'}]
+    if len(raw_items) > BULK_JUDGMENT_MAX_ITEMS:
+        return None, [{'error': f'At most {BULK_JUDGMENT_MAX_ITEMS} items per request'}]
 
-            if judgment == 'cancel':
-                # Clear user's judgment (use empty string instead of None for openpyxl)
-                ws.cell(row=row_index + 1, column=user_col).value = ''
-                # Clear final judgment
-                ws.cell(row=row_index + 1, column=final_col).value = ''
-                # Clear who made the final judgment
-                ws.cell(row=row_index + 1, column=final_by_col).value = ''
-            else:
-                # Write user's judgment
-                ws.cell(row=row_index + 1, column=user_col, value=judgment)
-                # Write final judgment
-                ws.cell(row=row_index + 1, column=final_col, value=judgment)
-                # Write who made the final judgment
-                ws.cell(row=row_index + 1, column=final_by_col, value=username)
+    items, errors, seen = [], [], set()
+    for i, item in enumerate(raw_items):
+        if not isinstance(item, dict):
+            errors.append({'item': i, 'error': 'Item must be an object'})
+            continue
+        row_index = item.get('row_index')
+        judgment = item.get('judgment')
+        remark = item.get('remark')
+        if not isinstance(row_index, int) or isinstance(row_index, bool) or not 1 <= row_index <= row_count:
+            errors.append({'item': i, 'error': 'Invalid row_index'})
+        elif row_index in seen:
+            errors.append({'item': i, 'error': 'Duplicate row_index'})
+        elif judgment not in ['exclude', 'suspect', 'cancel']:
+            errors.append({'item': i, 'error': 'Invalid judgment'})
+        elif remark is not None and not isinstance(remark, str):
+            errors.append({'item': i, 'error': 'Invalid remark'})
+        else:
+            seen.add(row_index)
+            items.append((row_index, judgment, remark))
+    return items, errors
+
+
+@login_required
+@require_POST
+def submit_judgments_bulk(request, date):
+    """
+    Submit judgments for many rows at once
+
+    Body: {"items": [{"row_index": 1, "judgment": "exclude", "remark": "..."}]}
+    (remark optional). All items are validated first; nothing is applied if any
+    is invalid. Valid batches are applied in one transaction with one version.
+    """
+    try:
+        ensure_imported(date)
+        sheet = sheet_cache.get(get_working_excel_path(date))
+    except FileNotFoundError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+
+    try:
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+        items, errors = _parse_bulk_items(data, sheet.row_count)
+        if errors:
+            return JsonResponse({'error': 'Invalid items', 'errors': errors}, status=400)
 
-            wb.save(file_path)
-            wb.close()
+        username = request.user.username
+        version = set_judgments_bulk(date, username, items)
+
+        row_indexes = [row_index for row_index, _, _ in items]
+        write_behind.enqueue(date, row_indexes)
+        publish_judgments(date, version, row_indexes)
 
         return JsonResponse({
             'status': 'ok',
-            'judgment': judgment,
-            'user': username
+            'count': len(items),
+            'user': username,
+            'version': version
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -388,70 +701,43 @@ def submit_judgment(request, date, row_index):
 
 @login_required
 def get_judgments(request, date):
-    """Get all judgments for a date"""
+    """
+    Get judgments for a date
+
+    Without ?since= the full snapshot is returned. With ?since=<version> only
+    rows changed after that version are returned (an empty 304 when nothing
+    changed); clients keep the returned 'version' as their next cursor.
+    """
     try:
-        file_path = get_working_excel_path(date)
+        ensure_imported(date)
     except FileNotFoundError as e:
         return JsonResponse({'error': str(e)}, status=404)
 
     try:
-        wb = openpyxl.load_workbook(file_path, read_only=True)
-        ws = wb.active
-
-        headers = [cell.value for cell in ws[1]]
-
-        # Find judgment and remark columns
-        judge_cols = {}
-        final_col = None
-        final_by_col = None
-        remark_col = None
-        for idx, h in enumerate(headers):
-            if h and h.startswith('judge_'):
-                username = h[6:]  # Remove 'judge_' prefix
-                judge_cols[username] = idx
-            elif h == 'final_judge':
-                final_col = idx
-            elif h == 'final_judge_by':
-                final_by_col = idx
-            elif h == 'final_remark':
-                remark_col = idx
-
-        # Collect judgments
-        judgments = {}
-        for i, row in enumerate(ws.iter_rows(min_row=2, values_only=True)):
-            row_idx = i + 1
-            row_judgments = {}
-
-            for username, col_idx in judge_cols.items():
-                if col_idx < len(row) and row[col_idx]:
-                    row_judgments[username] = row[col_idx]
-
-            final = None
-            if final_col is not None and final_col < len(row):
-                final = row[final_col]
-
-            final_by = None
-            if final_by_col is not None and final_by_col < len(row):
-                final_by = row[final_by_col]
-
-            remark = None
-            if remark_col is not None and remark_col < len(row):
-                remark = row[remark_col]
-
-            if row_judgments or final or remark:
-                judgments[row_idx] = {
-                    'users': row_judgments,
-                    'final': final,
-                    'final_by': final_by,
-                    'remark': remark
-                }
-
-        wb.close()
+        since = request.GET.get('since')
+        version = current_version(date)
+
+        if since is not None:
+            since = int(since)
+            if since == version:
+                return HttpResponse(status=304)
+
+        if since is None or since > version:
+            # First load, or a cursor from before a reset: send everything
+            judgments = load_judgments(date)
+            full = True
+        else:
+            judgments = load_judgments(date, changed_rows(date, since))
+            full = False
 
         return JsonResponse({
             'judgments': judgments,
+            'version': version,
+            'full': full,
             'current_user': request.user.username
         })
+    except ValueError:
+        return JsonResponse({'error': 'Invalid since'}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -461,33 +747,25 @@ def get_judgments(request, date):
 def submit_remark(request, date, row_index):
     """Submit a remark for a row"""
     try:
-        file_path = get_working_excel_path(date)
+        ensure_imported(date)
+        sheet = sheet_cache.get(get_working_excel_path(date))
     except FileNotFoundError as e:
         return JsonResponse({'error': str(e)}, status=404)
+    if not 1 <= row_index <= sheet.row_count:
+        return JsonResponse({'error': 'Invalid row_index'}, status=400)
 
     try:
         data = json.loads(request.body)
         remark = data.get('remark', '')
 
-        with excel_lock:
-            wb = openpyxl.load_workbook(file_path)
-            ws = wb.active
-
-            # Get headers
-            headers = [cell.value for cell in ws[1]]
-
-            # Get or create remark column
-            remark_col, headers = get_or_create_remark_column(ws, headers)
-
-            # Write remark
-            ws.cell(row=row_index + 1, column=remark_col, value=remark)
-
-            wb.save(file_path)
-            wb.close()
+        version = set_remark(date, row_index, request.user.username, remark)
+        write_behind.enqueue(date, [row_index])
+        publish_judgments(date, version, [row_index])
 
         return JsonResponse({
             'status': 'ok',
-            'remark': remark
+            'remark': remark,
+            'version': version
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -509,14 +787,9 @@ def sync_excel_rows(request, date):
 
         if result['added_rows'] > 0:
             # 记录同步事件，通知其他用户
-            if date not in sync_events:
-                sync_events[date] = {'sync_count': 0}
-
-            sync_events[date]['last_sync_time'] = time.time()
-            sync_events[date]['sync_count'] += 1
-            sync_events[date]['added_rows'] = result['added_rows']
-            sync_events[date]['synced_by'] = request.user.username
-            sync_events[date]['total_rows'] = current_total
+            event = get_presence_store().record_sync(
+                date, result['added_rows'], request.user.username, current_total)
+            event_bus.publish(date, 'sync', event)
 
     if result['success']:
         return JsonResponse(result)
@@ -530,9 +803,10 @@ def check_sync_status(request, date):
     client_last_check = float(request.GET.get('last_check', 0))
     client_row_count = int(request.GET.get('client_row_count', 0))
 
-    if date in sync_events and 'last_sync_time' in sync_events[date]:
-        server_last_sync = sync_events[date]['last_sync_time']
-        server_total_rows = sync_events[date].get('total_rows', 0)
+    sync_event = get_presence_store().sync_event(date)
+    if sync_event:
+        server_last_sync = sync_event['last_sync_time']
+        server_total_rows = sync_event.get('total_rows', 0)
 
         # 如果服务器端的同步时间晚于客户端的最后检查时间
         # 或者服务器端的行数比客户端多
@@ -540,8 +814,8 @@ def check_sync_status(request, date):
             return JsonResponse({
                 'has_new_data': True,
                 'last_sync_time': server_last_sync,
-                'added_rows': sync_events[date].get('added_rows', 0),
-                'synced_by': sync_events[date].get('synced_by', 'unknown'),
+                'added_rows': sync_event.get('added_rows', 0),
+                'synced_by': sync_event.get('synced_by') or 'unknown',
                 'total_rows': server_total_rows
             })
 
@@ -0,0 +1,138 @@
+# data/write_behind.py - 判定写回工作数据的合并批处理
+
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    按日期收集待写回工作数据 (sidecar) 的行，由后台线程批量刷新
+
+    判定/备注先写入数据库 (请求立即返回)，这里只记录哪些行变脏；
+    每个刷新窗口内同一日期的所有改动只做一次写事务。
+    窗口从该日期第一次变脏开始计时，最长 max_latency 秒；
+    积累的行数达到 max_batch 时立即刷新。
+    """
+
+    def __init__(self, flush_fn, max_latency=None, max_batch=None):
+        self.flush_fn = flush_fn
+        self.max_latency = max_latency
+        self.max_batch = max_batch
+        self._pending = {}  # {date: (first_dirty_monotonic, set(row_index))}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def _limits(self):
+        max_latency = self.max_latency
+        if max_latency is None:
+            max_latency = settings.WRITE_BEHIND_MAX_LATENCY
+        max_batch = self.max_batch
+        if max_batch is None:
+            max_batch = settings.WRITE_BEHIND_MAX_BATCH
+        return max_latency, max_batch
+
+    def enqueue(self, date, row_indexes):
+        """
+        标记若干行需要写回
+
+        Args:
+            date: 日期字符串 (YYYYMMDD 格式)
+            row_indexes: 数据行号的可迭代对象
+        """
+        with self._cond:
+            if not self._stopped:
+                first, rows = self._pending.get(date, (time.monotonic(), set()))
+                rows.update(row_indexes)
+                self._pending[date] = (first, rows)
+                self._ensure_thread()
+                self._cond.notify()
+                return
+        # 已关闭 (进程退出中)，直接同步写回
+        self._flush_rows(date, set(row_indexes))
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='excel-write-behind', daemon=True)
+            self._thread.start()
+
+    def _take_due(self):
+        """取出到期的日期，返回 ([(date, rows)], 下次等待秒数)"""
+        max_latency, max_batch = self._limits()
+        now = time.monotonic()
+        due = []
+        wait = None
+        for date, (first, rows) in list(self._pending.items()):
+            remaining = first + max_latency - now
+            if remaining <= 0 or len(rows) >= max_batch:
+                due.append((date, rows))
+                del self._pending[date]
+            elif wait is None or remaining < wait:
+                wait = remaining
+        return due, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                due, wait = self._take_due()
+                while not due:
+                    if self._stopped:
+                        return
+                    self._cond.wait(wait)
+                    due, wait = self._take_due()
+            for date, rows in due:
+                self._flush_rows(date, rows)
+            connection.close()
+
+    def _flush_rows(self, date, rows):
+        try:
+            self.flush_fn(date, rows)
+        except FileNotFoundError:
+            logger.warning('工作Excel不存在，放弃写回: %s', date)
+        except Exception:
+            logger.exception('写回判定失败，稍后重试: %s', date)
+            with self._cond:
+                if not self._stopped:
+                    # 重新计时，避免持续失败时空转
+                    _, pending = self._pending.get(date, (None, set()))
+                    pending.update(rows)
+                    self._pending[date] = (time.monotonic(), pending)
+
+    def flush(self, date=None):
+        """立即同步写回 (date 为 None 时写回所有日期)"""
+        with self._cond:
+            if date is None:
+                due = list(self._pending.items())
+                self._pending.clear()
+            elif date in self._pending:
+                due = [(date, self._pending.pop(date))]
+            else:
+                due = []
+        for d, (_, rows) in due:
+            self._flush_rows(d, rows)
+
+    def shutdown(self):
+        """停止后台线程并写回所有未完成的改动"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=30)
+        self.flush()
+
+
+def _export_rows(date, rows):
+    from .excel_manager import write_judgments
+
+    write_judgments(date, rows)
+
+
+write_behind = WriteBehindQueue(_export_rows)
+atexit.register(write_behind.shutdown)
@@ -1,5 +1,6 @@
 @echo off
 C:\Python\Python310\python.exe manage.py migrate --run-syncdb
 C:\Python\Python310\python.exe manage.py initadmin
-C:\Python\Python310\python.exe manage.py runserver 0.0.0.0:28000
+rem ASGI server: the live judgment event stream (SSE) needs ASGI, runserver is WSGI only
+C:\Python\Python310\python.exe -m uvicorn config.asgi:application --host 0.0.0.0 --port 28000
 
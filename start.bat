@@ -2,5 +2,6 @@
 call venv\Scripts\activate.bat
 python manage.py migrate --run-syncdb
 python manage.py initadmin
-python manage.py runserver 0.0.0.0:28000
+rem ASGI server: the live judgment event stream (SSE) needs ASGI, runserver is WSGI only
+python -m uvicorn config.asgi:application --host 0.0.0.0 --port 28000
 